@@ -0,0 +1,201 @@
+# autotune.py
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import platform
+import queue
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from detectors import DnnDetector, detector_class, model_files
+
+DEFAULT_CACHE = os.path.join(os.path.expanduser('~'), '.cache', 'drone-autotune.json')
+
+
+def dnn_constants(names):
+    """{value: name} for the cv2.dnn constants this OpenCV build has; older
+    builds lack some (OpenCV 4.5 has no DNN_TARGET_CPU_FP16)."""
+    return {getattr(cv2.dnn, attr): name for attr, name in names.items()
+            if getattr(cv2.dnn, attr, None) is not None}
+
+
+BACKEND_NAMES = dnn_constants({
+    'DNN_BACKEND_OPENCV': 'opencv',
+    'DNN_BACKEND_INFERENCE_ENGINE': 'openvino',
+})
+TARGET_NAMES = dnn_constants({
+    'DNN_TARGET_CPU': 'cpu',
+    'DNN_TARGET_CPU_FP16': 'cpu_fp16',
+})
+
+
+def cpu_configs():
+    """(backend, target) pairs this OpenCV build can run on the CPU."""
+    configs = []
+    for backend in BACKEND_NAMES:
+        try:
+            targets = cv2.dnn.getAvailableTargets(backend)
+        except cv2.error:
+            continue
+        configs.extend((backend, int(target)) for target in targets if target in TARGET_NAMES)
+    return configs
+
+
+def thread_counts(workers=1):
+    """Thread counts worth trying per worker: powers of two up to an equal
+    share of the CPUs, plus that share itself."""
+    share = max(1, (os.cpu_count() or 1) // max(1, workers))
+    counts = {share}
+    n = 1
+    while n < share:
+        counts.add(n)
+        n *= 2
+    return sorted(counts)
+
+
+def model_hash(paths):
+    """SHA-256 over the model files, so a retrained or swapped model is retuned."""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def cache_key(spec, workers):
+    """Cache entry for this host, model, worker layout and OpenCV build."""
+    return '|'.join([platform.node(), f'{os.cpu_count()}cpu', f'opencv-{cv2.__version__}',
+                     model_hash(model_files(spec)), f'workers={workers}'])
+
+
+def warmup_frames(count=8, size=(960, 720)):
+    """Camera-sized frames to time the detector on. Inference cost doesn't
+    depend on the content, so these don't need a video source."""
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8) for _ in range(count)]
+
+
+def search(create_detector, workers=1, frames=None):
+    """Time every CPU backend/target and thread count on the frames and
+    return the fastest configuration (with all results under 'tried').
+
+    Thread counts are capped at each worker's share of the CPUs, so the
+    result fits the inference-worker layout it was tuned for.
+    """
+    frames = frames or warmup_frames()
+    detector = create_detector()
+    tried = []
+    for backend, target in cpu_configs():
+        for threads in thread_counts(workers):
+            config = {'backend': backend, 'target': target, 'threads': threads,
+                      'backend_name': BACKEND_NAMES[backend], 'target_name': TARGET_NAMES[target]}
+            try:
+                cv2.setNumThreads(threads)
+                detector.configure(backend, target)
+                # The first pass after a change sets the backend up; don't time it
+                detector.detect(frames[0])
+                times = []
+                for frame in frames:
+                    start = time.perf_counter()
+                    detector.detect(frame)
+                    times.append(time.perf_counter() - start)
+            except cv2.error as e:
+                print(f"[autotune] {config['backend_name']}/{config['target_name']} failed: {e}")
+                continue
+            config['ms'] = float(np.median(times) * 1000)
+            print(f"[autotune] {config['backend_name']}/{config['target_name']} "
+                  f"{threads} thread(s): {config['ms']:.1f} ms")
+            tried.append(config)
+    if not tried:
+        raise RuntimeError("No cv2.dnn backend could run the model")
+    best = dict(min(tried, key=lambda c: c['ms']))
+    best['tried'] = tried
+    best['workers'] = workers
+    best['time'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+    return best
+
+
+def _search_process(results, create_detector, workers):
+    try:
+        results.put(search(create_detector, workers))
+    except Exception as e:
+        results.put(e)
+
+
+def _search_isolated(create_detector, workers):
+    ctx = mp.get_context('fork')
+    results = ctx.Queue()
+    proc = ctx.Process(target=_search_process, args=(results, create_detector, workers))
+    proc.start()
+    while True:
+        try:
+            config = results.get(timeout=1.0)
+            break
+        except queue.Empty:
+            if not proc.is_alive():
+                raise RuntimeError(f"Auto-tuning process died (exit code {proc.exitcode})")
+    proc.join()
+    if isinstance(config, Exception):
+        raise config
+    return config
+
+
+def _load_cache(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(path, cache):
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    # Write then rename, so a crash never leaves a half-written cache
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(cache, f, indent=2)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def load_or_tune(spec, create_detector, workers=1, cache_path=DEFAULT_CACHE, retune=False,
+                 isolate=True):
+    """The fastest cv2.dnn configuration for detector `spec`, from the cache
+    or, on a miss, by running search() and caching the result.
+
+    With `isolate` the search runs in a forked process so this process's
+    OpenCV thread pool is left untouched (for inference workers forked after
+    this); only use it while this process has no other threads. Returns None
+    for detectors that don't run on cv2.dnn.
+    """
+    if not issubclass(detector_class(spec), DnnDetector):
+        print(f"[autotune] skipped: the {detector_class(spec).name} detector doesn't use cv2.dnn")
+        return None
+    key = cache_key(spec, workers)
+    cache = _load_cache(cache_path)
+    if key in cache and not retune:
+        config = cache[key]
+        print(f"[autotune] cached: {config['backend_name']}/{config['target_name']}, "
+              f"{config['threads']} thread(s), {config['ms']:.1f} ms/frame")
+        return config
+
+    print("[autotune] timing cv2.dnn backends and thread counts (cached for later startups)...")
+    if isolate:
+        config = _search_isolated(create_detector, workers)
+    else:
+        config = search(create_detector, workers)
+    print(f"[autotune] picked {config['backend_name']}/{config['target_name']}, "
+          f"{config['threads']} thread(s), {config['ms']:.1f} ms/frame")
+    cache[key] = config
+    _save_cache(cache_path, cache)
+    return config
+
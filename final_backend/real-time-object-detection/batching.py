@@ -0,0 +1,81 @@
+# batching.py
+import threading
+import time
+
+import numpy as np
+
+from detection import DETECTION_DTYPE
+
+
+class DetectionBatcher:
+    """Groups frames from one or more streams into batched forward passes.
+
+    Callers submit frames with a callback. The batcher waits up to `window`
+    seconds after the first pending frame for more to arrive, runs at most
+    `max_batch` frames through one detector.detect_batch() call, and hands
+    each frame's detections back to its own callback.
+    """
+
+    def __init__(self, detector, max_batch=4, window=0.010):
+        self.detector = detector
+        self.max_batch = max_batch
+        self.window = window
+        self._cond = threading.Condition()
+        self._pending = []
+        self._thread = None
+        self.batches = 0
+        self.frames = 0
+
+    @property
+    def pending(self):
+        """Frames waiting for the next batch."""
+        return len(self._pending)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def submit(self, image, callback):
+        """Queue a frame; callback(detections) is called from the batcher thread."""
+        with self._cond:
+            self._pending.append((image, callback))
+            self._cond.notify_all()
+
+    def detect(self, image):
+        """Blocking single-frame helper, usable as an InferenceStage detect callable."""
+        done = threading.Event()
+        result = []
+
+        def callback(detections):
+            result.append(detections)
+            done.set()
+
+        self.submit(image, callback)
+        done.wait()
+        return result[0]
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending)
+                # Give other frames a short window to join this batch
+                deadline = time.monotonic() + self.window
+                while len(self._pending) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._pending[:self.max_batch]
+                del self._pending[:self.max_batch]
+
+            try:
+                results = self.detector.detect_batch([image for image, _ in batch])
+            except Exception as e:
+                print(f"Batch inference error: {e}")
+                results = [np.empty(0, dtype=DETECTION_DTYPE) for _ in batch]
+            self.batches += 1
+            self.frames += len(batch)
+            for (_, callback), detections in zip(batch, results):
+                callback(detections)
@@ -0,0 +1,84 @@
+# benchmark_batching.py
+import argparse
+import json
+import time
+
+import cv2
+import numpy as np
+
+from detection import PROTOTXT, MODEL, load_net, detect_batch
+
+
+def load_frames(video, count):
+    """Read `count` frames from a video file, or generate random 960x720 frames."""
+    if not video:
+        rng = np.random.default_rng(0)
+        return [rng.integers(0, 256, size=(720, 960, 3), dtype=np.uint8) for _ in range(count)]
+    cap = cv2.VideoCapture(video)
+    frames = []
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    if not frames:
+        raise SystemExit(f"No frames could be read from {video}")
+    return frames
+
+
+def bench(net, frames, batch_size, iterations):
+    """Return the wall time of each batched forward pass, in seconds."""
+    # Warm up so the first, slower forward pass isn't measured
+    detect_batch(net, frames[:batch_size])
+    timings = []
+    for i in range(iterations):
+        start = (i * batch_size) % len(frames)
+        batch = [frames[(start + j) % len(frames)] for j in range(batch_size)]
+        t0 = time.perf_counter()
+        detect_batch(net, batch)
+        timings.append(time.perf_counter() - t0)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched MobileNet SSD inference")
+    parser.add_argument("--prototxt", type=str, default=PROTOTXT)
+    parser.add_argument("--model", type=str, default=MODEL)
+    parser.add_argument("--video", type=str, help="Video file to take frames from (default: random frames)")
+    parser.add_argument("--batch-sizes", type=str, default="1,2,4,8", help="Comma-separated batch sizes")
+    parser.add_argument("--iterations", type=int, default=20, help="Batches per batch size")
+    parser.add_argument("--source-fps", type=float, default=30.0,
+                        help="Stream rate used to estimate how long a single stream takes to fill a batch")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    batch_sizes = [int(b) for b in args.batch_sizes.split(",")]
+    net = load_net(args.prototxt, args.model)
+    frames = load_frames(args.video, max(batch_sizes) * 4)
+
+    results = []
+    for batch_size in batch_sizes:
+        timings = bench(net, frames, batch_size, args.iterations)
+        batch_ms = float(np.mean(timings)) * 1000
+        results.append({
+            'batch_size': batch_size,
+            'fps': batch_size * len(timings) / sum(timings),
+            'batch_ms': batch_ms,
+            # The oldest frame in a batch from one stream also waits for the rest to arrive
+            'fill_ms': (batch_size - 1) / args.source_fps * 1000,
+        })
+    base = results[0]['batch_ms'] + results[0]['fill_ms']
+    for r in results:
+        r['added_latency_ms'] = r['batch_ms'] + r['fill_ms'] - base
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'batch':>5} {'frames/s':>9} {'batch ms':>9} {'fill ms':>8} {'added ms':>9}")
+    for r in results:
+        print(f"{r['batch_size']:>5} {r['fps']:>9.1f} {r['batch_ms']:>9.1f} "
+              f"{r['fill_ms']:>8.1f} {r['added_latency_ms']:>9.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# benchmark_detectors.py
+import argparse
+import json
+import os
+import platform
+import time
+
+import cv2
+import numpy as np
+
+from benchmark_pipeline import git_commit, next_frame, summarize
+from detectors import create_detector
+from frame_sources import open_source
+
+
+def load_frames(spec, count):
+    """Read `count` frames from a source into memory, so every detector
+    sees exactly the same images."""
+    source = open_source(spec, loop=False, realtime=False).start()
+    frames = []
+    frame = None
+    while len(frames) < count:
+        frame = next_frame(source, frame)
+        if frame is None:
+            break
+        frames.append(frame)
+    source.stop()
+    return frames
+
+
+def run_detector(spec, frames, warmup, batch_size, confidence, classes):
+    """Time one detector on the frames: per-frame latency, sequential
+    throughput and batched throughput."""
+    start = time.perf_counter()
+    detector = create_detector(spec, confidence=confidence, classes=classes)
+    load_s = time.perf_counter() - start
+    for frame in frames[:warmup]:
+        detector.detect(frame)
+
+    latencies = []
+    found = 0
+    for frame in frames:
+        start = time.perf_counter()
+        detections = detector.detect(frame)
+        latencies.append(time.perf_counter() - start)
+        found += len(detections)
+
+    batch_fps = None
+    if batch_size > 1:
+        start = time.perf_counter()
+        for i in range(0, len(frames), batch_size):
+            detector.detect_batch(frames[i:i + batch_size])
+        batch_fps = len(frames) / (time.perf_counter() - start)
+
+    result = detector.describe()
+    result.update({
+        'load_s': load_s,
+        'latency': summarize(latencies),
+        'batch_size': batch_size,
+        'batch_fps': batch_fps,
+        'detections_per_frame': found / len(frames),
+    })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare detector backends on the same frames")
+    parser.add_argument("--source", type=str, default="synthetic",
+                        help="file:PATH (e.g. a flight recording), synthetic[:WIDTHxHEIGHT] or webcam[:INDEX]")
+    parser.add_argument("--detector", action="append", dest="detectors",
+                        help="Detector to compare (ssd, yolo[:WEIGHTS], onnx:MODEL.onnx); repeat for each")
+    parser.add_argument("--frames", type=int, default=100, help="Frames to run every detector on")
+    parser.add_argument("--warmup", type=int, default=5, help="Frames run before timing starts")
+    parser.add_argument("--batch-size", type=int, default=4,
+                        help="Also time detect_batch() with this many frames per call (1 to skip)")
+    parser.add_argument("--confidence", type=float, default=None,
+                        help="Minimum score (default: each detector's own)")
+    parser.add_argument("--detector-classes", type=str, default=None,
+                        help="Class names file for models not trained on the default classes")
+    parser.add_argument("--output", type=str, help="Write the JSON results to this file")
+    args = parser.parse_args()
+    detectors = args.detectors or ['ssd']
+
+    frames = load_frames(args.source, args.frames)
+    if not frames:
+        print(f"No frames from {args.source}")
+        return
+    print(f"{len(frames)} frames of {frames[0].shape[1]}x{frames[0].shape[0]} from {args.source}")
+
+    results = {}
+    for spec in detectors:
+        try:
+            results[spec] = run_detector(spec, frames, args.warmup, args.batch_size,
+                                         args.confidence, args.detector_classes)
+        except Exception as e:
+            print(f"Skipping {spec}: {e}")
+            results[spec] = {'error': str(e)}
+
+    print(f"{'detector':24}{'load s':>8}{'fps':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'batch fps':>11}{'dets':>7}")
+    for spec, r in results.items():
+        if 'error' in r:
+            continue
+        lat = r['latency']
+        batch = f"{r['batch_fps']:.1f}" if r['batch_fps'] is not None else '-'
+        print(f"{spec:24}{r['load_s']:>8.2f}{lat['fps']:>8.1f}{lat['p50_ms']:>9.2f}"
+              f"{lat['p95_ms']:>9.2f}{lat['p99_ms']:>9.2f}{batch:>11}{r['detections_per_frame']:>7.1f}")
+
+    report = {
+        'commit': git_commit(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'host': platform.node(),
+        'python': platform.python_version(),
+        'opencv': cv2.__version__,
+        'numpy': np.__version__,
+        'cpus': os.cpu_count(),
+        'args': vars(args),
+        'frames': {'count': len(frames), 'width': frames[0].shape[1], 'height': frames[0].shape[0]},
+        'detectors': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+# benchmark_pipeline.py
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+import cv2
+import imutils
+import numpy as np
+
+from detection import PROTOTXT, MODEL, Preprocessor, detect_objects, load_net, postprocess
+from frame_sources import open_source
+from overlay import LabelCache, draw_overlay
+from pipeline import CaptureStage, InferenceStage, OverlayStage
+from video_stream import DEFAULT_PROFILE, JpegBroadcaster, encode_jpeg
+
+STAGES = ['capture', 'preprocess', 'inference', 'postprocess', 'overlay', 'encode']
+
+
+def summarize(samples):
+    """Throughput and latency percentiles for a list of durations in seconds."""
+    if not samples:
+        return {'count': 0}
+    ms = np.asarray(samples) * 1000
+    return {
+        'count': len(samples),
+        'fps': len(samples) / (ms.sum() / 1000) if ms.sum() else None,
+        'mean_ms': float(ms.mean()),
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p95_ms': float(np.percentile(ms, 95)),
+        'p99_ms': float(np.percentile(ms, 99)),
+        'max_ms': float(ms.max()),
+    }
+
+
+class Usage:
+    """CPU time and peak RSS of this process between start and stop."""
+
+    def __init__(self):
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+
+    def stop(self):
+        wall = time.perf_counter() - self.wall
+        cpu = time.process_time() - self.cpu
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in KB on Linux and in bytes on macOS
+        peak_mb = peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+        return {
+            'wall_s': wall,
+            'cpu_s': cpu,
+            # 100% = one core busy for the whole run
+            'cpu_percent': 100.0 * cpu / wall if wall else 0.0,
+            'peak_rss_mb': peak_mb,
+        }
+
+
+def next_frame(source, last):
+    """Wait for a frame that isn't `last` from a FrameSource."""
+    while True:
+        frame = source.read()
+        if frame is not None and frame is not last:
+            return frame
+        if source.finished:
+            return None
+        time.sleep(0.0005)
+
+
+def run_stages(source, net, frames, warmup, confidence, display_width, profile):
+    """Run every stage back to back on one thread and time each one per frame."""
+    preprocessor = Preprocessor()
+    labels = LabelCache()
+    timings = {stage: [] for stage in STAGES}
+    frame = None
+    for i in range(warmup + frames):
+        t0 = time.perf_counter()
+        frame = next_frame(source, frame)
+        if frame is None:
+            break
+        t1 = time.perf_counter()
+        blob = preprocessor(frame)
+        t2 = time.perf_counter()
+        net.setInput(blob)
+        rows = net.forward()
+        t3 = time.perf_counter()
+        (h, w) = frame.shape[:2]
+        detections = postprocess(rows, w, h, confidence)
+        t4 = time.perf_counter()
+        display = imutils.resize(frame, width=display_width)
+        draw_overlay(display, detections, labels, source_size=(w, h))
+        t5 = time.perf_counter()
+        encode_jpeg(display, profile)
+        t6 = time.perf_counter()
+        if i < warmup:
+            continue
+        for stage, start, end in zip(STAGES, (t0, t1, t2, t3, t4, t5), (t1, t2, t3, t4, t5, t6)):
+            timings[stage].append(end - start)
+    return timings
+
+
+def run_pipeline(source, net, duration, confidence, display_width):
+    """Run the threaded chat_drone pipeline and measure each bus's rate and
+    the capture-to-JPEG latency seen by one viewer."""
+    preprocessor = Preprocessor()
+    capture = CaptureStage(source.read)
+    inference = InferenceStage(capture.output,
+                               lambda image: detect_objects(net, image, confidence, preprocessor))
+    overlay = OverlayStage(capture.output, inference.output, display_width=display_width)
+    broadcaster = JpegBroadcaster(overlay.output)
+    viewer = broadcaster.output.subscribe('benchmark')
+    for stage in (capture, inference, overlay, broadcaster):
+        stage.start()
+
+    buses = {
+        'capture': capture.output,
+        'inference': inference.output,
+        'overlay': overlay.output,
+        'encode': broadcaster.output,
+    }
+    # Let the pipeline fill before counting
+    broadcaster.output.wait_newer(0, timeout=10.0)
+    # Derived buses keep the source sequence numbers, so count publishes instead
+    start_count = {name: bus.published for name, bus in buses.items()}
+    latencies = []
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        frame = viewer.next(timeout=1.0)
+        if frame is not None:
+            latencies.append(time.time() - frame.timestamp)
+    elapsed = time.perf_counter() - start
+
+    result = {name: {'fps': (bus.published - start_count[name]) / elapsed}
+              for name, bus in buses.items()}
+    result['end_to_end'] = summarize(latencies)
+    result['viewer'] = viewer.stats()
+    viewer.close()
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the video pipeline stage by stage")
+    parser.add_argument("--source", type=str, default="synthetic",
+                        help="file:PATH, synthetic[:WIDTHxHEIGHT] or webcam[:INDEX]")
+    parser.add_argument("--prototxt", type=str, default=PROTOTXT)
+    parser.add_argument("--model", type=str, default=MODEL)
+    parser.add_argument("--frames", type=int, default=300, help="Frames timed in the per-stage run")
+    parser.add_argument("--warmup", type=int, default=10, help="Frames run before timing starts")
+    parser.add_argument("--duration", type=float, default=10.0,
+                        help="Seconds to run the threaded pipeline (0 to skip)")
+    parser.add_argument("--confidence", type=float, default=0.2)
+    parser.add_argument("--display-width", type=int, default=400)
+    parser.add_argument("--quality", type=int, default=None, help="JPEG quality (default: OpenCV's)")
+    parser.add_argument("--output", type=str, help="Write the JSON results to this file")
+    args = parser.parse_args()
+
+    net = load_net(args.prototxt, args.model)
+    profile = DEFAULT_PROFILE._replace(quality=args.quality)
+    # Frames are handed over as fast as they are consumed, so the source never paces the run
+    source = open_source(args.source, realtime=False).start()
+
+    usage = Usage()
+    stage_timings = run_stages(source, net, args.frames, args.warmup,
+                               args.confidence, args.display_width, profile)
+    stages = {stage: summarize(samples) for stage, samples in stage_timings.items()}
+    totals = [sum(parts) for parts in zip(*stage_timings.values())]
+    stages['total'] = summarize(totals)
+    stage_usage = usage.stop()
+
+    pipeline = None
+    if args.duration > 0:
+        usage = Usage()
+        pipeline = run_pipeline(source, net, args.duration, args.confidence, args.display_width)
+        pipeline['usage'] = usage.stop()
+    source.stop()
+    # Let the stage threads finish their in-flight OpenCV calls; exiting
+    # while one is running aborts the interpreter
+    time.sleep(0.5)
+
+    results = {
+        'commit': git_commit(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'host': platform.node(),
+        'python': platform.python_version(),
+        'opencv': cv2.__version__,
+        'cpus': os.cpu_count(),
+        'args': vars(args),
+        'stages': stages,
+        'stages_usage': stage_usage,
+        'pipeline': pipeline,
+    }
+
+    print(f"{'stage':12}{'fps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for stage, s in stages.items():
+        if s['count']:
+            print(f"{stage:12}{s['fps']:>9.1f}{s['p50_ms']:>9.2f}{s['p95_ms']:>9.2f}{s['p99_ms']:>9.2f}")
+    print(f"CPU {stage_usage['cpu_percent']:.0f}%, peak RSS {stage_usage['peak_rss_mb']:.1f} MB")
+    if pipeline is not None:
+        rates = ', '.join(f"{name} {pipeline[name]['fps']:.1f}"
+                          for name in ('capture', 'inference', 'overlay', 'encode'))
+        e2e = pipeline['end_to_end']
+        print(f"threaded pipeline fps: {rates}")
+        if e2e['count']:
+            print(f"capture-to-JPEG latency p50/p95/p99: "
+                  f"{e2e['p50_ms']:.1f} / {e2e['p95_ms']:.1f} / {e2e['p99_ms']:.1f} ms, "
+                  f"CPU {pipeline['usage']['cpu_percent']:.0f}%")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
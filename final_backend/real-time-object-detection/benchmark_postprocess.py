@@ -0,0 +1,56 @@
+# benchmark_postprocess.py
+import argparse
+import timeit
+
+import numpy as np
+
+from detection import CLASSES, postprocess
+
+
+def legacy_postprocess(detections, w, h, confidence=0.2):
+    """The per-box Python loop that capture_frames used to run."""
+    results = []
+    for i in np.arange(0, detections.shape[2]):
+        score = detections[0, 0, i, 2]
+        if score > confidence:
+            idx = int(detections[0, 0, i, 1])
+            box = detections[0, 0, i, 3:7] * np.array([w, h, w, h])
+            (startX, startY, endX, endY) = box.astype("int")
+            label = "{}: {:.2f}%".format(CLASSES[idx], score * 100)
+            results.append((idx, score, startX, startY, endX, endY, label))
+    return results
+
+
+def fake_detections(candidates, hit_rate, seed=0):
+    """Build a (1, 1, N, 7) array shaped like MobileNet SSD output."""
+    rng = np.random.default_rng(seed)
+    rows = np.zeros((candidates, 7), dtype=np.float32)
+    rows[:, 1] = rng.integers(1, len(CLASSES), size=candidates)
+    rows[:, 2] = np.where(rng.random(candidates) < hit_rate,
+                          rng.uniform(0.2, 1.0, candidates), rng.uniform(0.0, 0.2, candidates))
+    xy = rng.uniform(-0.05, 1.05, size=(candidates, 4))
+    rows[:, 3:7] = np.concatenate([xy[:, :2].clip(max=xy[:, 2:]), np.maximum(xy[:, :2], xy[:, 2:])], axis=1)
+    return rows.reshape(1, 1, candidates, 7)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the legacy SSD post-processing loop with postprocess()")
+    parser.add_argument("--candidates", type=int, default=100, help="Rows in the fake SSD output")
+    parser.add_argument("--hit-rate", type=float, default=0.1, help="Fraction of rows above the threshold")
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    detections = fake_detections(args.candidates, args.hit_rate)
+    (w, h) = (960, 720)
+
+    legacy = timeit.timeit(lambda: legacy_postprocess(detections, w, h), number=args.repeat)
+    vectorized = timeit.timeit(lambda: postprocess(detections, w, h), number=args.repeat)
+    kept = len(postprocess(detections, w, h))
+
+    print(f"{args.candidates} candidates, {kept} above threshold")
+    print(f"legacy loop:   {legacy / args.repeat * 1e6:8.1f} us/frame")
+    print(f"postprocess(): {vectorized / args.repeat * 1e6:8.1f} us/frame")
+    print(f"speedup:       {legacy / vectorized:8.1f}x")
+
+if __name__ == "__main__":
+    main()
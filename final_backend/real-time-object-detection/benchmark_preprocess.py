@@ -0,0 +1,53 @@
+# benchmark_preprocess.py
+import argparse
+import timeit
+import tracemalloc
+
+import cv2
+import imutils
+import numpy as np
+
+from detection import Preprocessor
+
+
+def legacy_preprocess(frame):
+    """The copy / resize / resize / blobFromImage chain capture_frames used to run."""
+    processed_frame = frame.copy()
+    processed_frame = imutils.resize(processed_frame, width=400)
+    return cv2.dnn.blobFromImage(cv2.resize(processed_frame, (300, 300)),
+        0.007843, (300, 300), 127.5)
+
+
+def peak_bytes(fn, frame):
+    """Peak Python-visible memory allocated by one call (NumPy and cv2 outputs)."""
+    fn(frame)  # warm up so one-time buffers aren't counted
+    tracemalloc.start()
+    fn(frame)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare legacy and preallocated detector preprocessing")
+    parser.add_argument("--width", type=int, default=960)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--repeat", type=int, default=500)
+    args = parser.parse_args()
+
+    frame = np.random.default_rng(0).integers(0, 256, size=(args.height, args.width, 3), dtype=np.uint8)
+    preprocessor = Preprocessor()
+
+    legacy_s = timeit.timeit(lambda: legacy_preprocess(frame), number=args.repeat) / args.repeat
+    new_s = timeit.timeit(lambda: preprocessor(frame), number=args.repeat) / args.repeat
+    legacy_mem = peak_bytes(legacy_preprocess, frame)
+    new_mem = peak_bytes(preprocessor, frame)
+
+    print(f"{args.width}x{args.height} frame, {args.repeat} runs")
+    print(f"{'':14}{'time/frame':>12}{'allocated/frame':>18}")
+    print(f"{'legacy chain':14}{legacy_s * 1e3:>10.3f}ms{legacy_mem / 1024:>16.1f}KB")
+    print(f"{'Preprocessor':14}{new_s * 1e3:>10.3f}ms{new_mem / 1024:>16.1f}KB")
+    print(f"saved per frame: {(legacy_s - new_s) * 1e3:.3f}ms, {(legacy_mem - new_mem) / 1024:.1f}KB")
+
+if __name__ == "__main__":
+    main()
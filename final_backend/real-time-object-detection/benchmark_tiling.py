@@ -0,0 +1,144 @@
+# benchmark_tiling.py
+import argparse
+import json
+import os
+import platform
+import time
+
+import cv2
+import numpy as np
+
+from benchmark_detectors import load_frames
+from benchmark_pipeline import git_commit, summarize
+from detectors import create_detector
+from tiling import TiledDetector, Tiler, parse_grid
+
+
+def box_area(boxes):
+    return (boxes[..., 2] - boxes[..., 0] + 1) * (boxes[..., 3] - boxes[..., 1] + 1)
+
+
+def matched(reference, detections, iou=0.5):
+    """Which reference boxes have a same-class detection overlapping them by
+    at least `iou` (intersection over union)."""
+    if not len(reference) or not len(detections):
+        return np.zeros(len(reference), dtype=bool)
+    ref = np.stack([reference[k] for k in ('x1', 'y1', 'x2', 'y2')], axis=1)[:, None]
+    det = np.stack([detections[k] for k in ('x1', 'y1', 'x2', 'y2')], axis=1)[None, :]
+    w = np.clip(np.minimum(ref[..., 2], det[..., 2]) - np.maximum(ref[..., 0], det[..., 0]) + 1, 0, None)
+    h = np.clip(np.minimum(ref[..., 3], det[..., 3]) - np.maximum(ref[..., 1], det[..., 1]) + 1, 0, None)
+    inter = w * h
+    overlap = inter / (box_area(ref) + box_area(det) - inter)
+    same = reference['class_id'][:, None] == detections['class_id'][None, :]
+    return ((overlap >= iou) & same).any(axis=1)
+
+
+def run_grid(detector, grid, overlap, full_frame, frames, warmup):
+    """Time tiled detection with one grid; returns the timings and every
+    frame's detections."""
+    tiled = TiledDetector(detector, Tiler(grid, overlap, full_frame))
+    for frame in frames[:warmup]:
+        tiled.detect(frame)
+    latencies = []
+    results = []
+    for frame in frames:
+        start = time.perf_counter()
+        results.append(tiled.detect(frame))
+        latencies.append(time.perf_counter() - start)
+    return {'tiling': tiled.tiler.describe(), 'latency': summarize(latencies)}, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cost of tiled detection per tile grid, and how far it agrees with the densest one")
+    parser.add_argument("--source", type=str, default="synthetic",
+                        help="file:PATH (e.g. a flight recording), synthetic[:WIDTHxHEIGHT] or webcam[:INDEX]")
+    parser.add_argument("--detector", type=str, default="ssd",
+                        help="Detection backend: ssd, yolo[:WEIGHTS] or onnx:MODEL.onnx")
+    parser.add_argument("--detector-classes", type=str, default=None,
+                        help="Class names file for models not trained on the default classes")
+    parser.add_argument("--confidence", type=float, default=None,
+                        help="Minimum score (default: the detector's own)")
+    parser.add_argument("--grid", action="append", dest="grids",
+                        help="Tile grid to compare, COLSxROWS (repeat; default 1x1, 2x2, 3x2, 4x3)")
+    parser.add_argument("--overlap", type=float, default=0.25, help="Fraction of each tile shared with its neighbours")
+    parser.add_argument("--no-full-frame", action="store_true",
+                        help="Don't add the whole frame to the tiles")
+    parser.add_argument("--reference", type=str, default=None,
+                        help="Grid whose detections the others are compared with (default: the one "
+                             "with the most tiles)")
+    parser.add_argument("--iou", type=float, default=0.5, help="IoU a detection needs to match a reference box")
+    parser.add_argument("--small", type=int, default=64,
+                        help="Reference boxes with both sides under this many pixels count as small")
+    parser.add_argument("--frames", type=int, default=50, help="Frames to run every grid on")
+    parser.add_argument("--warmup", type=int, default=3, help="Frames run before timing starts")
+    parser.add_argument("--output", type=str, help="Write the JSON results to this file")
+    args = parser.parse_args()
+    grids = [parse_grid(g) for g in args.grids or ['1x1', '2x2', '3x2', '4x3']]
+    reference = parse_grid(args.reference) if args.reference else max(grids, key=lambda g: g[0] * g[1])
+    if reference not in grids:
+        grids.append(reference)
+
+    frames = load_frames(args.source, args.frames)
+    if not frames:
+        print(f"No frames from {args.source}")
+        return
+    print(f"{len(frames)} frames of {frames[0].shape[1]}x{frames[0].shape[0]} from {args.source}")
+    detector = create_detector(args.detector, confidence=args.confidence, classes=args.detector_classes)
+
+    results = {}
+    detections = {}
+    for grid in grids:
+        results[grid], detections[grid] = run_grid(detector, grid, args.overlap, not args.no_full_frame,
+                                                   frames, args.warmup)
+
+    # No labelled frames, so this is agreement rather than recall: the share
+    # of the reference grid's detections each grid also finds (the reference
+    # itself always scores 1.0)
+    baseline = results[(1, 1)]['latency']['mean_ms'] if (1, 1) in results else None
+    for grid, result in results.items():
+        found = total = small_found = small_total = 0
+        for ref, dets in zip(detections[reference], detections[grid]):
+            hit = matched(ref, dets, args.iou)
+            small = np.maximum(ref['x2'] - ref['x1'], ref['y2'] - ref['y1']) < args.small
+            found += int(hit.sum())
+            total += len(ref)
+            small_found += int(hit[small].sum())
+            small_total += int(small.sum())
+        result.update({
+            'agreement': found / total if total else None,
+            'small_agreement': small_found / small_total if small_total else None,
+            'detections_per_frame': sum(len(d) for d in detections[grid]) / len(frames),
+            'cost': result['latency']['mean_ms'] / baseline if baseline else None,
+        })
+
+    print(f"reference: {reference[0]}x{reference[1]}")
+    print(f"{'grid':8}{'tiles':>7}{'ms':>9}{'fps':>8}{'cost':>7}{'agree':>8}{'small':>8}{'dets':>7}")
+    fmt = lambda v, spec: format(v, spec) if v is not None else '-'
+    for (cols, rows), r in results.items():
+        lat = r['latency']
+        print(f"{f'{cols}x{rows}':8}{r['tiling']['tiles']:>7}{lat['mean_ms']:>9.1f}{lat['fps']:>8.1f}"
+              f"{fmt(r['cost'], '.1f'):>7}{fmt(r['agreement'], '.2f'):>8}{fmt(r['small_agreement'], '.2f'):>8}"
+              f"{r['detections_per_frame']:>7.1f}")
+
+    report = {
+        'commit': git_commit(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'host': platform.node(),
+        'python': platform.python_version(),
+        'opencv': cv2.__version__,
+        'numpy': np.__version__,
+        'cpus': os.cpu_count(),
+        'args': vars(args),
+        'detector': detector.describe(),
+        'frames': {'count': len(frames), 'width': frames[0].shape[1], 'height': frames[0].shape[0]},
+        'reference': f'{reference[0]}x{reference[1]}',
+        'grids': {f'{cols}x{rows}': r for (cols, rows), r in results.items()},
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
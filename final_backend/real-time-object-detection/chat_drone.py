@@ -6,11 +6,36 @@ import threading
 import time
 import signal
 import json
+import tempfile
+from datetime import datetime, timezone
 from ollama import chat, ChatResponse
 from djitellopy import Tello
 from flask import Flask, Response, render_template_string, request, jsonify
-import numpy as np
-import imutils
+from werkzeug.http import http_date, is_resource_modified
+try:
+    from flask_sock import Sock
+except ImportError:
+    Sock = None
+from detection import detections_to_records
+from autotune import DEFAULT_CACHE, load_or_tune
+from detector_loader import DetectorLoader
+from detectors import create_detector, detector_class
+from batching import DetectionBatcher
+from class_filter import ClassFilter
+from detection_feed import DetectionFeed
+from frame_ring import FrameRing, parse_duration
+from frame_sources import open_source
+from h264_relay import H264Relay
+from inference_pool import InferencePool
+from metrics import PipelineMetrics
+from overlay import LabelCache, draw_overlay
+from recorder import FlightRecorder
+from pipeline import (CaptureStage, InferenceStage, PooledInferenceStage, TiledPooledInferenceStage,
+                      BatchedInferenceStage, TrackingInferenceStage, OverlayStage)
+from preview import LocalPreview
+from tiling import TiledDetector, Tiler, parse_grid
+from tracker import AdaptiveCadence, BoxTracker
+from video_stream import DEFAULT_PROFILE, THUMBNAIL_PROFILE, JpegBroadcaster, encode_jpeg, profile_from_args
 
 
 detection_enabled = True
@@ -19,19 +44,139 @@ parser = argparse.ArgumentParser()
 parser.add_argument("--port", type=int, default=5001, help="Port for HTTP server")
 parser.add_argument("--host", type=str, default="0.0.0.0", help="Host for HTTP server")
 parser.add_argument("--no-local-display", action="store_true", help="Disable local video display window")
+parser.add_argument("--preview-fps", type=float, default=15.0,
+                    help="Refresh rate of the local display window; frames in between are skipped")
+parser.add_argument("--source", type=str, default="tello",
+                    help="Video source: tello, webcam[:INDEX], file:PATH or synthetic[:WIDTHxHEIGHT]. "
+                         "The drone is only connected for the tello source")
+parser.add_argument("--source-fps", type=float, default=None,
+                    help="Frame rate for file and synthetic sources (default: the file's own rate / 30)")
+parser.add_argument("--no-loop", action="store_true", help="Stop at the end of a file source instead of looping")
+parser.add_argument("--as-fast-as-possible", action="store_true",
+                    help="Hand file/synthetic frames over as fast as the pipeline takes them instead of in real time")
+parser.add_argument("--inference-workers", type=int, default=0,
+                    help="Run detection in this many worker processes (0 = in-process thread)")
+parser.add_argument("--batch-size", type=int, default=1,
+                    help="Batch up to this many frames per forward pass (in-process detection only)")
+parser.add_argument("--batch-window-ms", type=float, default=10.0,
+                    help="How long to wait for a batch to fill, in milliseconds")
+parser.add_argument("--adaptive-detection", action="store_true",
+                    help="Run the detector every N frames and track boxes in between")
+parser.add_argument("--target-fps", type=float, default=30.0,
+                    help="Frame rate the adaptive detection cadence is tuned for")
+parser.add_argument("--h264-passthrough", action="store_true",
+                    help="Relay the drone's H.264 stream at /video_feed.mp4 and decode only when needed")
+parser.add_argument("--record-dir", type=str, default="recordings",
+                    help="Directory flight recordings are written to")
+parser.add_argument("--record-segment", type=float, default=60.0,
+                    help="Start a new recording file every this many seconds")
+parser.add_argument("--ring-seconds", type=float, default=10.0,
+                    help="Keep this many seconds of recent frames in memory for /snapshot?ago= and /clip (0 = off)")
+parser.add_argument("--ring-fps", type=float, default=10.0,
+                    help="Frame rate the in-memory ring stores at")
+parser.add_argument("--ring-width", type=int, default=None,
+                    help="Scale frames in the ring down to this width to save memory")
+parser.add_argument("--video-port", type=int, default=Tello.VS_UDP_PORT,
+                    help="UDP port the H.264 stream arrives on (replay_h264.py can feed it)")
+parser.add_argument("--detector", type=str, default="ssd",
+                    help="Detection backend: ssd, yolo[:WEIGHTS] or onnx:MODEL.onnx")
+parser.add_argument("--detector-classes", type=str, default=None,
+                    help="Class names file (one per line) for models not trained on the default classes")
+parser.add_argument("--no-autotune", action="store_true",
+                    help="Use OpenCV's default dnn backend and thread count instead of the tuned ones")
+parser.add_argument("--retune", action="store_true",
+                    help="Redo the backend/thread auto-tuning even if a cached result exists")
+parser.add_argument("--autotune-cache", type=str, default=DEFAULT_CACHE,
+                    help="Where auto-tuning results are cached (per host, model and worker count)")
+parser.add_argument("--tiles", type=parse_grid, default=None,
+                    help="Detect on overlapping full-resolution tiles in a COLSxROWS grid (e.g. 4x3) "
+                         "plus the whole frame, to find small objects; costs a forward pass per tile")
+parser.add_argument("--tile-overlap", type=float, default=0.25,
+                    help="Fraction of each tile shared with its neighbours")
+parser.add_argument("--only-classes", type=str, default=None,
+                    help="Comma-separated classes to detect (e.g. person,car); the rest are dropped. "
+                         "Changeable at runtime through /detections/filter")
+parser.add_argument("--class-threshold", action="append", default=[], metavar="CLASS=SCORE",
+                    help="Minimum score for one class (e.g. person=0.5); repeat for each")
 args = parser.parse_args()
+if args.adaptive_detection and (args.inference_workers > 0 or args.batch_size > 1):
+    parser.error("--adaptive-detection runs the detector in-process; "
+                 "it can't be combined with --inference-workers or --batch-size")
 
-# Load the MobileNet SSD model files
-print("[INFO] loading model...")
-# Make sure these files are in your project directory
-net = cv2.dnn.readNetFromCaffe('MobileNetSSD_deploy.prototxt.txt', 'MobileNetSSD_deploy.caffemodel')
+def load_detector():
+    return create_detector(args.detector, classes=args.detector_classes)
 
-# Initialize the classes and colors for object detection
-CLASSES = ["background", "aeroplane", "bicycle", "bird", "boat",
-    "bottle", "bus", "car", "cat", "chair", "cow", "diningtable",
-    "dog", "horse", "motorbike", "person", "pottedplant", "sheep",
-    "sofa", "train", "tvmonitor"]
-COLORS = np.random.uniform(0, 255, size=(len(CLASSES), 3))
+# Fastest cv2.dnn backend/target and thread count for this machine and
+# worker layout; searched once, then read from the cache
+tuning = None
+
+def autotune_detector(isolate=True):
+    global tuning
+    if args.no_autotune:
+        return
+    try:
+        tuning = load_or_tune(args.detector, load_detector, max(1, args.inference_workers),
+                              args.autotune_cache, retune=args.retune, isolate=isolate)
+    except Exception as e:
+        print(f"Warning: auto-tuning failed, using OpenCV defaults: {e}")
+
+# Class allow-list and per-class minimum scores, applied to the network
+# output by every detector (including inference workers, through shared memory)
+class_filter = ClassFilter()
+
+def make_detector():
+    detector = load_detector()
+    detector.thresholds = class_filter.thresholds
+    if tuning is not None:
+        detector.configure(tuning['backend'], tuning['target'])
+    return detector
+
+# Tiled detection: in-process detectors run each frame's tiles as one batch,
+# the inference pool spreads them over its workers
+tiler = Tiler(args.tiles, args.tile_overlap) if args.tiles else None
+
+def tiled(detector):
+    return TiledDetector(detector, tiler) if tiler is not None else detector
+
+# Make sure the model files are in your project directory
+inference_pool = None
+if args.inference_workers > 0:
+    # Workers are forked, so tune and start them before any other threads
+    # exist; each one loads and warms up its own detector in the background
+    autotune_detector()
+    inference_pool = InferencePool(args.inference_workers, make_detector,
+                                   detector_class(args.detector).input_size,
+                                   threads=tuning['threads'] if tuning is not None else None).start()
+
+def init_detector():
+    """Runs on the loader thread once the server starts."""
+    print("[INFO] loading model...")
+    if inference_pool is None:
+        autotune_detector(isolate=False)
+        if tuning is not None:
+            cv2.setNumThreads(tuning['threads'])
+    return tiled(make_detector())
+
+def detector_ready(loaded):
+    # Labels for the overlay and the JSON/SSE records come from the model
+    overlay_stage.labels = LabelCache(loaded.classes, loaded.colors)
+    detection_feed.classes = loaded.classes
+    class_filter.configure(loaded.classes, loaded.confidence)
+    try:
+        class_filter.update(
+            allow=args.only_classes.split(',') if args.only_classes else None,
+            thresholds={name: float(score) for name, _, score in
+                        (t.partition('=') for t in args.class_threshold)})
+    except ValueError as e:
+        print(f"Warning: ignoring --only-classes/--class-threshold: {e}")
+
+# The pipeline's detector (--detector picks the backend), loaded and warmed
+# up in the background so the video streams, without detections, right away.
+# With --inference-workers the parent only uses it for /snapshot?detect=1.
+detector = DetectorLoader(init_detector, on_ready=detector_ready)
+
+def detection_active():
+    return detection_enabled and detector.ready
 
 print("Initializing the drone chat...")
 
@@ -114,54 +259,94 @@ class colors:
     BLUE = "\033[34m"
     ENDC = "\033[0m"
 
-# ------------------------------------------------------------------------------
-# Flask App for Video Streaming
-# ------------------------------------------------------------------------------
-app = Flask(__name__)
-frame_buffer = None
-frame_lock = threading.Lock()
-
-def gen_frames():
-    """Generator function that yields frames for the HTTP stream."""
-    global frame_buffer
-    while True:
-        with frame_lock:
-            if frame_buffer is not None:
-                # Encode the frame as JPEG
-                ret, buffer = cv2.imencode('.jpg', frame_buffer)
-                if not ret:
-                    continue
-                # Convert to bytes and yield
-                frame_bytes = buffer.tobytes()
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-        # Add a small delay to prevent overwhelming the connection
-        time.sleep(0.03)  # ~30 fps
-
 # ------------------------------------------------------------------------------
 # Flask App for Video Streaming and Drone Control
 # ------------------------------------------------------------------------------
 app = Flask(__name__)
-frame_buffer = None
-frame_lock = threading.Lock()
 command_output = []  # Store command output for the web interface
+# Video pipeline: capture publishes raw frames at sensor rate, inference always
+# works on the newest one, and overlay draws the latest detections on every frame
+h264_relay = None
+if args.h264_passthrough:
+    # The relay owns the video port; decode only while detection is on, a
+    # recording is running or someone (local display, MJPEG/WebSocket viewer,
+    # with or without overlay) is watching decoded frames
+    h264_relay = H264Relay(args.video_port,
+                           decode=lambda: (detection_enabled or frame_bus.has_demand()
+                                           or overlay_stage.raw.has_demand() or recorder.recording))
+    capture_stage = CaptureStage(h264_relay.read_frame)
+else:
+    capture_stage = CaptureStage(lambda: frame_source.read())
+if inference_pool is not None and tiler is not None:
+    inference_stage = TiledPooledInferenceStage(capture_stage.output, inference_pool, tiler,
+                                                enabled=detection_active)
+elif inference_pool is not None:
+    inference_stage = PooledInferenceStage(capture_stage.output, inference_pool,
+                                           enabled=detection_active)
+elif args.batch_size > 1:
+    batcher = DetectionBatcher(detector, max_batch=args.batch_size,
+                               window=args.batch_window_ms / 1000.0).start()
+    inference_stage = BatchedInferenceStage(capture_stage.output, batcher,
+                                            enabled=detection_active)
+elif args.adaptive_detection:
+    inference_stage = TrackingInferenceStage(capture_stage.output, detector.detect,
+                                             BoxTracker(), AdaptiveCadence(args.target_fps),
+                                             enabled=detection_active)
+else:
+    inference_stage = InferenceStage(capture_stage.output, detector.detect,
+                                     enabled=detection_active)
+overlay_stage = OverlayStage(capture_stage.output, inference_stage.output,
+                             enabled=lambda: detection_enabled)
+frame_bus = overlay_stage.output
+# Detection records serialized once for the JSON and Server-Sent Events endpoints
+detection_feed = DetectionFeed(inference_stage.output, capture_stage.output)
+# The last few seconds of raw frames in one preallocated buffer, for instant
+# rewind (/snapshot?ago=, /clip), recording pre-roll and detection after the fact
+frame_ring = None
+if args.ring_seconds > 0:
+    frame_ring = FrameRing(capture_stage.output, args.ring_seconds, args.ring_fps, args.ring_width)
+    print(f"Frame ring: {frame_ring.slots} frames ({args.ring_seconds:g}s at {args.ring_fps:g} fps)")
+# Raw and/or annotated video to disk, started with the record_start command
+recorder = FlightRecorder({'raw': capture_stage.output, 'annotated': frame_bus},
+                          directory=args.record_dir, segment_seconds=args.record_segment,
+                          rings={'raw': frame_ring} if frame_ring is not None else None)
+# Encodes each new frame once per profile; /video_feed clients share the JPEG bytes.
+# Viewers that ask for ?overlay=0 share a second encoder on the clean frames.
+jpeg_broadcaster = JpegBroadcaster(frame_bus)
+raw_broadcaster = JpegBroadcaster(overlay_stage.raw)
+# Local window at its own refresh rate; it never blocks the pipeline
+local_preview = None
+if not args.no_local_display:
+    local_preview = LocalPreview(frame_bus, args.preview_fps,
+                                 on_quit=lambda: os.kill(os.getpid(), signal.SIGINT))
+
+# Prometheus metrics: every frame keeps its capture timestamp on each bus, so
+# per-stage latency is measured at publish time
+metrics = PipelineMetrics()
+metrics.track_bus(capture_stage.output, 'capture')
+metrics.track_bus(inference_stage.output, 'detect')
+metrics.track_bus(frame_bus, 'overlay')
+metrics.track_bus(overlay_stage.raw, 'overlay_clean')
+metrics.track_bus(jpeg_broadcaster.output, 'encode')
+metrics.track_bus(raw_broadcaster.output, 'encode_raw')
+metrics.track_bus(detection_feed.output, 'detection_feed')
+jpeg_broadcaster.on_send = metrics.record_send
+raw_broadcaster.on_send = metrics.record_send
+metrics.track_queue('recorder', lambda: recorder.queued)
+if inference_pool is not None:
+    metrics.track_queue('inference_pool', lambda: inference_pool.in_flight)
+elif args.batch_size > 1:
+    metrics.track_queue('batcher', lambda: batcher.pending)
 
-def gen_frames():
+def broadcaster_for(query):
+    """The annotated stream, or the clean one when the client asks for overlay=0."""
+    if query.get('overlay', '1').lower() in ('0', 'false', 'no', 'off'):
+        return raw_broadcaster
+    return jpeg_broadcaster
+
+def gen_frames(profile=None, broadcaster=None):
     """Generator function that yields frames for the HTTP stream."""
-    global frame_buffer
-    while True:
-        with frame_lock:
-            if frame_buffer is not None:
-                # Encode the frame as JPEG
-                ret, buffer = cv2.imencode('.jpg', frame_buffer)
-                if not ret:
-                    continue
-                # Convert to bytes and yield
-                frame_bytes = buffer.tobytes()
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-        # Add a small delay to prevent overwhelming the connection
-        time.sleep(0.03)  # ~30 fps
+    return (broadcaster or jpeg_broadcaster).gen_multipart(profile)
 
 @app.route('/')
 def index():
@@ -467,6 +652,8 @@ def index():
                         <button class="command-button" onclick="sendCommand('rotate_clockwise 90')">Rotate CW 90°</button>
                         <button class="command-button" onclick="sendCommand('rotate_counter_clockwise 90')">Rotate CCW 90°</button>
                         <button class="command-button" onclick="sendCommand('streamoff')">Stop Stream</button>
+                        <button class="command-button" onclick="sendCommand('record_start')">Start Recording</button>
+                        <button class="command-button" onclick="sendCommand('record_stop')">Stop Recording</button>
                     </div>
                 </div>
         <div class="status-bar">
@@ -602,10 +789,228 @@ def index():
 
 @app.route('/video_feed')
 def video_feed():
-    """Route that returns the video stream."""
-    return Response(gen_frames(),
+    """Route that returns the video stream.
+
+    Optional query parameters pick the stream profile: profile=full|medium|low,
+    or width, quality and fps directly (e.g. /video_feed?width=480&quality=60&fps=10).
+    overlay=0 gives the clean feed without detection boxes.
+    """
+    return Response(gen_frames(profile_from_args(request.args), broadcaster_for(request.args)),
                    mimetype='multipart/x-mixed-replace; boundary=frame')
 
+@app.route('/video_feed.mp4')
+def video_feed_mp4():
+    """The drone's own H.264 stream remuxed to fragmented MP4, without detection overlays."""
+    if h264_relay is None or not h264_relay.remuxing:
+        return jsonify({'status': 'error',
+                        'message': 'H.264 passthrough not enabled (start with --h264-passthrough)'}), 404
+    if not h264_relay.wait_for_init(timeout=5.0):
+        return jsonify({'status': 'error',
+                        'message': 'No H.264 stream to relay yet (waiting for SPS/PPS from the drone)'}), 503
+    return Response(h264_relay.gen_fmp4(), mimetype='video/mp4',
+                    headers={'Cache-Control': 'no-cache'})
+
+if Sock is not None:
+    sock = Sock(app)
+
+    @sock.route('/video_ws')
+    def video_ws(ws):
+        """Binary JPEG frames over a WebSocket; the client acks each frame's
+        sequence number before the next (newest) frame is sent."""
+        broadcaster_for(request.args).serve_websocket(ws, profile_from_args(request.args))
+else:
+    print("Warning: flask-sock not installed, /video_ws WebSocket endpoint disabled.")
+
+# Separate detector for frames from the ring; the pipeline's own detector
+# belongs to the inference thread (except with --inference-workers). Only
+# created once the pipeline's detector is ready, so it's tuned the same way.
+analysis_detector = detector if inference_pool is not None else None
+analysis_lock = threading.Lock()
+
+def detect_past_frame(image):
+    global analysis_detector
+    with analysis_lock:
+        if analysis_detector is None:
+            analysis_detector = tiled(make_detector())
+        return analysis_detector.detect(image)
+
+def serve_still(profile, broadcaster):
+    """The current frame as a JPEG with ETag/Last-Modified, or 304 if the
+    client already has it. Encodes go through the shared cache, so any number
+    of pollers cost one encode per new frame."""
+    frame = broadcaster.snapshot()
+    if frame is None:
+        return jsonify({'status': 'error', 'message': 'No frame yet'}), 404
+    etag = broadcaster.etag(frame, profile)
+    last_modified = datetime.fromtimestamp(frame.timestamp, timezone.utc)
+    headers = {
+        'ETag': f'"{etag}"',
+        'Last-Modified': http_date(last_modified),
+        # Revalidate on every poll; the 304 path costs no encode
+        'Cache-Control': 'no-cache',
+        'X-Frame-Seq': str(frame.seq),
+    }
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return Response(status=304, headers=headers)
+    jpeg = broadcaster.cache.get(frame, profile)
+    if jpeg is None:
+        return jsonify({'status': 'error', 'message': 'Encoding failed'}), 500
+    return Response(jpeg, mimetype='image/jpeg', headers=headers)
+
+@app.route('/snapshot.jpg')
+def snapshot_jpg():
+    """The current video frame as a full-size JPEG (supports conditional GET)."""
+    broadcaster = broadcaster_for(request.args)
+    return serve_still(broadcaster.default_profile, broadcaster)
+
+@app.route('/thumbnail.jpg')
+def thumbnail_jpg():
+    """The current video frame as a small JPEG (supports conditional GET)."""
+    return serve_still(THUMBNAIL_PROFILE, broadcaster_for(request.args))
+
+@app.route('/snapshot')
+def snapshot():
+    """A past frame from the in-memory ring as JPEG, e.g. /snapshot?ago=3s.
+
+    With detect=1 the detector is run on that frame and the boxes are drawn.
+    """
+    if frame_ring is None:
+        return jsonify({'status': 'error', 'message': 'Frame ring disabled (--ring-seconds 0)'}), 404
+    try:
+        ago = parse_duration(request.args.get('ago'))
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    frame = frame_ring.get(ago)
+    if frame is None:
+        return jsonify({'status': 'error',
+                        'message': f'No frame from {ago:g}s ago (the ring holds {args.ring_seconds:g}s)'}), 404
+    headers = {'X-Frame-Seq': str(frame.seq), 'X-Frame-Timestamp': f'{frame.timestamp:.6f}',
+               'Cache-Control': 'no-cache'}
+    image = frame.image
+    if request.args.get('detect', type=int):
+        if not detector.ready:
+            return jsonify({'status': 'error', 'message': f'Detector not ready ({detector.state})'}), 503
+        detections = detect_past_frame(image)
+        draw_overlay(image, detections, overlay_stage.labels)
+        headers['X-Detections'] = json.dumps(
+            detections_to_records(detections, detector.detector.classes))
+    return Response(encode_jpeg(image, DEFAULT_PROFILE), mimetype='image/jpeg', headers=headers)
+
+@app.route('/clip')
+def clip():
+    """The frames from the ring as an MP4 clip, e.g. /clip?seconds=5&ago=10s."""
+    if frame_ring is None:
+        return jsonify({'status': 'error', 'message': 'Frame ring disabled (--ring-seconds 0)'}), 404
+    try:
+        seconds = parse_duration(request.args.get('seconds'), default=args.ring_seconds)
+        ago = parse_duration(request.args.get('ago'))
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    # cv2.VideoWriter can only write to a file
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'clip.mp4')
+        writer = None
+        count = 0
+        for frame in frame_ring.clip(seconds, ago):
+            if writer is None:
+                (h, w) = frame.image.shape[:2]
+                writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), args.ring_fps, (w, h))
+            writer.write(frame.image)
+            count += 1
+        if writer is None:
+            return jsonify({'status': 'error', 'message': 'No frames in that window'}), 404
+        writer.release()
+        with open(path, 'rb') as f:
+            data = f.read()
+    return Response(data, mimetype='video/mp4',
+                    headers={'Content-Disposition': 'attachment; filename="clip.mp4"',
+                             'X-Frame-Count': str(count)})
+
+@app.route('/detections/latest')
+def detections_latest():
+    """Newest detection record as JSON."""
+    payload = detection_feed.latest_json()
+    if payload is None:
+        return jsonify({'status': 'error', 'message': 'No detections yet'}), 404
+    return Response(payload, mimetype='application/json')
+
+@app.route('/detections/filter', methods=['GET', 'POST'])
+def detections_filter():
+    """Get or change the class allow-list and per-class minimum scores.
+
+    POST a JSON object with any of "classes" (names to keep, null for all),
+    "thresholds" ({name: score}, null score for the default) and
+    "confidence" (the default minimum score). Takes effect on the next frame.
+    """
+    if request.method == 'POST':
+        if not detector.ready:
+            return jsonify({'status': 'error', 'message': f'Detector not ready ({detector.state})'}), 503
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'status': 'error', 'message': 'Expected a JSON object'}), 400
+        try:
+            class_filter.update(allow=data.get('classes', False), thresholds=data.get('thresholds'),
+                                confidence=data.get('confidence'))
+        except (ValueError, TypeError) as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+    return jsonify(dict(class_filter.to_dict(), status='success'))
+
+@app.route('/detections/stream')
+def detections_stream():
+    """Per-frame detection records as Server-Sent Events."""
+    return Response(detection_feed.gen_events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/stats')
+def stats():
+    """Frame sequence and per-consumer dropped/duplicate counters."""
+    stats = {
+        'source': frame_source.stats(),
+        'detector': dict(detector.stats(), tuning=tuning),
+        'filter': class_filter.to_dict(),
+        'raw': capture_stage.output.stats(),
+        'detections': inference_stage.output.stats(),
+        'frames': frame_bus.stats(),
+        'clean': overlay_stage.raw.stats(),
+        'jpeg': jpeg_broadcaster.output.stats(),
+        'encoder': jpeg_broadcaster.stats(),
+        'jpeg_raw': raw_broadcaster.output.stats(),
+        'encoder_raw': raw_broadcaster.stats(),
+        'labels': overlay_stage.labels.stats(),
+        'detection_feed': detection_feed.output.stats(),
+        'recorder': recorder.stats(),
+    }
+    if frame_ring is not None:
+        stats['ring'] = frame_ring.stats()
+    if h264_relay is not None:
+        stats['h264'] = h264_relay.stats()
+    if local_preview is not None:
+        stats['preview'] = local_preview.stats()
+    if isinstance(inference_stage, TrackingInferenceStage):
+        # Current detect-every-N cadence and tracker drift
+        stats['tracking'] = inference_stage.stats()
+    if inference_pool is not None:
+        stats['inference_pool'] = inference_pool.stats()
+    if inference_stage.error is not None:
+        stats['inference_error'] = inference_stage.error
+    return jsonify(stats)
+
+@app.route('/ready')
+def ready():
+    """Detector readiness: 200 once it is loaded and warmed up, 503 before
+    (or once detection has stopped because every inference worker failed)."""
+    stats = detector.stats()
+    status = 'ready' if detector.ready else ('error' if detector.state == 'failed' else 'loading')
+    if inference_stage.error is not None:
+        status = 'error'
+        stats['error'] = inference_stage.error
+    return jsonify(dict(stats, status=status)), 200 if status == 'ready' else 503
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Pipeline latency, rates, queue depths and client lag in Prometheus text format."""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/execute_command', methods=['POST'])
 def execute_command():
     """Execute a drone command directly."""
@@ -626,6 +1031,10 @@ def execute_command():
             except Exception as e:
                 return jsonify({'status': 'error', 'message': str(e)})
         
+        # Everything except the video pipeline commands needs the drone
+        if tello is None and not (command == 'toggle_detection' or command.startswith('record_')):
+            return jsonify({'status': 'error', 'message': f'No drone connected (video source: {args.source})'})
+
         # Handle regular drone commands
         if command == 'battery':
             result = tello.get_battery()
@@ -694,6 +1103,22 @@ def execute_command():
             detection_enabled = not detection_enabled
             status = "enabled" if detection_enabled else "disabled"
             return jsonify({'status': 'success', 'result': f'Object detection {status}'})
+        elif command == 'record_start' or command.startswith('record_start '):
+            # Optional sources: "record_start raw", "record_start annotated", default both;
+            # "preroll=5s" also writes the last 5 seconds from the frame ring first
+            options = command.split(' ')[1:]
+            kinds = [o for o in options if not o.startswith('preroll=')]
+            preroll = sum(parse_duration(o[len('preroll='):]) for o in options if o.startswith('preroll='))
+            session = recorder.start_recording(kinds, preroll=preroll)
+            return jsonify({'status': 'success',
+                            'result': f'Recording {session} to {os.path.join(args.record_dir, session)}'})
+        elif command == 'record_stop':
+            session = recorder.stop_recording()
+            if session is None:
+                return jsonify({'status': 'error', 'message': 'Not recording'})
+            stats = recorder.stats()
+            return jsonify({'status': 'success',
+                            'result': f'Recording {session} stopped ({stats["dropped"]} frames dropped in total)'})
         else:
             return jsonify({'status': 'error', 'message': f'Unknown command: {command}'})
     except Exception as e:
@@ -728,13 +1153,21 @@ def ask_assistant():
 # ------------------------------------------------------------------------------
 # Connect to Tello drone and start video streaming
 # ------------------------------------------------------------------------------
-print("Connecting to Tello drone...")
-tello = Tello()
-tello.connect()
-print("Battery:", tello.get_battery())
+tello = None
+if args.source == 'tello':
+    print("Connecting to Tello drone...")
+    tello = Tello()
+    tello.connect()
+    print("Battery:", tello.get_battery())
 
-# Start video streaming immediately
-tello.streamon()
+    # Start video streaming immediately
+    tello.streamon()
+else:
+    print(f"No drone connected; video comes from {args.source}")
+    if args.h264_passthrough:
+        print(f"H.264 passthrough listens on UDP port {args.video_port} (e.g. replay_h264.py)")
+frame_source = open_source(args.source, fps=args.source_fps, loop=not args.no_loop,
+                           realtime=not args.as_fast_as_possible, tello=tello)
 
 # ------------------------------------------------------------------------------
 # Define the interactive chatbot loop (to be run in a separate thread)
@@ -772,7 +1205,8 @@ def chatbot_loop():
                 except Exception as e:
                     print("Error executing code:", e)
                 print("Execution complete!\n")
-                print("Battery:", tello.get_battery())
+                if tello is not None:
+                    print("Battery:", tello.get_battery())
         except EOFError:
             # Handle Ctrl+D gracefully
             break
@@ -783,94 +1217,35 @@ def chatbot_loop():
     print("Chatbot loop exiting...")
 
 # ------------------------------------------------------------------------------
-# Define the frame capture function (to run in its own thread)
-# ------------------------------------------------------------------------------
-def capture_frames():
-    global frame_buffer
-    while True:
-        # Get the raw frame from drone
-        frame = tello.get_frame_read().frame
-        
-        if frame is not None:
-            # Always make a copy of the frame to avoid modifying the original
-            processed_frame = frame.copy()
-            
-            # Only perform detection if enabled
-            if detection_enabled:
-                # Resize the frame for detection
-                processed_frame = imutils.resize(processed_frame, width=400)
-                
-                # Get frame dimensions and create a blob for the neural network
-                (h, w) = processed_frame.shape[:2]
-                blob = cv2.dnn.blobFromImage(cv2.resize(processed_frame, (300, 300)),
-                    0.007843, (300, 300), 127.5)
-                
-                # Pass the blob through the network and get detections
-                net.setInput(blob)
-                detections = net.forward()
-                
-                # Process each detection
-                for i in np.arange(0, detections.shape[2]):
-                    # Extract the confidence of the prediction
-                    confidence = detections[0, 0, i, 2]
-                    
-                    # Filter out weak detections
-                    if confidence > 0.2:
-                        # Get the class index and bounding box coordinates
-                        idx = int(detections[0, 0, i, 1])
-                        box = detections[0, 0, i, 3:7] * np.array([w, h, w, h])
-                        (startX, startY, endX, endY) = box.astype("int")
-                        
-                        # Draw the prediction on the frame
-                        label = "{}: {:.2f}%".format(CLASSES[idx], confidence * 100)
-                        cv2.rectangle(processed_frame, (startX, startY), (endX, endY),
-                            COLORS[idx], 2)
-                        y = startY - 15 if startY - 15 > 15 else startY + 15
-                        cv2.putText(processed_frame, label, (startX, y),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, COLORS[idx], 2)
-            
-            # Update the frame buffer with either the processed frame (if detection enabled)
-            # or the original frame (if detection disabled)
-            with frame_lock:
-                frame_buffer = processed_frame
-        
-        # Small delay to prevent maxing out CPU
-        time.sleep(0.01)
-# ------------------------------------------------------------------------------
 # Define the main function to manage program flow
 # ------------------------------------------------------------------------------
 def main():
-    global frame_buffer
-    
-    # Start the frame capture thread
-    capture_thread = threading.Thread(target=capture_frames, daemon=True)
-    capture_thread.start()
+    # Load and warm up the detector in the background; video streams
+    # without detections until it is ready
+    detector.start()
+    # Start the video pipeline stages and the JPEG encoder
+    if h264_relay is not None:
+        # The relay owns the video port, so djitellopy's reader must not start
+        h264_relay.start()
+    else:
+        frame_source.start()
+    capture_stage.start()
+    inference_stage.start()
+    overlay_stage.start()
+    jpeg_broadcaster.start()
+    raw_broadcaster.start()
+    detection_feed.start()
+    if frame_ring is not None:
+        frame_ring.start()
+    recorder.start()
     
     # Start the chatbot thread
     chat_thread = threading.Thread(target=chatbot_loop, daemon=True)
     chat_thread.start()
     
-    # Display local window in main thread if enabled (avoids macOS OpenCV issues)
-    if not args.no_local_display:
-        def display_window():
-            while True:
-                try:
-                    with frame_lock:
-                        if frame_buffer is not None:
-                            cv2.imshow('Tello Video (Local)', frame_buffer)
-                    # Short wait for key press and window updates
-                    key = cv2.waitKey(1) & 0xFF
-                    if key == ord('q'):
-                        os.kill(os.getpid(), signal.SIGINT)
-                        break
-                except Exception as e:
-                    print(f"Display error: {e}")
-                    break
-            cv2.destroyAllWindows()
-        
-        # Start display in a separate thread
-        display_thread = threading.Thread(target=display_window, daemon=True)
-        display_thread.start()
+    # Local display window on its own thread; press q in it to quit
+    if local_preview is not None:
+        local_preview.start()
     
     try:
         # Start the Flask server in the main thread
@@ -882,13 +1257,25 @@ def main():
         print("\nShutdown requested... exiting")
     finally:
         # Clean up - land the drone and close connections
-        print("Landing drone and exiting...")
-        try:
-            tello.land()
-            time.sleep(1)
-            tello.end()
-        except Exception as e:
-            print(f"Error during shutdown: {e}")
+        if tello is not None:
+            print("Landing drone and exiting...")
+            try:
+                tello.land()
+                time.sleep(1)
+                tello.end()
+            except Exception as e:
+                print(f"Error during shutdown: {e}")
+        frame_source.stop()
+        if inference_pool is not None:
+            # The stage writes frames into the pool's shared ring; stop it first
+            inference_stage.stop()
+            inference_pool.stop()
+        if h264_relay is not None:
+            h264_relay.stop()
+        # Finish writing queued frames so the files are playable
+        recorder.stop_recording(wait=True)
+        if local_preview is not None:
+            local_preview.stop()
         cv2.destroyAllWindows()
 
 # Start the program
@@ -11,6 +11,8 @@ from djitellopy import Tello
 from flask import Flask, Response, render_template_string, request, jsonify
 import numpy as np
 import imutils
+from frame_bus import FrameBus
+from video_stream import JpegBroadcaster
 from vector_store import DroneCommandVectorStore
 import os
 
@@ -182,54 +184,19 @@ class colors:
     BLUE = "\033[34m"
     ENDC = "\033[0m"
 
-# ------------------------------------------------------------------------------
-# Flask App for Video Streaming
-# ------------------------------------------------------------------------------
-app = Flask(__name__)
-frame_buffer = None
-frame_lock = threading.Lock()
-
-def gen_frames():
-    """Generator function that yields frames for the HTTP stream."""
-    global frame_buffer
-    while True:
-        with frame_lock:
-            if frame_buffer is not None:
-                # Encode the frame as JPEG
-                ret, buffer = cv2.imencode('.jpg', frame_buffer)
-                if not ret:
-                    continue
-                # Convert to bytes and yield
-                frame_bytes = buffer.tobytes()
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-        # Add a small delay to prevent overwhelming the connection
-        time.sleep(0.03)  # ~30 fps
-
 # ------------------------------------------------------------------------------
 # Flask App for Video Streaming and Drone Control
 # ------------------------------------------------------------------------------
 app = Flask(__name__)
-frame_buffer = None
-frame_lock = threading.Lock()
 command_output = []  # Store command output for the web interface
+# Frames published by capture_frames; consumers wake as soon as a new one lands
+frame_bus = FrameBus('output')
+# Encodes each new frame once; every /video_feed client shares the JPEG bytes
+jpeg_broadcaster = JpegBroadcaster(frame_bus)
 
 def gen_frames():
     """Generator function that yields frames for the HTTP stream."""
-    global frame_buffer
-    while True:
-        with frame_lock:
-            if frame_buffer is not None:
-                # Encode the frame as JPEG
-                ret, buffer = cv2.imencode('.jpg', frame_buffer)
-                if not ret:
-                    continue
-                # Convert to bytes and yield
-                frame_bytes = buffer.tobytes()
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-        # Add a small delay to prevent overwhelming the connection
-        time.sleep(0.03)  # ~30 fps
+    return jpeg_broadcaster.gen_multipart()
 
 @app.route('/')
 def index():
@@ -597,6 +564,14 @@ def video_feed():
     return Response(gen_frames(),
                    mimetype='multipart/x-mixed-replace; boundary=frame')
 
+@app.route('/stats')
+def stats():
+    """Frame sequence and per-consumer dropped/duplicate counters."""
+    return jsonify({
+        'frames': frame_bus.stats(),
+        'jpeg': jpeg_broadcaster.output.stats(),
+    })
+
 @app.route('/execute_command', methods=['POST'])
 def execute_command():
     """Execute a drone command directly."""
@@ -777,11 +752,17 @@ def chatbot_loop():
 # Define the frame capture function (to run in its own thread)
 # ------------------------------------------------------------------------------
 def capture_frames():
-    global frame_buffer
+    frame_read = tello.get_frame_read()
+    last_frame = None
     while True:
-        # Get the raw frame from drone
-        frame = tello.get_frame_read().frame
-        
+        # Get the raw frame from drone. djitellopy swaps in a new array for every
+        # decoded frame, so an unchanged reference means nothing new has arrived.
+        frame = frame_read.frame
+        if frame is None or frame is last_frame:
+            time.sleep(0.002)
+            continue
+        last_frame = frame
+
         if frame is not None:
             # Always make a copy of the frame to avoid modifying the original
             processed_frame = frame.copy()
@@ -820,21 +801,17 @@ def capture_frames():
                         cv2.putText(processed_frame, label, (startX, y),
                             cv2.FONT_HERSHEY_SIMPLEX, 0.5, COLORS[idx], 2)
             
-            # Update the frame buffer with either the processed frame (if detection enabled)
+            # Publish either the processed frame (if detection enabled)
             # or the original frame (if detection disabled)
-            with frame_lock:
-                frame_buffer = processed_frame
-        
-        # Small delay to prevent maxing out CPU
-        time.sleep(0.01)
+            frame_bus.publish(processed_frame)
 # ------------------------------------------------------------------------------
 # Define the main function to manage program flow
 # ------------------------------------------------------------------------------
 def main():
     initialize_vector_store()
-    global frame_buffer
-    
-    # Start the frame capture thread
+
+    # Start the JPEG encoder and the frame capture thread
+    jpeg_broadcaster.start()
     capture_thread = threading.Thread(target=capture_frames, daemon=True)
     capture_thread.start()
     
@@ -845,11 +822,13 @@ def main():
     # Display local window in main thread if enabled (avoids macOS OpenCV issues)
     if not args.no_local_display:
         def display_window():
+            consumer = frame_bus.subscribe('local-display')
             while True:
                 try:
-                    with frame_lock:
-                        if frame_buffer is not None:
-                            cv2.imshow('Tello Video (Local)', frame_buffer)
+                    # Wait for the next frame; the timeout keeps the GUI responsive
+                    frame = consumer.next(timeout=0.03)
+                    if frame is not None:
+                        cv2.imshow('Tello Video (Local)', frame.image)
                     # Short wait for key press and window updates
                     key = cv2.waitKey(1) & 0xFF
                     if key == ord('q'):
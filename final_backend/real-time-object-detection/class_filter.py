@@ -0,0 +1,91 @@
+# class_filter.py
+import multiprocessing as mp
+import threading
+
+import numpy as np
+
+# Room for any detector's class ids (COCO has 80, Pascal VOC 21)
+MAX_CLASSES = 1024
+
+
+class ClassFilter:
+    """Runtime class allow-list and per-class minimum scores.
+
+    The settings are compiled into `thresholds`, one minimum score per class
+    id (np.inf for classes that aren't allowed), which detectors index with
+    the network's class ids to drop everything unwanted in one vectorized
+    mask, before any drawing or serialization. The array lives in shared
+    memory, so detectors in forked inference workers see updates too; create
+    the filter before the workers are started, and configure() it with the
+    detector's classes before detecting (until then nothing passes).
+    """
+
+    def __init__(self, capacity=MAX_CLASSES):
+        self.thresholds = np.frombuffer(mp.RawArray('f', capacity), dtype=np.float32)
+        self.thresholds[:] = np.inf
+        self.classes = None
+        self.confidence = None
+        self.allow = None
+        self.class_thresholds = {}
+        self._lock = threading.Lock()
+
+    def configure(self, classes, confidence):
+        """Set the detector's class names and default confidence."""
+        with self._lock:
+            self.classes = list(classes)
+            self.confidence = confidence
+            self._compile()
+
+    def update(self, allow=False, thresholds=None, confidence=None):
+        """Change the filter; arguments left out keep their current value.
+
+        `allow` is a list of class names to keep (None keeps every class),
+        `thresholds` maps class names to a minimum score (None for the
+        default) and `confidence` is the default minimum score. Raises
+        ValueError for unknown class names or scores outside [0, 1].
+        """
+        with self._lock:
+            if self.classes is None:
+                raise ValueError("The detector's classes aren't known yet")
+            known = set(self.classes)
+            if isinstance(allow, str):
+                raise ValueError("Classes must be a list of names")
+            if allow is not False:
+                unknown = sorted(set(allow or []) - known)
+                if unknown:
+                    raise ValueError(f"Unknown classes: {', '.join(unknown)}")
+                allow = set(allow) if allow is not None else None
+            thresholds = dict(thresholds or {})
+            unknown = sorted(set(thresholds) - known)
+            if unknown:
+                raise ValueError(f"Unknown classes: {', '.join(unknown)}")
+            for score in list(thresholds.values()) + [confidence]:
+                if score is not None and not 0 <= score <= 1:
+                    raise ValueError(f"Scores must be between 0 and 1, got {score}")
+
+            if allow is not False:
+                self.allow = allow
+            for name, score in thresholds.items():
+                if score is None:
+                    self.class_thresholds.pop(name, None)
+                else:
+                    self.class_thresholds[name] = float(score)
+            if confidence is not None:
+                self.confidence = float(confidence)
+            self._compile()
+
+    def _compile(self):
+        thresholds = np.full(len(self.thresholds), np.inf, dtype=np.float32)
+        for class_id, name in enumerate(self.classes):
+            if self.allow is None or name in self.allow:
+                thresholds[class_id] = self.class_thresholds.get(name, self.confidence)
+        # One copy into the shared array; a frame in flight sees the old or
+        # new score per class
+        self.thresholds[:] = thresholds
+
+    def to_dict(self):
+        return {
+            'confidence': self.confidence,
+            'classes': sorted(self.allow) if self.allow is not None else None,
+            'thresholds': dict(self.class_thresholds),
+        }
@@ -0,0 +1,172 @@
+# detection.py
+import cv2
+import numpy as np
+
+# Initialize the classes and colors for object detection
+CLASSES = ["background", "aeroplane", "bicycle", "bird", "boat",
+    "bottle", "bus", "car", "cat", "chair", "cow", "diningtable",
+    "dog", "horse", "motorbike", "person", "pottedplant", "sheep",
+    "sofa", "train", "tvmonitor"]
+COLORS = np.random.uniform(0, 255, size=(len(CLASSES), 3))
+
+PROTOTXT = 'MobileNetSSD_deploy.prototxt.txt'
+MODEL = 'MobileNetSSD_deploy.caffemodel'
+
+# Network input: 300x300, (pixel - mean) * scale. blobFromImage(..., 127.5)
+# treats the scalar mean as (127.5, 0, 0), so the model has always been fed
+# that; Preprocessor keeps the exact same input.
+INPUT_SIZE = (300, 300)
+INPUT_SCALE = 0.007843
+INPUT_MEAN = (127.5, 0.0, 0.0)
+
+
+# One row per detection, in pixel coordinates of the frame it was found in
+DETECTION_DTYPE = np.dtype([
+    ('class_id', np.int32),
+    ('score', np.float32),
+    ('x1', np.int32),
+    ('y1', np.int32),
+    ('x2', np.int32),
+    ('y2', np.int32),
+])
+
+
+def load_net(prototxt=PROTOTXT, model=MODEL):
+    """Load the MobileNet SSD Caffe model."""
+    return cv2.dnn.readNetFromCaffe(prototxt, model)
+
+
+def score_mask(class_ids, scores, confidence):
+    """Which detections score above the minimum for their class.
+
+    `confidence` is either one minimum score for every class or an array of
+    per-class minimum scores indexed by class id (e.g. a ClassFilter's
+    thresholds, np.inf to drop a class); ids outside the array are dropped.
+    """
+    if np.ndim(confidence) == 0:
+        return scores > confidence
+    valid = (class_ids >= 0) & (class_ids < len(confidence))
+    return valid & (scores > confidence[np.where(valid, class_ids, 0)])
+
+
+def postprocess(rows, width, height, confidence=0.2, num_classes=len(CLASSES)):
+    """Turn raw SSD output rows into a DETECTION_DTYPE array in one pass.
+
+    `rows` is anything that reshapes to (N, 7) rows of
+    (image_id, class, score, x1, y1, x2, y2) with normalized coordinates,
+    e.g. the (1, 1, N, 7) array from net.forward(). Weak detections (see
+    score_mask() for per-class minimum scores) and background or unknown
+    class ids (0 or >= `num_classes`, the detector's class count) are masked
+    out, and boxes are scaled to width x height and clipped to the frame.
+    """
+    rows = np.asarray(rows, dtype=np.float32).reshape(-1, 7)
+    class_ids = rows[:, 1].astype(np.int32)
+    keep = score_mask(class_ids, rows[:, 2], confidence) & (class_ids > 0) & (class_ids < num_classes)
+    rows = rows[keep]
+
+    boxes = rows[:, 3:7] * np.array([width, height, width, height], dtype=np.float32)
+    np.clip(boxes, 0, np.array([width - 1, height - 1, width - 1, height - 1], dtype=np.float32),
+            out=boxes)
+
+    out = np.empty(len(rows), dtype=DETECTION_DTYPE)
+    out['class_id'] = class_ids[keep]
+    out['score'] = rows[:, 2]
+    boxes = boxes.astype(np.int32)
+    out['x1'] = boxes[:, 0]
+    out['y1'] = boxes[:, 1]
+    out['x2'] = boxes[:, 2]
+    out['y2'] = boxes[:, 3]
+    return out
+
+
+class Preprocessor:
+    """Builds the network input tensor without per-frame allocations.
+
+    Each frame is resized straight from the source into a reusable 300x300
+    buffer and converted into a preallocated NCHW float32 blob in place, which
+    replaces the copy / resize / resize / blobFromImage chain. The returned
+    blob is overwritten by the next call, so use one Preprocessor per thread.
+    """
+
+    def __init__(self, batch_size=1, size=INPUT_SIZE, scale=INPUT_SCALE, mean=INPUT_MEAN):
+        self.size = size
+        self.scale = scale
+        self.mean = np.array(mean, dtype=np.float32).reshape(3, 1, 1)
+        self.resized = np.empty((size[1], size[0], 3), dtype=np.uint8)
+        self.blob = np.empty((batch_size, 3, size[1], size[0]), dtype=np.float32)
+
+    def reserve(self, batch_size):
+        """Make room for `batch_size` frames, keeping any already loaded."""
+        if batch_size > len(self.blob):
+            # Grow once for a larger batch; the buffer is reused from then on
+            blob = np.empty((batch_size,) + self.blob.shape[1:], dtype=np.float32)
+            blob[:len(self.blob)] = self.blob
+            self.blob = blob
+
+    def load(self, index, frame):
+        """Write frame into position `index` of the batch blob."""
+        self.reserve(index + 1)
+        if frame.shape[:2] == (self.size[1], self.size[0]):
+            resized = frame
+        else:
+            resized = cv2.resize(frame, self.size, dst=self.resized)
+        dst = self.blob[index]
+        np.copyto(dst, resized.transpose(2, 0, 1), casting='unsafe')
+        dst -= self.mean
+        dst *= self.scale
+
+    def __call__(self, frame):
+        """Return a (1, 3, 300, 300) blob for a single frame."""
+        self.load(0, frame)
+        return self.blob[:1]
+
+    def batch(self, frames):
+        """Return an (N, 3, 300, 300) blob for a list of frames."""
+        self.reserve(len(frames))
+        for i, frame in enumerate(frames):
+            self.load(i, frame)
+        return self.blob[:len(frames)]
+
+
+def detect_objects(net, frame, confidence=0.2, preprocessor=None, num_classes=len(CLASSES)):
+    """Run MobileNet SSD on a frame and return a DETECTION_DTYPE array."""
+    (h, w) = frame.shape[:2]
+    if preprocessor is not None:
+        blob = preprocessor(frame)
+    else:
+        blob = cv2.dnn.blobFromImage(cv2.resize(frame, INPUT_SIZE),
+            INPUT_SCALE, INPUT_SIZE, 127.5)
+    net.setInput(blob)
+    return postprocess(net.forward(), w, h, confidence, num_classes)
+
+
+def detect_batch(net, frames, confidence=0.2, preprocessor=None, num_classes=len(CLASSES)):
+    """Run MobileNet SSD on several frames in one forward pass.
+
+    Frames may come from different streams and have different sizes. Returns
+    one DETECTION_DTYPE array per input frame, in input order.
+    """
+    if preprocessor is not None:
+        blob = preprocessor.batch(frames)
+    else:
+        blob = cv2.dnn.blobFromImages(frames, INPUT_SCALE, INPUT_SIZE, 127.5)
+    net.setInput(blob)
+    rows = net.forward().reshape(-1, 7)
+
+    # Each row starts with the index of its image in the batch; scatter on it
+    image_ids = rows[:, 0].astype(np.int32)
+    results = []
+    for i, frame in enumerate(frames):
+        (h, w) = frame.shape[:2]
+        results.append(postprocess(rows[image_ids == i], w, h, confidence, num_classes))
+    return results
+
+
+def detections_to_records(detections, classes=CLASSES):
+    """Convert a DETECTION_DTYPE array into JSON-friendly dicts."""
+    return [
+        {'class_id': class_id, 'label': classes[class_id], 'score': round(score, 4),
+         'box': [x1, y1, x2, y2]}
+        for class_id, score, x1, y1, x2, y2 in detections.tolist()
+    ]
+
@@ -0,0 +1,69 @@
+# detection_feed.py
+import json
+import threading
+
+from detection import CLASSES, detections_to_records
+from frame_bus import FrameBus
+
+
+class DetectionFeed:
+    """Serializes each detection result once and shares it with every subscriber.
+
+    Consumes the inference stage's detections bus and publishes, on `output`,
+    a (json_bytes, sse_bytes) pair per result: the JSON record for
+    /detections/latest and the same record framed as a Server-Sent Event for
+    /detections/stream. Records carry the frame sequence number and capture
+    timestamp of the frame the detections belong to. Labels come from
+    `classes`, the detector's class names.
+    """
+
+    def __init__(self, detections, frames, classes=CLASSES):
+        self.detections = detections
+        self.frames = frames
+        self.classes = classes
+        self.output = FrameBus('detections-json')
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        consumer = self.detections.subscribe('detection-feed')
+        while True:
+            result = consumer.next()
+            frame = self.frames.latest()
+            (height, width) = frame.image.shape[:2] if frame is not None else (None, None)
+            record = {
+                'seq': result.seq,
+                'timestamp': result.timestamp,
+                'width': width,
+                'height': height,
+                'detections': detections_to_records(result.image, self.classes),
+            }
+            payload = json.dumps(record, separators=(',', ':')).encode()
+            event = b'id: %d\ndata: %s\n\n' % (result.seq, payload)
+            self.output.publish((payload, event), result.timestamp, result.seq)
+
+    def latest_json(self):
+        """JSON bytes of the newest record, or None before the first detection."""
+        latest = self.output.latest()
+        return latest.image[0] if latest is not None else None
+
+    def gen_events(self, name='sse-client'):
+        """Generator yielding Server-Sent Events for a single HTTP client."""
+        consumer = self.output.subscribe(name)
+        try:
+            # Tell the browser how soon to reconnect if the stream drops
+            yield b'retry: 1000\n\n'
+            while True:
+                record = consumer.next(timeout=15.0)
+                if record is None:
+                    # Comment line as keep-alive so proxies don't close the stream
+                    yield b': keep-alive\n\n'
+                    continue
+                yield record.image[1]
+        finally:
+            consumer.close()
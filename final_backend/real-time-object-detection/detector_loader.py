@@ -0,0 +1,93 @@
+# detector_loader.py
+import threading
+import time
+
+from autotune import warmup_frames
+
+
+class DetectorLoader:
+    """Loads a Detector on a background thread and warms it up.
+
+    The first forward passes of a freshly loaded model are several times
+    slower than steady state, so a few warm-up inferences are run before the
+    detector is reported ready. Until then `ready` is False and the pipeline
+    keeps streaming frames without detections. Once ready, detect() and
+    detect_batch() go to the loaded detector, so the loader can stand in for
+    it wherever a detector is expected.
+    """
+
+    def __init__(self, create_detector, warmup=3, on_ready=None):
+        self.create_detector = create_detector
+        self.warmup = warmup
+        self.on_ready = on_ready
+        self.detector = None
+        self.state = 'pending'
+        self.error = None
+        self.load_seconds = None
+        self.warmup_ms = []
+        self._ready = threading.Event()
+        self._thread = None
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def wait(self, timeout=None):
+        """Block until the detector is ready; False on timeout or failure."""
+        return self._ready.wait(timeout)
+
+    def _run(self):
+        try:
+            self.state = 'loading'
+            start = time.perf_counter()
+            detector = self.create_detector()
+            self.load_seconds = time.perf_counter() - start
+
+            self.state = 'warming up'
+            for frame in warmup_frames(self.warmup):
+                start = time.perf_counter()
+                detector.detect(frame)
+                self.warmup_ms.append((time.perf_counter() - start) * 1000)
+        except Exception as e:
+            self.state = 'failed'
+            self.error = str(e)
+            print(f"Detector failed to load: {e}")
+            return
+
+        self.detector = detector
+        if self.on_ready is not None:
+            self.on_ready(detector)
+        self.state = 'ready'
+        self._ready.set()
+        warmup = ', '.join(f'{ms:.0f}' for ms in self.warmup_ms)
+        print(f"Detector ready: {detector.name} ({len(detector.classes)} classes), "
+              f"loaded in {self.load_seconds:.1f}s, warm-up passes {warmup} ms")
+
+    def detect(self, image, size=None):
+        if not self.ready:
+            raise RuntimeError(f"Detector is not ready ({self.state})")
+        return self.detector.detect(image, size)
+
+    def detect_batch(self, images):
+        if not self.ready:
+            raise RuntimeError(f"Detector is not ready ({self.state})")
+        return self.detector.detect_batch(images)
+
+    def stats(self):
+        stats = {
+            'state': self.state,
+            'ready': self.ready,
+            'load_seconds': self.load_seconds,
+            'warmup_ms': self.warmup_ms,
+        }
+        if self.error is not None:
+            stats['error'] = self.error
+        if self.detector is not None:
+            stats.update(self.detector.describe())
+        return stats
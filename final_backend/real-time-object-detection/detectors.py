@@ -0,0 +1,289 @@
+# detectors.py
+import os
+
+import cv2
+import numpy as np
+
+from detection import (CLASSES, DETECTION_DTYPE, INPUT_SIZE, MODEL, PROTOTXT, Preprocessor,
+                       detect_batch, load_net, postprocess, score_mask)
+
+try:
+    import onnxruntime
+except ImportError:
+    onnxruntime = None
+
+YOLO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'yolo-coco')
+YOLO_CONFIG = os.path.join(YOLO_DIR, 'yolov3.cfg')
+YOLO_WEIGHTS = os.path.join(YOLO_DIR, 'yolov3.weights')
+COCO_NAMES = os.path.join(YOLO_DIR, 'coco.names')
+
+
+def load_classes(path):
+    """Class names from a text file, one per line (e.g. coco.names)."""
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def decode_yolo(boxes, scores, width, height, confidence=0.5, nms_threshold=0.4):
+    """Turn YOLO candidates into a DETECTION_DTYPE array.
+
+    `boxes` are (N, 4) normalized center-x, center-y, width, height and
+    `scores` (N, classes) per-class confidences. Each candidate keeps its best
+    class, weak ones are masked out in one pass (`confidence` may be per-class,
+    see score_mask()), and overlapping boxes of the same class are suppressed.
+    Boxes are scaled to width x height and clipped.
+    """
+    class_ids = scores.argmax(axis=1)
+    best = scores[np.arange(len(scores)), class_ids]
+    keep = score_mask(class_ids, best, confidence)
+    boxes, best, class_ids = boxes[keep], best[keep], class_ids[keep]
+
+    xyxy = np.empty((len(boxes), 4), dtype=np.float32)
+    xyxy[:, :2] = boxes[:, :2] - boxes[:, 2:] / 2
+    xyxy[:, 2:] = boxes[:, :2] + boxes[:, 2:] / 2
+    xyxy *= np.array([width, height, width, height], dtype=np.float32)
+    np.clip(xyxy, 0, np.array([width - 1, height - 1, width - 1, height - 1], dtype=np.float32),
+            out=xyxy)
+
+    if len(xyxy):
+        # Offset each class into its own region so one NMS call never
+        # suppresses a box of a different class
+        offset = (class_ids * (max(width, height) + 1))[:, None].astype(np.float32)
+        shifted = xyxy + offset
+        rects = np.column_stack([shifted[:, :2], shifted[:, 2:] - shifted[:, :2]])
+        # Weak boxes are already gone, so NMSBoxes needn't filter scores again
+        indices = np.asarray(cv2.dnn.NMSBoxes(rects.tolist(), best.tolist(), 0.0,
+                                              nms_threshold), dtype=np.int64).reshape(-1)
+        xyxy, best, class_ids = xyxy[indices], best[indices], class_ids[indices]
+
+    out = np.empty(len(xyxy), dtype=DETECTION_DTYPE)
+    out['class_id'] = class_ids
+    out['score'] = best
+    xyxy = xyxy.astype(np.int32)
+    out['x1'] = xyxy[:, 0]
+    out['y1'] = xyxy[:, 1]
+    out['x2'] = xyxy[:, 2]
+    out['y2'] = xyxy[:, 3]
+    return out
+
+
+class Detector:
+    """Common interface for the object detection backends.
+
+    detect(image) returns a DETECTION_DTYPE array in the image's pixel
+    coordinates, with class ids indexing `classes`. When the image has
+    already been resized (e.g. to `input_size`), pass the original frame's
+    (width, height) as `size` to get boxes for the original frame. Detectors
+    reuse their input buffers, so use one per thread.
+    """
+
+    name = 'detector'
+    # Network input (width, height); frames of this size skip the resize
+    input_size = INPUT_SIZE
+    # Per-class minimum scores indexed by class id (e.g. a ClassFilter's
+    # thresholds), used instead of `confidence` when set
+    thresholds = None
+
+    def __init__(self, classes, confidence):
+        self.classes = list(classes)
+        self.confidence = confidence
+        self.colors = np.random.uniform(0, 255, size=(len(self.classes), 3))
+
+    @property
+    def min_score(self):
+        """What detect() masks the network output with: `thresholds` or `confidence`."""
+        return self.confidence if self.thresholds is None else self.thresholds
+
+    def detect(self, image, size=None):
+        raise NotImplementedError
+
+    def detect_batch(self, images):
+        """Detect on several images; one DETECTION_DTYPE array per image."""
+        return [self.detect(image) for image in images]
+
+    def describe(self):
+        return {'detector': self.name, 'classes': len(self.classes),
+                'input_size': list(self.input_size), 'confidence': self.confidence}
+
+
+class DnnDetector(Detector):
+    """A detector running on cv2.dnn, whose backend and target can be chosen."""
+
+    net = None
+
+    def configure(self, backend, target):
+        """Run on this cv2.dnn backend and target (e.g. DNN_BACKEND_OPENCV,
+        DNN_TARGET_CPU); takes effect on the next forward pass."""
+        self.net.setPreferableBackend(backend)
+        self.net.setPreferableTarget(target)
+
+
+class SSDDetector(DnnDetector):
+    """The original MobileNet SSD (Caffe, Pascal VOC classes) through cv2.dnn."""
+
+    name = 'ssd'
+
+    def __init__(self, prototxt=PROTOTXT, model=MODEL, confidence=0.2, classes=None):
+        super().__init__(classes or CLASSES, confidence)
+        self.net = load_net(prototxt, model)
+        self.preprocessor = Preprocessor()
+        self.batch_preprocessor = Preprocessor()
+
+    def detect(self, image, size=None):
+        (width, height) = size or (image.shape[1], image.shape[0])
+        self.net.setInput(self.preprocessor(image))
+        return postprocess(self.net.forward(), width, height, self.min_score, len(self.classes))
+
+    def detect_batch(self, images):
+        # One batched forward pass
+        return detect_batch(self.net, images, self.min_score, self.batch_preprocessor,
+                            len(self.classes))
+
+
+class YoloDetector(DnnDetector):
+    """YOLO (Darknet cfg + weights, COCO classes) through cv2.dnn."""
+
+    name = 'yolo'
+    input_size = (416, 416)
+
+    def __init__(self, config=YOLO_CONFIG, weights=YOLO_WEIGHTS, confidence=0.5, classes=None,
+                 nms_threshold=0.4, input_size=None):
+        if not hasattr(cv2.dnn, 'readNetFromDarknet'):
+            raise RuntimeError("This OpenCV has no Darknet importer (removed in OpenCV 5); "
+                               "use OpenCV 4.x or an ONNX export with onnx:MODEL.onnx")
+        super().__init__(classes or load_classes(COCO_NAMES), confidence)
+        self.net = cv2.dnn.readNetFromDarknet(config, weights)
+        self.output_names = self.net.getUnconnectedOutLayersNames()
+        self.nms_threshold = nms_threshold
+        if input_size is not None:
+            self.input_size = tuple(input_size)
+
+    def detect(self, image, size=None):
+        (width, height) = size or (image.shape[1], image.shape[0])
+        blob = cv2.dnn.blobFromImage(image, 1 / 255.0, self.input_size, swapRB=True, crop=False)
+        self.net.setInput(blob)
+        # Rows of (cx, cy, w, h, objectness, per-class scores); cv2.dnn
+        # already multiplies the class scores by the objectness
+        rows = np.concatenate([out.reshape(-1, out.shape[-1])
+                               for out in self.net.forward(self.output_names)])
+        return decode_yolo(rows[:, :4], rows[:, 5:], width, height,
+                           self.min_score, self.nms_threshold)
+
+
+class OnnxDetector(Detector):
+    """An ONNX model run by ONNX Runtime on the CPU.
+
+    Two output layouts are understood, picked from the output shape: SSD rows
+    of (image_id, class, score, x1, y1, x2, y2), as from an ONNX export of the
+    MobileNet SSD, and YOLO exports of (cx, cy, w, h[, objectness], class
+    scores...) in input pixels, either as (1, N, C) (YOLOv5) or (1, C, N)
+    (YOLOv8). SSD models get the same input as SSDDetector; YOLO models RGB
+    scaled to [0, 1].
+    """
+
+    name = 'onnx'
+    input_size = (640, 640)
+
+    def __init__(self, model, confidence=None, classes=None, nms_threshold=0.45, threads=None):
+        if onnxruntime is None:
+            raise RuntimeError("onnxruntime is not installed (pip install onnxruntime)")
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(model, options,
+                                                    providers=['CPUExecutionProvider'])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        (height, width) = model_input.shape[2:4]
+        if isinstance(width, int) and isinstance(height, int):
+            self.input_size = (width, height)
+        output_shape = self.session.get_outputs()[0].shape
+        self.layout = 'ssd' if output_shape[-1] == 7 else 'yolo'
+        if self.layout == 'ssd':
+            default_classes, default_confidence = CLASSES, 0.2
+            self.preprocessor = Preprocessor(size=self.input_size)
+        else:
+            default_classes, default_confidence = load_classes(COCO_NAMES), 0.5
+            self.blob = np.empty((1, 3, self.input_size[1], self.input_size[0]), dtype=np.float32)
+        super().__init__(classes or default_classes,
+                         confidence if confidence is not None else default_confidence)
+        self.nms_threshold = nms_threshold
+
+    def _yolo_input(self, image):
+        resized = cv2.resize(image, self.input_size)
+        # BGR HWC uint8 -> RGB CHW float32 in [0, 1], into the reused blob
+        np.copyto(self.blob[0], resized[:, :, ::-1].transpose(2, 0, 1), casting='unsafe')
+        self.blob *= 1 / 255.0
+        return self.blob
+
+    def detect(self, image, size=None):
+        (width, height) = size or (image.shape[1], image.shape[0])
+        if self.layout == 'ssd':
+            rows = self.session.run(None, {self.input_name: self.preprocessor(image)})[0]
+            return postprocess(rows, width, height, self.min_score, len(self.classes))
+
+        out = self.session.run(None, {self.input_name: self._yolo_input(image)})[0][0]
+        columns = (4 + len(self.classes), 5 + len(self.classes))
+        if out.shape[1] not in columns:
+            # YOLOv8 puts candidates last
+            out = out.T
+        boxes = out[:, :4] / np.array(self.input_size * 2, dtype=np.float32)
+        if out.shape[1] == columns[1]:
+            scores = out[:, 5:] * out[:, 4:5]
+        else:
+            scores = out[:, 4:]
+        return decode_yolo(boxes, scores, width, height, self.min_score, self.nms_threshold)
+
+    def describe(self):
+        info = super().describe()
+        info['layout'] = self.layout
+        return info
+
+
+DETECTORS = {
+    'ssd': SSDDetector,
+    'yolo': YoloDetector,
+    'onnx': OnnxDetector,
+}
+
+
+def detector_class(spec):
+    kind = spec.partition(':')[0]
+    if kind not in DETECTORS:
+        raise ValueError(f"Unknown detector '{spec}' (use ssd, yolo[:WEIGHTS] or onnx:MODEL.onnx)")
+    return DETECTORS[kind]
+
+
+def model_files(spec):
+    """The model files a detector spec loads, e.g. to fingerprint the model."""
+    cls = detector_class(spec)
+    value = spec.partition(':')[2]
+    if cls is SSDDetector:
+        return [PROTOTXT, MODEL]
+    if cls is YoloDetector:
+        return [YOLO_CONFIG, value or YOLO_WEIGHTS]
+    return [value]
+
+
+def create_detector(spec='ssd', confidence=None, classes=None):
+    """Create a Detector from a command-line spec:
+
+    ssd, yolo[:WEIGHTS], onnx:MODEL.onnx
+
+    `classes` is an optional path to a class-names file, for models not
+    trained on the default classes.
+    """
+    cls = detector_class(spec)
+    value = spec.partition(':')[2]
+    kwargs = {}
+    if confidence is not None:
+        kwargs['confidence'] = confidence
+    if classes:
+        kwargs['classes'] = load_classes(classes)
+    if cls is YoloDetector and value:
+        kwargs['weights'] = value
+    if cls is OnnxDetector:
+        if not value:
+            raise ValueError("onnx detector needs a model path, e.g. onnx:yolov8n.onnx")
+        return OnnxDetector(value, **kwargs)
+    return cls(**kwargs)
@@ -0,0 +1,149 @@
+# frame_bus.py
+import threading
+import time
+from collections import namedtuple
+
+# A published frame. `image` is never modified after publishing, so consumers
+# can hold on to it without copying or locking.
+Frame = namedtuple('Frame', ['seq', 'timestamp', 'image'])
+
+
+class FrameBus:
+    """Latest-frame channel between pipeline stages.
+
+    Every publish gets a monotonically increasing sequence number and wakes the
+    consumers waiting on it, so nobody has to sleep-poll for new frames. Only
+    the newest frame is kept; slow consumers skip ahead and count the frames
+    they missed.
+    """
+
+    def __init__(self, name='frames'):
+        self.name = name
+        self._cond = threading.Condition()
+        self._latest = None
+        self._consumers = []
+        self.published = 0
+        # Optional callable(frame) run after every publish (e.g. metrics)
+        self.on_publish = None
+
+    @property
+    def seq(self):
+        """Sequence number of the newest frame (0 before the first publish)."""
+        latest = self._latest
+        return latest.seq if latest is not None else 0
+
+    def publish(self, image, timestamp=None, seq=None):
+        """Publish a new frame and wake all waiting consumers.
+
+        `seq` lets a derived stage (encoder, overlay) keep the sequence number
+        of the source frame it was built from.
+        """
+        with self._cond:
+            if seq is None:
+                seq = self.seq + 1
+            frame = Frame(seq, timestamp if timestamp is not None else time.time(), image)
+            self._latest = frame
+            self.published += 1
+            self._cond.notify_all()
+        if self.on_publish is not None:
+            self.on_publish(frame)
+        return frame
+
+    def latest(self):
+        """Return the newest Frame (or None) without waiting."""
+        return self._latest
+
+    def wait_newer(self, seq, timeout=None):
+        """Block until a frame newer than `seq` exists. Returns None on timeout."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.seq > seq, timeout):
+                return None
+            return self._latest
+
+    def subscribe(self, name, active=None):
+        """Create a consumer that tracks its own received/dropped/duplicate counts.
+
+        `active` is an optional callable telling whether the consumer currently
+        needs frames (e.g. an encoder with no viewers doesn't); see has_demand().
+        """
+        consumer = FrameConsumer(self, name, active)
+        with self._cond:
+            self._consumers.append(consumer)
+        return consumer
+
+    def unsubscribe(self, consumer):
+        with self._cond:
+            if consumer in self._consumers:
+                self._consumers.remove(consumer)
+
+    def has_demand(self):
+        """True if at least one consumer currently needs frames, so producers
+        can skip work nobody will look at."""
+        with self._cond:
+            consumers = list(self._consumers)
+        return any(c.active is None or c.active() for c in consumers)
+
+    def stats(self):
+        """Return published count and per-consumer counters as a dict."""
+        with self._cond:
+            consumers = list(self._consumers)
+        return {
+            'name': self.name,
+            'seq': self.seq,
+            'published': self.published,
+            'consumers': [c.stats() for c in consumers],
+        }
+
+
+class FrameConsumer:
+    """One reader of a FrameBus with its own position and counters."""
+
+    def __init__(self, bus, name, active=None):
+        self.bus = bus
+        self.name = name
+        self.active = active
+        self.last_seq = 0
+        self.received = 0
+        self.dropped = 0
+        self.duplicates = 0
+        # Seconds from capture until the last frame was delivered, for
+        # consumers that send frames on (set by the sender)
+        self.lag = None
+
+    def next(self, timeout=None):
+        """Wait for the next frame newer than the last one seen. None on timeout."""
+        frame = self.bus.wait_newer(self.last_seq, timeout)
+        if frame is not None:
+            self._account(frame)
+        return frame
+
+    def poll(self):
+        """Return the newest frame without waiting, counting it as a duplicate
+        if it was already seen."""
+        frame = self.bus.latest()
+        if frame is None:
+            return None
+        if frame.seq == self.last_seq:
+            self.duplicates += 1
+        else:
+            self._account(frame)
+        return frame
+
+    def _account(self, frame):
+        if self.last_seq:
+            self.dropped += max(frame.seq - self.last_seq - 1, 0)
+        self.received += 1
+        self.last_seq = frame.seq
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+    def stats(self):
+        return {
+            'name': self.name,
+            'last_seq': self.last_seq,
+            'received': self.received,
+            'dropped': self.dropped,
+            'duplicates': self.duplicates,
+            'lag': self.lag,
+        }
@@ -0,0 +1,140 @@
+# frame_ring.py
+import math
+import re
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from frame_bus import Frame
+
+
+def parse_duration(text, default=0.0):
+    """Parse '3s', '1500ms', '0.5' (seconds) or None into seconds."""
+    if text is None or text == '':
+        return default
+    match = re.fullmatch(r'\s*([0-9]*\.?[0-9]+)\s*(ms|s)?\s*', str(text))
+    if not match:
+        raise ValueError(f"Invalid duration '{text}' (use e.g. 3s or 1500ms)")
+    value = float(match.group(1))
+    return value / 1000.0 if match.group(2) == 'ms' else value
+
+
+class FrameRing:
+    """The last `seconds` of frames from a FrameBus in one preallocated array.
+
+    Frames are stored at up to `fps` (optionally scaled down to `width`) into
+    a fixed (slots, height, width, 3) buffer that is allocated once, from the
+    first frame's size, so memory use never changes after that. Readers get
+    copies and never block the writer: a slot's sequence number is cleared
+    while it is being overwritten, and a copy whose slot changed underneath it
+    is discarded.
+    """
+
+    def __init__(self, source, seconds=10.0, fps=10.0, width=None):
+        self.source = source
+        self.seconds = seconds
+        self.fps = fps
+        self.width = width
+        self.slots = max(1, math.ceil(seconds * fps))
+        self.frames = None
+        self.seqs = np.zeros(self.slots, dtype=np.int64)
+        self.timestamps = np.zeros(self.slots, dtype=np.float64)
+        self._next = 0
+        self._last_timestamp = 0.0
+        self._thread = None
+        self.written = 0
+
+    @property
+    def nbytes(self):
+        """Bytes held by the ring (0 until the first frame arrives)."""
+        frames = self.frames.nbytes if self.frames is not None else 0
+        return frames + self.seqs.nbytes + self.timestamps.nbytes
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        consumer = self.source.subscribe('ring')
+        interval = 1.0 / self.fps
+        while True:
+            frame = consumer.next()
+            # Allow a little jitter so a 30 fps source isn't stored at 14 fps for fps=15
+            if frame.timestamp - self._last_timestamp < interval * 0.9:
+                continue
+            self._last_timestamp = frame.timestamp
+            self._store(frame)
+
+    def _allocate(self, image):
+        (h, w) = image.shape[:2]
+        if self.width and self.width < w:
+            (w, h) = (self.width, max(1, round(h * self.width / w)))
+        self.frames = np.zeros((self.slots, h, w, 3), dtype=np.uint8)
+
+    def _store(self, frame):
+        if self.frames is None:
+            self._allocate(frame.image)
+        slot = self._next
+        # Invalidate the slot first so readers copying it notice the overwrite
+        self.seqs[slot] = 0
+        dst = self.frames[slot]
+        if frame.image.shape == dst.shape:
+            np.copyto(dst, frame.image)
+        else:
+            cv2.resize(frame.image, (dst.shape[1], dst.shape[0]), dst=dst,
+                       interpolation=cv2.INTER_AREA)
+        self.timestamps[slot] = frame.timestamp
+        self.seqs[slot] = frame.seq
+        self._next = (slot + 1) % self.slots
+        self.written += 1
+
+    def _read(self, slot, seq):
+        """Copy slot out as a Frame, or None if it was overwritten meanwhile."""
+        timestamp = float(self.timestamps[slot])
+        image = self.frames[slot].copy()
+        if self.seqs[slot] != seq:
+            return None
+        return Frame(int(seq), timestamp, image)
+
+    def _ordered_slots(self, start, end):
+        """Slots holding frames captured in [start, end], oldest first."""
+        seqs = self.seqs.copy()
+        timestamps = self.timestamps.copy()
+        slots = np.flatnonzero((seqs > 0) & (timestamps >= start) & (timestamps <= end))
+        return [(int(s), int(seqs[s])) for s in slots[np.argsort(seqs[slots])]]
+
+    def get(self, ago=0.0):
+        """Return a copy of the frame captured closest to, but not after,
+        `ago` seconds ago, or None if the ring doesn't reach back that far."""
+        target = time.time() - ago
+        for slot, seq in reversed(self._ordered_slots(0.0, target)):
+            frame = self._read(slot, seq)
+            if frame is not None:
+                return frame
+        return None
+
+    def clip(self, seconds, ago=0.0):
+        """Yield copies of the frames from the `seconds` before `ago` seconds
+        ago, oldest first. Frames overwritten while iterating are skipped."""
+        end = time.time() - ago
+        for slot, seq in self._ordered_slots(end - seconds, end):
+            frame = self._read(slot, seq)
+            if frame is not None:
+                yield frame
+
+    def stats(self):
+        valid = self.seqs > 0
+        oldest = float(self.timestamps[valid].min()) if valid.any() else None
+        return {
+            'slots': self.slots,
+            'filled': int(valid.sum()),
+            'fps': self.fps,
+            'shape': list(self.frames.shape[1:]) if self.frames is not None else None,
+            'bytes': self.nbytes,
+            'covers_seconds': time.time() - oldest if oldest is not None else 0.0,
+            'written': self.written,
+        }
@@ -0,0 +1,213 @@
+# frame_sources.py
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+class FrameSource:
+    """Where the pipeline's BGR frames come from.
+
+    read() returns the newest frame or None, never blocking, and hands out a
+    new array for every new frame (CaptureStage relies on that to spot new
+    frames). Subclasses implement _grab(), which returns the next frame or None
+    at the end of the stream, and this class runs it on a thread.
+
+    With `realtime`, frames are paced at `fps` (if set). Otherwise the
+    next frame is produced as soon as the previous one has been read, so a
+    benchmark sees every frame as fast as the pipeline can take them.
+    """
+
+    name = 'source'
+
+    def __init__(self, fps=None, realtime=True):
+        self.fps = fps
+        self.realtime = realtime
+        self.frames = 0
+        self.finished = False
+        self._frame = None
+        self._taken = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._taken.set()
+
+    def read(self):
+        frame = self._frame
+        if frame is not None:
+            self._taken.set()
+        return frame
+
+    def _grab(self):
+        raise NotImplementedError
+
+    def _run(self):
+        next_time = time.monotonic()
+        while not self._stopped.is_set():
+            frame = self._grab()
+            if frame is None:
+                break
+            if not self.realtime:
+                # Wait until the previous frame has been picked up
+                if self._frame is not None:
+                    self._taken.wait()
+                self._taken.clear()
+            elif self.fps:
+                next_time += 1.0 / self.fps
+                delay = next_time - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    # Fell behind (slow decode); don't try to catch up with a burst
+                    next_time = time.monotonic()
+            self._frame = frame
+            self.frames += 1
+        self.finished = True
+        self._release()
+
+    def _release(self):
+        pass
+
+    def stats(self):
+        return {'source': self.name, 'frames': self.frames, 'finished': self.finished}
+
+
+class TelloSource(FrameSource):
+    """Frames from a Tello via djitellopy, which decodes on its own thread."""
+
+    name = 'tello'
+
+    def __init__(self, tello=None):
+        super().__init__()
+        if tello is None:
+            from djitellopy import Tello
+            tello = Tello()
+            tello.connect()
+        self.tello = tello
+        self._reader = None
+
+    def start(self):
+        if self._reader is None:
+            if not self.tello.stream_on:
+                self.tello.streamon()
+            self._reader = self.tello.get_frame_read()
+        return self
+
+    def read(self):
+        frame = self._reader.frame if self._reader is not None else None
+        if frame is not None and frame is not self._frame:
+            self._frame = frame
+            self.frames += 1
+        return frame
+
+
+class WebcamSource(FrameSource):
+    """Frames from a local camera; the camera sets the pace."""
+
+    name = 'webcam'
+
+    def __init__(self, index=0):
+        super().__init__()
+        self.capture = cv2.VideoCapture(index)
+        if not self.capture.isOpened():
+            raise RuntimeError(f"Could not open camera {index}")
+
+    def _grab(self):
+        ok, frame = self.capture.read()
+        return frame if ok else None
+
+    def _release(self):
+        self.capture.release()
+
+
+class FileSource(FrameSource):
+    """Frames from a video file, optionally looping.
+
+    In realtime mode frames come at the file's own frame rate (or `fps` if
+    given); otherwise as fast as they are read.
+    """
+
+    name = 'file'
+
+    def __init__(self, path, loop=True, realtime=True, fps=None):
+        self.path = path
+        self.loop = loop
+        self.capture = cv2.VideoCapture(path)
+        if not self.capture.isOpened():
+            raise RuntimeError(f"Could not open video file {path}")
+        super().__init__(fps or self.capture.get(cv2.CAP_PROP_FPS) or 30.0, realtime)
+
+    def _grab(self):
+        ok, frame = self.capture.read()
+        if not ok and self.loop:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self.capture.read()
+        return frame if ok else None
+
+    def _release(self):
+        self.capture.release()
+
+
+class SyntheticSource(FrameSource):
+    """Generated test pattern: a gradient with moving boxes and a frame counter.
+
+    Needs no hardware or files, so it is handy for soak tests and benchmarks.
+    """
+
+    name = 'synthetic'
+
+    def __init__(self, width=960, height=720, fps=30.0, realtime=True):
+        super().__init__(fps, realtime)
+        self.width = width
+        self.height = height
+        x = np.linspace(0, 255, width, dtype=np.float32)
+        y = np.linspace(0, 255, height, dtype=np.float32)
+        self._background = np.empty((height, width, 3), dtype=np.uint8)
+        self._background[..., 0] = x[None, :]
+        self._background[..., 1] = y[:, None]
+        self._background[..., 2] = 128
+
+    def _grab(self):
+        frame = self._background.copy()
+        n = self.frames
+        size = min(self.width, self.height) // 5
+        for i, color in enumerate([(0, 0, 255), (0, 255, 0), (255, 255, 255)]):
+            span_x = max(1, self.width - size)
+            span_y = max(1, self.height - size)
+            x = (n * (4 + 3 * i)) % (2 * span_x)
+            y = (n * (3 + 2 * i) + i * span_y // 3) % (2 * span_y)
+            # Bounce off the edges
+            x = x if x < span_x else 2 * span_x - x
+            y = y if y < span_y else 2 * span_y - y
+            cv2.rectangle(frame, (x, y), (x + size, y + size), color, -1)
+        cv2.putText(frame, str(n), (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (255, 255, 255), 2)
+        return frame
+
+
+def open_source(spec, fps=None, loop=True, realtime=True, tello=None):
+    """Create a FrameSource from a command-line spec:
+
+    tello, webcam[:INDEX], file:PATH, synthetic[:WIDTHxHEIGHT]
+    """
+    kind, _, value = spec.partition(':')
+    if kind == 'tello':
+        return TelloSource(tello)
+    if kind == 'webcam':
+        return WebcamSource(int(value or 0))
+    if kind == 'file':
+        if not value:
+            raise ValueError("file source needs a path, e.g. file:flight.mp4")
+        return FileSource(value, loop=loop, realtime=realtime, fps=fps)
+    if kind == 'synthetic':
+        (width, height) = (int(v) for v in value.split('x')) if value else (960, 720)
+        return SyntheticSource(width, height, fps or 30.0, realtime)
+    raise ValueError(f"Unknown video source '{spec}' (use tello, webcam[:N], file:PATH or synthetic[:WxH])")
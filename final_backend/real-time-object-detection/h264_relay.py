@@ -0,0 +1,180 @@
+# h264_relay.py
+import shutil
+import socket
+import struct
+import subprocess
+import threading
+
+from frame_bus import FrameBus
+
+try:
+    import av
+except ImportError:
+    av = None
+
+
+def read_boxes(stream):
+    """Yield (type, bytes) for each top-level MP4 box read from a binary stream."""
+    while True:
+        header = stream.read(8)
+        if len(header) < 8:
+            return
+        size, box_type = struct.unpack('>I4s', header)
+        if size == 1:
+            extended = stream.read(8)
+            size = struct.unpack('>Q', extended)[0]
+            header += extended
+        body = stream.read(size - len(header))
+        if len(body) < size - len(header):
+            return
+        yield box_type, header + body
+
+
+class H264Relay:
+    """Relays the Tello's H.264 video without decoding or re-encoding it.
+
+    The relay owns the video UDP port (djitellopy's own reader must not be
+    started). Received packets are piped through `ffmpeg -c copy` into
+    fragmented MP4: the init segment (ftyp + moov) is kept for new viewers and
+    each moof + mdat fragment is published on `output`. Fragments are cut at
+    keyframes, so a viewer can join at any fragment.
+
+    The same packets are decoded to BGR frames for the detection pipeline
+    only while `decode()` returns True; read_frame() returns the newest one.
+    """
+
+    def __init__(self, port=11111, host='0.0.0.0', decode=lambda: True,
+                 ffmpeg=None, framerate=30):
+        self.address = (host, port)
+        self.decode = decode
+        self.ffmpeg = ffmpeg or shutil.which('ffmpeg')
+        self.framerate = framerate
+        self.output = FrameBus('h264')
+        self.init_segment = None
+        self._init_ready = threading.Event()
+        self._sock = None
+        self._proc = None
+        self._codec = None
+        self._frame = None
+        self._threads = []
+        self.packets = 0
+        self.bytes = 0
+        self.decoded = 0
+
+    @property
+    def remuxing(self):
+        return self._proc is not None and self._proc.poll() is None
+
+    def start(self):
+        """Bind the UDP port and start the receive (and remux) threads."""
+        if self._sock is not None:
+            return self
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+        self._sock.bind(self.address)
+
+        if self.ffmpeg is None:
+            print("Warning: ffmpeg not found, H.264 passthrough disabled.")
+        else:
+            self._proc = subprocess.Popen(
+                [self.ffmpeg, '-loglevel', 'error', '-fflags', 'nobuffer',
+                 '-probesize', '32768', '-analyzeduration', '0',
+                 '-f', 'h264', '-framerate', str(self.framerate), '-i', 'pipe:0',
+                 '-c:v', 'copy', '-f', 'mp4', '-flush_packets', '1',
+                 '-movflags', 'frag_keyframe+empty_moov+default_base_moof', 'pipe:1'],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+            self._threads.append(threading.Thread(target=self._read_fragments, daemon=True))
+        if av is None:
+            print("Warning: PyAV not installed, H.264 frames cannot be decoded.")
+        self._threads.append(threading.Thread(target=self._receive, daemon=True))
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        if self._proc is not None:
+            self._proc.kill()
+        if self._sock is not None:
+            self._sock.close()
+
+    def _receive(self):
+        while True:
+            try:
+                data = self._sock.recv(65536)
+            except OSError:
+                break
+            self.packets += 1
+            self.bytes += len(data)
+            if self.remuxing:
+                try:
+                    self._proc.stdin.write(data)
+                    self._proc.stdin.flush()
+                except (BrokenPipeError, OSError) as e:
+                    print(f"H.264 remux error: {e}")
+            self._decode(data)
+
+    def _decode(self, data):
+        if av is None or not self.decode():
+            # Drop the decoder so it restarts cleanly at the next keyframe
+            self._codec = None
+            return
+        if self._codec is None:
+            self._codec = av.CodecContext.create('h264', 'r')
+        try:
+            for packet in self._codec.parse(data):
+                for frame in self._codec.decode(packet):
+                    self._frame = frame.to_ndarray(format='bgr24')
+                    self.decoded += 1
+        except av.error.FFmpegError:
+            # Corrupt or incomplete data (lost UDP packets); wait for the next one
+            pass
+
+    def _read_fragments(self):
+        moof = None
+        head = []
+        for box_type, box in read_boxes(self._proc.stdout):
+            if self.init_segment is None:
+                head.append(box)
+                if box_type == b'moov':
+                    self.init_segment = b''.join(head)
+                    self._init_ready.set()
+            elif box_type == b'moof':
+                moof = box
+            elif box_type == b'mdat' and moof is not None:
+                self.output.publish(moof + box)
+                moof = None
+
+    def read_frame(self):
+        """Return the newest decoded BGR frame (or None), for CaptureStage."""
+        return self._frame
+
+    def wait_for_init(self, timeout=None):
+        """Wait until ffmpeg has produced the init segment (it needs the
+        stream's SPS/PPS first); False on timeout."""
+        return self._init_ready.wait(timeout)
+
+    def gen_fmp4(self, name='mp4-viewer', init_timeout=5.0):
+        """Generator yielding a fragmented MP4 stream for one HTTP client:
+        the init segment, then every new fragment. Ends right away if there
+        is no init segment within `init_timeout` seconds."""
+        if not self.wait_for_init(init_timeout):
+            return
+        consumer = self.output.subscribe(name)
+        try:
+            yield self.init_segment
+            while True:
+                fragment = consumer.next(timeout=1.0)
+                if fragment is not None:
+                    yield fragment.image
+        finally:
+            consumer.close()
+
+    def stats(self):
+        return {
+            'packets': self.packets,
+            'bytes': self.bytes,
+            'decoded': self.decoded,
+            'decoding': self._codec is not None,
+            'remuxing': self.remuxing,
+            'fragments': self.output.seq,
+        }
@@ -0,0 +1,268 @@
+# inference_pool.py
+import itertools
+import multiprocessing as mp
+import os
+import queue
+import signal
+import threading
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from detection import DETECTION_DTYPE, INPUT_SIZE
+from tiling import offset_detections
+
+
+class SharedFrameRing:
+    """Preallocated ring of network-sized BGR frames in shared memory.
+
+    The parent resizes each frame straight into a slot; workers read the slot
+    in place, so no pixels are pickled or copied between processes.
+    """
+
+    def __init__(self, slots, shape=(INPUT_SIZE[1], INPUT_SIZE[0], 3)):
+        self.slots = slots
+        self.shape = tuple(shape)
+        self.shm = shared_memory.SharedMemory(create=True, size=slots * int(np.prod(shape)))
+        self.array = np.ndarray((slots,) + self.shape, dtype=np.uint8, buffer=self.shm.buf)
+
+    def write(self, slot, frame):
+        """Resize frame directly into the given slot."""
+        cv2.resize(frame, (self.shape[1], self.shape[0]), dst=self.array[slot])
+
+    def close(self):
+        self.array = None
+        try:
+            self.shm.close()
+        except BufferError:
+            # A view of a slot is still alive; the mapping goes with it
+            pass
+        finally:
+            self.shm.unlink()
+
+
+# Worker states in InferencePool's shared `busy` array; >= 0 is the id of
+# the task the worker is running
+LOADING = -2
+IDLE = -1
+
+
+def _worker_main(index, ring, tasks, results, busy, create_detector, threads):
+    """Worker process: load the detector once, then run it on ring slots as tasks arrive.
+
+    A task that raises gets an empty result, so its slot is always handed
+    back. busy[index] holds the id of the task being run until its result
+    has been sent, so a worker dying at any point leaves behind either the
+    result or the task id for the parent to answer.
+    """
+    # Ctrl+C is handled by the parent, which shuts the pool down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    cv2.setNumThreads(threads)
+    try:
+        detector = create_detector()
+        # The first passes are much slower than steady state; get them out of
+        # the way before taking frames (on a blank frame of our own, as the
+        # parent may already be writing into the ring)
+        blank = np.zeros(ring.shape, dtype=np.uint8)
+        for _ in range(2):
+            detector.detect(blank)
+    except Exception as e:
+        print(f"Inference worker {index} failed to load the detector: {e}")
+        return
+    busy[index] = IDLE
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        task_id, slot, width, height, x, y = task
+        busy[index] = task_id
+        try:
+            # Slots are already network-sized; boxes are scaled to the original
+            # frame (or tile) size, not the slot's, and moved by the tile's offset
+            detections = detector.detect(ring.array[slot], (width, height))
+            if x or y:
+                offset_detections(detections, x, y)
+        except Exception as e:
+            print(f"Inference worker {index} error: {e}")
+            detections = np.empty(0, dtype=DETECTION_DTYPE)
+        results.put((task_id, slot, detections))
+        busy[index] = IDLE
+
+
+class InferencePool:
+    """Object detection spread over worker processes.
+
+    Frames go through a SharedFrameRing and workers send back compact
+    DETECTION_DTYPE arrays in the original frame's pixel coordinates. Each
+    worker gets an equal share of the CPU threads, or `threads` each (e.g.
+    from autotune). `create_detector` is
+    called in each worker to load its own Detector, and `input_size` is the
+    detector's network input, which the ring slots are sized to.
+
+    Workers are forked, so start() must be called before the parent creates
+    any other threads (i.e. before connecting to the drone or starting Flask).
+    For the same reason a worker that dies (e.g. crashes in native code) is
+    not forked again: its frame is answered with no detections and the pool
+    carries on with one worker fewer. Once no worker is left, `error` is set
+    and acquire() raises instead of blocking forever.
+    """
+
+    def __init__(self, workers, create_detector, input_size=INPUT_SIZE, threads=None):
+        self.workers = workers
+        self.create_detector = create_detector
+        self.ring = SharedFrameRing(slots=workers * 2, shape=(input_size[1], input_size[0], 3))
+        self._ctx = mp.get_context('fork')
+        self._tasks = self._ctx.Queue()
+        self._results = self._ctx.Queue()
+        self._threads = threads or max(1, (os.cpu_count() or 1) // workers)
+        self._busy = self._ctx.RawArray('q', [LOADING] * workers)
+        self._procs = [self._ctx.Process(target=_worker_main, daemon=True,
+                                         args=(i, self.ring, self._tasks, self._results, self._busy,
+                                               create_detector, self._threads))
+                       for i in range(workers)]
+        self._free = queue.Queue()
+        for slot in range(self.ring.slots):
+            self._free.put(slot)
+        self._idle = threading.Semaphore(workers)
+        # Idle permits still owed by workers that died while idle
+        self._retired = 0
+        self._task_ids = itertools.count()
+        # slot -> (task id, seq, timestamp)
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._stopped = False
+        self._collector = None
+        self.on_result = None
+        self.completed = 0
+        self.lost = 0
+        self.error = None
+
+    @property
+    def in_flight(self):
+        """Frames submitted to the workers and not yet returned."""
+        return len(self._in_flight)
+
+    def start(self):
+        """Fork the workers and start collecting their results."""
+        for proc in self._procs:
+            proc.start()
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._collector.start()
+        return self
+
+    def acquire(self):
+        """Block until a worker is idle and return a free ring slot for it,
+        or None once the pool is stopped. Raises RuntimeError (with `error`)
+        once no worker is left."""
+        while not self._idle.acquire(timeout=0.5):
+            if self.error is not None:
+                raise RuntimeError(self.error)
+            if self._stopped:
+                return None
+        if self._stopped:
+            self._idle.release()
+            return None
+        return self._free.get()
+
+    def submit(self, slot, frame, seq, timestamp, offset=(0, 0)):
+        """Copy frame into the slot and queue it for the next idle worker.
+
+        `frame` may be a tile of a larger frame at (x, y) `offset`; its
+        detections then come back in the larger frame's coordinates.
+        """
+        with self._lock:
+            # Never write into the ring once stop() has released it
+            if self._stopped:
+                return
+            self.ring.write(slot, frame)
+            task_id = next(self._task_ids)
+            self._in_flight[slot] = (task_id, seq, timestamp)
+            (h, w) = frame.shape[:2]
+            self._tasks.put((task_id, slot, w, h) + tuple(offset))
+
+    def _finish(self, slot, detections, worker_alive=True):
+        """Free the slot, hand back the worker's idle permit (unless it died)
+        and pass the result on."""
+        _, seq, timestamp = self._in_flight.pop(slot)
+        self._free.put(slot)
+        if worker_alive:
+            self._release_idle()
+        if self.on_result is not None:
+            self.on_result(seq, timestamp, detections)
+
+    def _release_idle(self):
+        if self._retired:
+            self._retired -= 1
+        else:
+            self._idle.release()
+
+    def _collect(self):
+        while not self._stopped:
+            try:
+                task_id, slot, detections = self._results.get(timeout=0.5)
+            except queue.Empty:
+                self._check_workers()
+                continue
+            # A task already answered for a dead worker has nothing left in flight
+            if self._in_flight.get(slot, (None,))[0] == task_id:
+                self.completed += 1
+                self._finish(slot, detections)
+            self._check_workers()
+
+    def _check_workers(self):
+        """Answer the frame of any worker that died and retire the worker."""
+        for index, proc in enumerate(self._procs):
+            if proc is None or proc.is_alive() or self._stopped:
+                continue
+            self._procs[index] = None
+            state = self._busy[index]
+            task = next((slot for slot, (task_id, _, _) in list(self._in_flight.items())
+                         if task_id == state), None) if state >= 0 else None
+            if task is not None:
+                # Its frame is lost; answer it with no detections so the
+                # stage (and one waiting on every tile) keeps going
+                self.lost += 1
+                self._finish(task, np.empty(0, dtype=DETECTION_DTYPE), worker_alive=False)
+            elif not self._idle.acquire(blocking=False):
+                # Its idle permit is held by a stage about to submit; take the next one back
+                self._retired += 1
+            if state == LOADING:
+                print(f"Inference worker {index} exited (code {proc.exitcode}) without loading the detector")
+            else:
+                print(f"Inference worker {index} died (exit code {proc.exitcode})")
+            if not any(self._procs):
+                if state == LOADING:
+                    self.error = "No inference worker could load the detector"
+                else:
+                    self.error = "Every inference worker has died"
+                print(f"Error: {self.error}")
+
+    def stats(self):
+        return {
+            'workers': self.workers,
+            'alive': sum(proc is not None for proc in self._procs),
+            'in_flight': self.in_flight,
+            'completed': self.completed,
+            'lost': self.lost,
+            'error': self.error,
+        }
+
+    def stop(self):
+        """Stop the workers and release the shared memory.
+
+        Stop the stage feeding the pool first; any submit() still racing
+        with this is dropped rather than written into the released ring.
+        """
+        with self._lock:
+            self._stopped = True
+        procs = [proc for proc in self._procs if proc is not None]
+        for _ in procs:
+            self._tasks.put(None)
+        for proc in procs:
+            proc.join(timeout=2)
+            if proc.is_alive():
+                proc.terminate()
+        if self._collector is not None:
+            self._collector.join(timeout=2)
+        self.ring.close()
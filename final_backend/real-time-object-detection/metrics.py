@@ -0,0 +1,190 @@
+# metrics.py
+import bisect
+import threading
+import time
+
+# Seconds; covers one frame at 30 fps up to a badly stalled client
+LATENCY_BUCKETS = (0.005, 0.01, 0.02, 0.035, 0.05, 0.075, 0.1, 0.15, 0.2, 0.3, 0.5, 1.0, 2.0, 5.0)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join('{}="{}"'.format(n, str(v).replace('\\', r'\\').replace('"', r'\"'))
+                     for n, v in zip(names, values))
+    return '{' + pairs + '}'
+
+
+class Metric:
+    """Base for one Prometheus metric family; values are keyed by label values."""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, labels)} {value}'
+                for labels, value in values]
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    """A gauge that is either set directly or read from `callback` at scrape
+    time. The callback returns a number, or a dict of label tuple -> number."""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def _samples(self):
+        if self.callback is not None:
+            values = self.callback()
+            if not isinstance(values, dict):
+                values = {(): values}
+            with self._lock:
+                self._values = dict(values)
+        return super()._samples()
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # Per-bucket (non-cumulative) counts plus sum; summed up at scrape time
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][i] += 1
+            state[1] += value
+
+    def _samples(self):
+        with self._lock:
+            values = [(labels, list(counts), total) for labels, (counts, total) in self._values.items()]
+        names = self.labelnames + ('le',)
+        lines = []
+        for labels, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_format_labels(names, labels + (bound,))} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, labels)} {total}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}')
+        return lines
+
+
+class Registry:
+    """A set of metrics rendered together in the Prometheus text format."""
+
+    def __init__(self):
+        self.metrics = []
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+class PipelineMetrics:
+    """Latency, rate, queue depth and client lag metrics for the video pipeline.
+
+    Every Frame carries its capture timestamp through each bus, so a stage's
+    latency is simply the time between capture and that stage publishing the
+    frame. Recording it is one hook call per publish; everything else (queue
+    depths, per-client lag, consumer drops) is read only when /metrics is scraped.
+    """
+
+    def __init__(self):
+        self.registry = Registry()
+        self._buses = []
+        self._queues = {}
+        self._fps = {}
+        self.stage_latency = self.registry.add(Histogram(
+            'drone_stage_latency_seconds',
+            'Time from frame capture until the stage published it', ['stage']))
+        self.stage_frames = self.registry.add(Counter(
+            'drone_stage_frames_total', 'Frames published by each pipeline stage', ['stage']))
+        self.stage_fps = self.registry.add(Gauge(
+            'drone_stage_fps', 'Smoothed publish rate of each pipeline stage', ['stage'],
+            callback=lambda: {(stage, ): fps for stage, (fps, _) in self._fps.items()}))
+        self.send_lag = self.registry.add(Histogram(
+            'drone_client_send_lag_seconds',
+            'Time from frame capture until it was written to a client', ['transport']))
+        self.client_lag = self.registry.add(Gauge(
+            'drone_client_last_send_lag_seconds',
+            'Send lag of the last frame written to each connected client', ['client'],
+            callback=self._client_lags))
+        self.consumer_dropped = self.registry.add(Gauge(
+            'drone_consumer_dropped_frames', 'Frames each bus consumer skipped', ['bus', 'consumer'],
+            callback=self._consumer_drops))
+        self.queue_depth = self.registry.add(Gauge(
+            'drone_queue_depth', 'Items waiting in each pipeline queue', ['queue'],
+            callback=lambda: {(name, ): fn() for name, fn in self._queues.items()}))
+
+    def track_bus(self, bus, stage):
+        """Record latency and rate for every frame `bus` publishes."""
+        self._buses.append(bus)
+        bus.on_publish = lambda frame: self._published(stage, frame)
+
+    def track_queue(self, name, depth):
+        """Export `depth()` as the depth of queue `name`."""
+        self._queues[name] = depth
+
+    def record_send(self, transport, frame):
+        """Hook for JpegBroadcaster.on_send: one frame was written to a client."""
+        self.send_lag.observe(time.time() - frame.timestamp, transport)
+
+    def _published(self, stage, frame):
+        now = time.time()
+        self.stage_latency.observe(now - frame.timestamp, stage)
+        self.stage_frames.inc(1, stage)
+        fps, last = self._fps.get(stage, (0.0, None))
+        if last is not None and now > last:
+            fps += (1.0 / (now - last) - fps) * 0.1
+        self._fps[stage] = (fps, now)
+
+    def _client_lags(self):
+        return {(c['name'], ): c['lag'] for bus in self._buses
+                for c in bus.stats()['consumers'] if c.get('lag') is not None}
+
+    def _consumer_drops(self):
+        return {(bus.name, c['name']): c['dropped'] for bus in self._buses
+                for c in bus.stats()['consumers']}
+
+    def render(self):
+        return self.registry.render()
@@ -0,0 +1,87 @@
+# overlay.py
+import cv2
+import numpy as np
+
+from detection import CLASSES, COLORS
+
+
+class LabelCache:
+    """Pre-rendered detection labels, keyed by class and confidence bucket.
+
+    Each label ("person: 85%") is rasterized once, in its class color, into a
+    small patch plus mask; drawing it on a frame is then a single masked copy
+    instead of string formatting plus cv2.putText for every box on every
+    frame. Confidences are rounded down to `bucket` percent so the cache
+    stays small.
+    """
+
+    def __init__(self, classes=CLASSES, colors=COLORS, bucket=5,
+                 font=cv2.FONT_HERSHEY_SIMPLEX, font_scale=0.5, thickness=2):
+        self.classes = classes
+        self.colors = [tuple(int(c) for c in color) for color in colors]
+        self.bucket = bucket
+        self.font = font
+        self.font_scale = font_scale
+        self.thickness = thickness
+        self._labels = {}
+        self.renders = 0
+
+    def get(self, class_id, score):
+        """Return (patch, mask, origin) for a label; origin is the (x, y)
+        within the patch where cv2.putText's text origin falls."""
+        percent = int(score * 100) // self.bucket * self.bucket
+        key = (class_id, percent)
+        label = self._labels.get(key)
+        if label is None:
+            label = self._labels[key] = self._render(class_id, percent)
+        return label
+
+    def _render(self, class_id, percent):
+        text = f"{self.classes[class_id]}: {percent}%"
+        (w, h), baseline = cv2.getTextSize(text, self.font, self.font_scale, self.thickness)
+        # Leave room for the stroke width around the glyphs
+        pad = self.thickness
+        origin = (pad, h + pad)
+        mask = np.zeros((h + baseline + 2 * pad, w + 2 * pad), dtype=np.uint8)
+        cv2.putText(mask, text, origin, self.font, self.font_scale, 255, self.thickness)
+        # Newer OpenCV antialiases text; keep the mask hard-edged like LINE_8
+        cv2.threshold(mask, 127, 255, cv2.THRESH_BINARY, dst=mask)
+        patch = np.empty(mask.shape + (3,), dtype=np.uint8)
+        patch[:] = self.colors[class_id]
+        self.renders += 1
+        return patch, mask, origin
+
+    def stats(self):
+        return {'labels': len(self._labels), 'renders': self.renders}
+
+
+def draw_overlay(frame, detections, labels, source_size=None):
+    """Draw a DETECTION_DTYPE array onto frame in place using cached labels.
+
+    A box per detection with its label just above it (or inside, at the
+    top edge of the frame).
+    `source_size` is the (width, height) the boxes were computed for.
+    """
+    (h, w) = frame.shape[:2]
+    boxes = np.stack([detections['x1'], detections['y1'],
+                      detections['x2'], detections['y2']], axis=1)
+    if source_size is not None and source_size != (w, h):
+        scale = np.array([w / source_size[0], h / source_size[1]] * 2)
+        boxes = (boxes * scale).astype(np.int32)
+
+    for class_id, score, (x1, y1, x2, y2) in zip(detections['class_id'].tolist(),
+                                                 detections['score'].tolist(), boxes.tolist()):
+        cv2.rectangle(frame, (x1, y1), (x2, y2), labels.colors[class_id], 2)
+
+        patch, mask, (ox, oy) = labels.get(class_id, score)
+        y = y1 - 15 if y1 - 15 > 15 else y1 + 15
+        top, left = y - oy, x1 - ox
+        # Clip the label to the frame
+        mt, ml = max(0, -top), max(0, -left)
+        mb = min(mask.shape[0], h - top)
+        mr = min(mask.shape[1], w - left)
+        if mb <= mt or mr <= ml:
+            continue
+        roi = frame[top + mt:top + mb, left + ml:left + mr]
+        cv2.copyTo(patch[mt:mb, ml:mr], mask[mt:mb, ml:mr], roi)
+    return frame
@@ -0,0 +1,307 @@
+# pipeline.py
+import threading
+import time
+
+import imutils
+import numpy as np
+
+from frame_bus import FrameBus
+from overlay import LabelCache, draw_overlay
+from tiling import nms
+
+
+class CaptureStage:
+    """Publishes raw frames from a source at sensor rate.
+
+    `read_frame` is a callable returning the source's current frame (or None).
+    Sources such as djitellopy hand over a new array per decoded frame, so an
+    unchanged reference means nothing new has arrived yet.
+    """
+
+    def __init__(self, read_frame, poll_interval=0.002):
+        self.read_frame = read_frame
+        self.poll_interval = poll_interval
+        self.output = FrameBus('raw')
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        last_frame = None
+        while True:
+            frame = self.read_frame()
+            if frame is None or frame is last_frame:
+                time.sleep(self.poll_interval)
+                continue
+            last_frame = frame
+            self.output.publish(frame)
+
+
+class InferenceStage:
+    """Runs the detector on the newest raw frame, skipping any that went stale
+    while the previous inference was running.
+
+    Results are published on `output` with the sequence number and timestamp
+    of the frame they were computed from.
+    """
+
+    def __init__(self, source, detect, enabled=lambda: True):
+        self.source = source
+        self.detect = detect
+        self.enabled = enabled
+        self.output = FrameBus('detections')
+        # Why the stage stopped, if it stopped on its own
+        self.error = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        """Stop taking frames and wait for the thread to finish; it exits
+        once the frame it is waiting for or working on is done."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        consumer = self.source.subscribe('inference')
+        while not self._stopped.is_set():
+            frame = consumer.next()
+            if not self.enabled():
+                continue
+            try:
+                detections = self.detect(frame.image)
+            except Exception as e:
+                print(f"Inference error: {e}")
+                continue
+            self._publish(frame.seq, frame.timestamp, detections)
+
+    def _publish(self, seq, timestamp, detections):
+        # Results computed concurrently can finish out of order; never publish
+        # one behind a newer frame's detections
+        with self._lock:
+            if seq > self.output.seq:
+                self.output.publish(detections, timestamp, seq)
+
+
+class PooledInferenceStage(InferenceStage):
+    """InferenceStage that hands frames to an InferencePool instead of running
+    the detector on this thread.
+
+    A frame is only taken from the raw bus once a worker is idle, so every
+    worker always gets the newest frame. Results that come back out of order
+    are dropped rather than published behind a newer one. If the pool loses
+    every worker the stage stops with `error` set; the video keeps streaming
+    without detections.
+    """
+
+    def __init__(self, source, pool, enabled=lambda: True):
+        super().__init__(source, None, enabled)
+        self.pool = pool
+        self.pool.on_result = self._publish
+
+    def _acquire(self):
+        """A free pool slot, or None once the pool is stopped or has failed."""
+        try:
+            return self.pool.acquire()
+        except RuntimeError as e:
+            self.error = str(e)
+            print(f"Inference stopped: {e}")
+            return None
+
+    def _run(self):
+        consumer = self.source.subscribe('inference')
+        while not self._stopped.is_set():
+            slot = self._acquire()
+            if slot is None:
+                break
+            frame = consumer.next()
+            while not self.enabled():
+                frame = consumer.next()
+            self.pool.submit(slot, frame.image, frame.seq, frame.timestamp)
+
+
+class TiledPooledInferenceStage(PooledInferenceStage):
+    """PooledInferenceStage for tiled detection: each tile of a frame goes to
+    the next idle worker, so one frame's tiles run in parallel.
+
+    Workers return boxes already in full-frame coordinates; once all tiles
+    of a frame are back they are merged with nms() and published.
+    """
+
+    def __init__(self, source, pool, tiler, nms_threshold=0.5, enabled=lambda: True):
+        super().__init__(source, pool, enabled)
+        self.tiler = tiler
+        self.nms_threshold = nms_threshold
+        # seq -> (tiles still out, detections so far)
+        self._pending = {}
+        self.pool.on_result = self._on_result
+
+    def _run(self):
+        consumer = self.source.subscribe('inference')
+        while not self._stopped.is_set():
+            # As in PooledInferenceStage, only take a frame once a worker is idle
+            slot = self._acquire()
+            if slot is None:
+                break
+            frame = consumer.next()
+            while not self.enabled():
+                frame = consumer.next()
+            images, offsets = self.tiler.split(frame.image)
+            self._pending[frame.seq] = (len(images), [])
+            for i, (image, offset) in enumerate(zip(images, offsets)):
+                if i:
+                    slot = self._acquire()
+                    if slot is None:
+                        return
+                self.pool.submit(slot, image, frame.seq, frame.timestamp, offset)
+
+    def _on_result(self, seq, timestamp, detections):
+        remaining, results = self._pending[seq]
+        results.append(detections)
+        if remaining > 1:
+            self._pending[seq] = (remaining - 1, results)
+            return
+        del self._pending[seq]
+        self._publish(seq, timestamp, nms(np.concatenate(results), self.nms_threshold))
+
+
+class BatchedInferenceStage(InferenceStage):
+    """InferenceStage that feeds consecutive frames to a DetectionBatcher so
+    several of them share one forward pass.
+
+    At most `max_batch` frames are in flight; once they are all taken the
+    stage waits and then resumes from the newest frame.
+    """
+
+    def __init__(self, source, batcher, enabled=lambda: True):
+        super().__init__(source, None, enabled)
+        self.batcher = batcher
+        self._in_flight = threading.Semaphore(batcher.max_batch)
+
+    def _run(self):
+        consumer = self.source.subscribe('inference')
+        while not self._stopped.is_set():
+            self._in_flight.acquire()
+            frame = consumer.next()
+            while not self.enabled():
+                frame = consumer.next()
+            self.batcher.submit(frame.image,
+                                lambda detections, frame=frame: self._on_result(frame, detections))
+
+    def _on_result(self, frame, detections):
+        self._in_flight.release()
+        self._publish(frame.seq, frame.timestamp, detections)
+
+
+class TrackingInferenceStage(InferenceStage):
+    """InferenceStage that runs the detector only every N frames and lets a
+    BoxTracker carry the boxes forward on the frames in between.
+
+    N comes from an AdaptiveCadence fed with the measured detector latency
+    and the tracker's drift, so it follows the host's speed, the target
+    frame rate and how much the scene is changing.
+    """
+
+    def __init__(self, source, detect, tracker, cadence, enabled=lambda: True):
+        super().__init__(source, detect, enabled)
+        self.tracker = tracker
+        self.cadence = cadence
+
+    def _run(self):
+        consumer = self.source.subscribe('inference')
+        last_detect_seq = None
+        while not self._stopped.is_set():
+            frame = consumer.next()
+            if not self.enabled():
+                continue
+            if last_detect_seq is None or frame.seq - last_detect_seq >= self.cadence.n:
+                (h, w) = frame.image.shape[:2]
+                start = time.perf_counter()
+                try:
+                    detections = self.detect(frame.image)
+                except Exception as e:
+                    print(f"Inference error: {e}")
+                    continue
+                latency = time.perf_counter() - start
+                drift = self.tracker.update(detections, frame.timestamp, (w, h))
+                self.cadence.record(latency, drift)
+                last_detect_seq = frame.seq
+            else:
+                detections = self.tracker.predict(frame.timestamp)
+            self._publish(frame.seq, frame.timestamp, detections)
+
+    def stats(self):
+        return {'cadence': self.cadence.stats(), 'tracker': self.tracker.stats()}
+
+
+class OverlayStage:
+    """Combines every raw frame with the latest detections and publishes the
+    result for viewers.
+
+    Two display-size variants are published: `output` with the detection
+    overlay composited on, and `raw` without it, for viewers that want the
+    clean feed. Each is only produced while something downstream wants it (a
+    viewer, the local window), so an unwatched stream costs nothing and the
+    overlay is only drawn when somebody is watching it. Detections older than
+    `max_age` seconds relative to the frame are not drawn, so boxes don't
+    linger after detection is switched off and on.
+    """
+
+    def __init__(self, frames, detections, enabled=lambda: True,
+                 display_width=400, max_age=1.0, labels=None):
+        self.frames = frames
+        self.detections = detections
+        self.enabled = enabled
+        self.display_width = display_width
+        self.max_age = max_age
+        self.labels = labels if labels is not None else LabelCache()
+        self.output = FrameBus('output')
+        self.raw = FrameBus('clean')
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        consumer = self.frames.subscribe('overlay')
+        while True:
+            frame = consumer.next()
+            annotated = self.output.has_demand()
+            raw = self.raw.has_demand()
+            if not (annotated or raw):
+                continue
+            image = frame.image
+            if not self.enabled():
+                # Nothing to draw; both variants are the frame itself
+                if annotated:
+                    self.output.publish(image, frame.timestamp, frame.seq)
+                if raw:
+                    self.raw.publish(image, frame.timestamp, frame.seq)
+                continue
+            # Resize for display (this also gives us a copy to draw on)
+            (h, w) = image.shape[:2]
+            image = imutils.resize(image, width=self.display_width)
+            if raw:
+                self.raw.publish(image, frame.timestamp, frame.seq)
+            if annotated:
+                latest = self.detections.latest()
+                if latest is not None and frame.timestamp - latest.timestamp <= self.max_age:
+                    # Published images are shared, so draw on a copy of the raw one
+                    if raw:
+                        image = image.copy()
+                    draw_overlay(image, latest.image, self.labels, source_size=(w, h))
+                self.output.publish(image, frame.timestamp, frame.seq)
@@ -0,0 +1,92 @@
+# preview.py
+import threading
+import time
+
+import cv2
+
+
+class LocalPreview:
+    """Local OpenCV window showing the newest frame from a FrameBus.
+
+    The window runs at its own refresh rate: every tick it takes a reference
+    to the bus's newest frame without waiting or locking (published frames
+    are never modified) and shows it if it's new, so frames that arrive
+    between ticks are simply skipped and a slow blit never holds up capture or
+    the HTTP streams. The consumer only asks for a frame while it has none
+    waiting to be shown, so upstream stages don't render frames just for the
+    preview that it would skip anyway.
+    """
+
+    def __init__(self, source, fps=15.0, window='Tello Video (Local)', on_quit=None):
+        self.source = source
+        self.fps = fps
+        self.window = window
+        self.on_quit = on_quit
+        self.shown = 0
+        self.measured_fps = 0.0
+        self.render_ms = 0.0
+        self._shown_seq = 0
+        self._consumer = None
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        if self._thread is None:
+            self._consumer = self.source.subscribe(
+                'local-display', active=lambda: self.source.seq <= self._shown_seq)
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        interval = 1.0 / self.fps
+        next_due = time.monotonic()
+        window_start, window_shown = next_due, 0
+        try:
+            while not self._stopped.is_set():
+                frame = self._consumer.poll()
+                if frame is not None and frame.seq != self._shown_seq:
+                    start = time.perf_counter()
+                    cv2.imshow(self.window, frame.image)
+                    self.render_ms += ((time.perf_counter() - start) * 1000 - self.render_ms) * 0.1
+                    self._shown_seq = frame.seq
+                    self.shown += 1
+                    window_shown += 1
+
+                now = time.monotonic()
+                if now - window_start >= 1.0:
+                    self.measured_fps = window_shown / (now - window_start)
+                    window_start, window_shown = now, 0
+                    cv2.setWindowTitle(self.window, f'{self.window} - {self.measured_fps:.1f} fps')
+
+                # waitKey is both the sleep until the next tick and the GUI event pump
+                next_due += interval
+                delay = next_due - time.monotonic()
+                if delay < 0:
+                    # Fell behind (slow blit); skip the missed ticks instead of bursting
+                    next_due = time.monotonic()
+                    delay = 0
+                key = cv2.waitKey(max(1, int(delay * 1000))) & 0xFF
+                if key == ord('q'):
+                    if self.on_quit is not None:
+                        self.on_quit()
+                    break
+        except Exception as e:
+            print(f"Display error: {e}")
+        finally:
+            self._consumer.close()
+            cv2.destroyAllWindows()
+
+    def stats(self):
+        consumer = self._consumer.stats() if self._consumer is not None else {}
+        return {
+            'target_fps': self.fps,
+            'fps': self.measured_fps,
+            'shown': self.shown,
+            # Frames published between ticks that the window never showed
+            'skipped': consumer.get('dropped', 0),
+            'render_ms': self.render_ms,
+        }
@@ -1,14 +1,17 @@
 # USAGE
 # python real_time_object_detection.py
+# python real_time_object_detection.py --source file:flight.mp4
+# python real_time_object_detection.py --detector yolo
 
 # import the necessary packages
-from imutils.video import VideoStream
 from imutils.video import FPS
-import numpy as np
 import argparse
 import imutils
 import time
 import cv2
+from detectors import create_detector
+from frame_sources import open_source
+from overlay import LabelCache, draw_overlay
 
 # construct the argument parse and parse the arguments
 '''ap = argparse.ArgumentParser()
@@ -19,23 +22,27 @@ ap.add_argument("-m", "--model", required=True,
 ap.add_argument("-c", "--confidence", type=float, default=0.2,
 	help="minimum probability to filter weak detections")
 args = vars(ap.parse_args())'''
-
-# initialize the list of class labels MobileNet SSD was trained to
-# detect, then generate a set of bounding box colors for each class
-CLASSES = ["background", "aeroplane", "bicycle", "bird", "boat",
-	"bottle", "bus", "car", "cat", "chair", "cow", "diningtable",
-	"dog", "horse", "motorbike", "person", "pottedplant", "sheep",
-	"sofa", "train", "tvmonitor"]
-COLORS = np.random.uniform(0, 255, size=(len(CLASSES), 3))
-
-# load our serialized model from disk
+ap = argparse.ArgumentParser()
+ap.add_argument("-s", "--source", default="webcam",
+	help="video source: webcam[:INDEX], file:PATH, synthetic[:WIDTHxHEIGHT] or tello")
+ap.add_argument("--no-loop", action="store_true",
+	help="stop at the end of a file source instead of looping")
+ap.add_argument("-d", "--detector", default="ssd",
+	help="detection backend: ssd, yolo[:WEIGHTS] or onnx:MODEL.onnx")
+ap.add_argument("-c", "--confidence", type=float, default=None,
+	help="minimum probability to filter weak detections (default: the detector's)")
+args = vars(ap.parse_args())
+
+# load our serialized model from disk (class labels and box colors
+# come with the detector)
 print("[INFO] loading model...")
-net = cv2.dnn.readNetFromCaffe('MobileNetSSD_deploy.prototxt.txt', 'MobileNetSSD_deploy.caffemodel')
+detector = create_detector(args["detector"], confidence=args["confidence"])
+labels = LabelCache(detector.classes, detector.colors)
 
 # initialize the video stream, allow the cammera sensor to warmup,
 # and initialize the FPS counter
 print("[INFO] starting video stream...")
-vs = VideoStream(src=0).start()
+vs = open_source(args["source"], loop=not args["no_loop"]).start()
 time.sleep(2.0)
 fps = FPS().start()
 
@@ -43,43 +50,21 @@ fps = FPS().start()
 while True:
 	# grab the frame from the threaded video stream and resize it
 	# to have a maximum width of 400 pixels
+	# (stop when a non-looping file source has run out)
+	if vs.finished:
+		break
 	frame = vs.read()
+	if frame is None:
+		time.sleep(0.01)
+		continue
 	frame = imutils.resize(frame, width=400)
 
-	# grab the frame dimensions and convert it to a blob
-	(h, w) = frame.shape[:2]
-	blob = cv2.dnn.blobFromImage(cv2.resize(frame, (300, 300)),
-		0.007843, (300, 300), 127.5)
-
-	# pass the blob through the network and obtain the detections and
-	# predictions
-	net.setInput(blob)
-	detections = net.forward()
-
-	# loop over the detections
-	for i in np.arange(0, detections.shape[2]):
-		# extract the confidence (i.e., probability) associated with
-		# the prediction
-		confidence = detections[0, 0, i, 2]
-
-		# filter out weak detections by ensuring the `confidence` is
-		# greater than the minimum confidence
-		if confidence > 0.2:
-			# extract the index of the class label from the
-			# `detections`, then compute the (x, y)-coordinates of
-			# the bounding box for the object
-			idx = int(detections[0, 0, i, 1])
-			box = detections[0, 0, i, 3:7] * np.array([w, h, w, h])
-			(startX, startY, endX, endY) = box.astype("int")
+	# pass the frame through the network; weak detections are filtered
+	# out and boxes scaled to the frame in one vectorized pass
+	detections = detector.detect(frame)
 
-			# draw the prediction on the frame
-			label = "{}: {:.2f}%".format(CLASSES[idx],
-				confidence * 100)
-			cv2.rectangle(frame, (startX, startY), (endX, endY),
-				COLORS[idx], 2)
-			y = startY - 15 if startY - 15 > 15 else startY + 15
-			cv2.putText(frame, label, (startX, y),
-				cv2.FONT_HERSHEY_SIMPLEX, 0.5, COLORS[idx], 2)
+	# draw the predictions on the frame
+	draw_overlay(frame, detections, labels)
 
 	# show the output frame
 	cv2.imshow("Frame", frame)
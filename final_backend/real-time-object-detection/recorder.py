@@ -0,0 +1,250 @@
+# recorder.py
+import csv
+import math
+import os
+import queue
+import threading
+import time
+from collections import namedtuple
+
+import cv2
+
+
+# Queue marker asking the writer to first write the frames a FrameRing holds
+# for a source, up to and including sequence number `until_seq`
+_Preroll = namedtuple('_Preroll', ['seconds', 'until_seq'])
+
+
+class _Segment:
+    """One open video file plus its sidecar CSV index.
+
+    Frames are written on the file's fixed `fps` clock from their capture
+    timestamps: each frame is held until the next one arrives and then
+    written once per output frame due in between (none if the source runs
+    faster than `fps`), so the file plays at real speed whatever rate its
+    source runs at. After a gap of more than a second (e.g. the source
+    stalled) the clock skips ahead rather than filling the gap with copies.
+    """
+
+    def __init__(self, path, fourcc, fps, size, started):
+        self.path = path
+        self.fps = fps
+        self.size = size
+        self.started = started
+        self.frames = 0
+        self._clock = started
+        self._held = None
+        self.writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps, size)
+        self._index_file = open(os.path.splitext(path)[0] + '.csv', 'w', newline='')
+        self.index = csv.writer(self._index_file)
+        self.index.writerow(['frame', 'seq', 'timestamp'])
+
+    def write(self, frame):
+        held, self._held = self._held, frame
+        if held is None:
+            return
+        # Output frames due before this one's capture time show the held one
+        count = math.ceil((frame.timestamp - self._clock) * self.fps - 1e-6) - self.frames
+        if count > self.fps:
+            count = 1
+            self._clock = frame.timestamp - (self.frames + 1) / self.fps
+        for _ in range(count):
+            self._write(held)
+
+    def _write(self, frame):
+        self.writer.write(frame.image)
+        self.index.writerow([self.frames, frame.seq, f'{frame.timestamp:.6f}'])
+        self.frames += 1
+
+    def close(self):
+        if self._held is not None:
+            self._write(self._held)
+        self.writer.release()
+        self._index_file.close()
+
+
+class FlightRecorder:
+    """Records pipeline frames to disk without ever blocking the live path.
+
+    `sources` maps a name (e.g. 'raw', 'annotated') to a FrameBus. While
+    recording, each selected source hands its new frames to a bounded queue;
+    a single writer thread drains it into time-segmented video files, one
+    series per source, each with a CSV index of frame sequence numbers and
+    capture timestamps. When the queue is full the frame is dropped and
+    counted instead of waiting for the disk.
+
+    `rings` optionally maps a source name to a FrameRing holding its recent
+    frames, so a recording can start with a pre-roll of what just happened.
+
+    Files are written at `fps`, with frames repeated or dropped by capture
+    timestamp, so they play at real speed whether a source runs at the
+    camera's rate, the inference rate or pauses.
+    """
+
+    def __init__(self, sources, directory='recordings', segment_seconds=60.0,
+                 fps=30.0, fourcc='mp4v', extension='.mp4', queue_size=64, rings=None):
+        self.sources = sources
+        self.rings = rings or {}
+        self.directory = directory
+        self.segment_seconds = segment_seconds
+        self.fps = fps
+        self.fourcc = fourcc
+        self.extension = extension
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._session = None
+        self._kinds = ()
+        self._threads = []
+        self.written = 0
+        self.dropped = 0
+        self.segments = 0
+
+    @property
+    def recording(self):
+        return self._session is not None
+
+    @property
+    def queued(self):
+        return self._queue.qsize()
+
+    def start(self):
+        """Start the writer thread and one feeder thread per source."""
+        if not self._threads:
+            self._threads.append(threading.Thread(target=self._write_loop, daemon=True))
+            for name, bus in self.sources.items():
+                self._threads.append(threading.Thread(target=self._feed, args=(name, bus), daemon=True))
+            for thread in self._threads:
+                thread.start()
+        return self
+
+    def start_recording(self, kinds=None, preroll=0.0):
+        """Begin a new recording session of the given sources (default: all),
+        starting with up to `preroll` seconds from the sources' rings.
+        Returns the session name."""
+        kinds = tuple(kinds or self.sources)
+        unknown = [k for k in kinds if k not in self.sources]
+        if unknown:
+            raise ValueError(f"Unknown recording source(s): {', '.join(unknown)}")
+        with self._lock:
+            session = self._session = time.strftime('flight_%Y%m%d_%H%M%S')
+            self._kinds = kinds
+            if preroll > 0:
+                for name in kinds:
+                    if name in self.rings:
+                        self._queue.put((session, name, _Preroll(preroll, self.sources[name].seq)))
+        return session
+
+    def stop_recording(self, wait=False):
+        """End the current session; the writer closes its files once the
+        frames already queued are written (with `wait`, this call blocks until
+        it has). Returns the session name."""
+        with self._lock:
+            session, self._session = self._session, None
+        if session is not None:
+            self._queue.put((session, None, None))
+            if wait and self._threads:
+                self._queue.join()
+        return session
+
+    def _feed(self, name, bus):
+        # Only counts as demand (e.g. for the overlay stage) while recording this source
+        consumer = bus.subscribe(f'recorder:{name}',
+                                 active=lambda: self.recording and name in self._kinds)
+        while True:
+            frame = consumer.next(timeout=1.0)
+            session = self._session
+            if frame is None or session is None or name not in self._kinds:
+                continue
+            try:
+                self._queue.put_nowait((session, name, frame))
+            except queue.Full:
+                self.dropped += 1
+
+    def _write_loop(self):
+        open_session = None
+        segments = {}
+        last_seq = {}
+        while True:
+            session, name, frame = self._queue.get()
+            try:
+                if session != open_session:
+                    self._close(segments)
+                    last_seq.clear()
+                    open_session = session
+                if frame is None:
+                    # End-of-session marker
+                    self._close(segments)
+                    open_session = None
+                    continue
+                if isinstance(frame, _Preroll):
+                    seq = self._write_preroll(session, name, frame, segments)
+                    if seq is not None:
+                        last_seq[name] = seq
+                    continue
+                if frame.seq <= last_seq.get(name, 0):
+                    # Already written from the pre-roll
+                    continue
+                self._write(session, name, frame, segments)
+                last_seq[name] = frame.seq
+                self.written += 1
+            except Exception as e:
+                print(f"Recorder error: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _write_preroll(self, session, name, preroll, segments):
+        """Write a ring's recent frames at the recording's size.
+
+        The ring keeps frames at its own (lower) rate and possibly scaled
+        down; they are scaled to the live frames' size and, like live frames,
+        repeated on the file's clock, so the pre-roll plays at real speed in
+        the same file as the live frames that follow. Returns the sequence
+        number of the last frame written, or None.
+        """
+        ring = self.rings[name]
+        frames = [f for f in ring.clip(preroll.seconds) if f.seq <= preroll.until_seq]
+        if not frames:
+            return None
+        live = self.sources[name].latest()
+        size = (live.image.shape[1], live.image.shape[0]) if live is not None else None
+        for past in frames:
+            if size is not None and (past.image.shape[1], past.image.shape[0]) != size:
+                past = past._replace(image=cv2.resize(past.image, size))
+            self._write(session, name, past, segments)
+        self.written += len(frames)
+        return frames[-1].seq
+
+    def _write(self, session, name, frame, segments):
+        (h, w) = frame.image.shape[:2]
+        segment = segments.get(name)
+        # Roll over to a new file on schedule, or when the frame size changes
+        # (e.g. annotated frames switch size with detection on/off)
+        if segment is not None and (segment.size != (w, h)
+                                    or frame.timestamp - segment.started >= self.segment_seconds):
+            segment.close()
+            segment = None
+        if segment is None:
+            folder = os.path.join(self.directory, session)
+            os.makedirs(folder, exist_ok=True)
+            index = sum(1 for f in os.listdir(folder)
+                        if f.startswith(name + '_') and f.endswith(self.extension))
+            path = os.path.join(folder, f'{name}_{index:03d}{self.extension}')
+            segment = segments[name] = _Segment(path, self.fourcc, self.fps, (w, h), frame.timestamp)
+            self.segments += 1
+        segment.write(frame)
+
+    def _close(self, segments):
+        for segment in segments.values():
+            segment.close()
+        segments.clear()
+
+    def stats(self):
+        return {
+            'recording': self.recording,
+            'session': self._session,
+            'sources': list(self._kinds) if self.recording else [],
+            'queued': self.queued,
+            'written': self.written,
+            'dropped': self.dropped,
+            'segments': self.segments,
+        }
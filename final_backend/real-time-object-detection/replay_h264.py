@@ -0,0 +1,64 @@
+# replay_h264.py
+import argparse
+import re
+import socket
+import time
+
+# Annex B start code (3 or 4 bytes) in front of each NAL unit
+START_CODE = re.compile(b'\x00\x00\x00\x01|\x00\x00\x01')
+# NAL unit types carrying picture data: non-IDR and IDR slices
+SLICE_TYPES = (1, 5)
+
+
+def split_nal_units(data):
+    """Split an Annex B H.264 byte stream into NAL units, start codes included."""
+    starts = [m.start() for m in START_CODE.finditer(data)]
+    return [data[a:b] for a, b in zip(starts, starts[1:] + [len(data)])]
+
+
+def nal_type(unit):
+    header = unit[3] if unit[2] == 1 else unit[4]
+    return header & 0x1F
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Replay a raw .h264 recording into a UDP port the way the Tello sends it")
+    parser.add_argument("path", help="Annex B H.264 file, e.g. from `ffmpeg ... -f h264 out.h264`")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11111)
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument("--packet-size", type=int, default=1460,
+                        help="Largest UDP payload; longer NAL units are split like the drone does")
+    parser.add_argument("--loop", action="store_true", help="Start over at the end of the file")
+    args = parser.parse_args()
+
+    with open(args.path, "rb") as f:
+        units = split_nal_units(f.read())
+    if not units:
+        print(f"No H.264 NAL units found in {args.path}")
+        return
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    interval = 1.0 / args.fps
+    frames = 0
+    next_time = time.monotonic()
+    print(f"Sending {len(units)} NAL units to {args.host}:{args.port} at {args.fps:g} fps")
+    try:
+        while True:
+            for unit in units:
+                for i in range(0, len(unit), args.packet_size):
+                    sock.sendto(unit[i:i + args.packet_size], (args.host, args.port))
+                if nal_type(unit) in SLICE_TYPES:
+                    frames += 1
+                    next_time += interval
+                    time.sleep(max(0.0, next_time - time.monotonic()))
+            if not args.loop:
+                break
+    except KeyboardInterrupt:
+        pass
+    print(f"Sent {frames} frames")
+
+
+if __name__ == "__main__":
+    main()
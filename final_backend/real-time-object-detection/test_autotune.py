@@ -0,0 +1,15 @@
+# test_autotune.py
+import cv2
+
+from autotune import TARGET_NAMES, cpu_configs, dnn_constants
+
+
+def test_missing_dnn_constants_are_skipped(monkeypatch):
+    monkeypatch.delattr(cv2.dnn, 'DNN_TARGET_CPU_FP16', raising=False)
+    names = dnn_constants({'DNN_TARGET_CPU': 'cpu', 'DNN_TARGET_CPU_FP16': 'cpu_fp16'})
+    assert names == {cv2.dnn.DNN_TARGET_CPU: 'cpu'}
+
+
+def test_cpu_configs_only_use_known_targets():
+    assert cpu_configs()
+    assert all(target in TARGET_NAMES for _, target in cpu_configs())
@@ -0,0 +1,57 @@
+# test_batching.py
+import threading
+
+import numpy as np
+
+from batching import DetectionBatcher
+from detection import DETECTION_DTYPE
+
+
+class ValueDetector:
+    """One detection per image, with the image's pixel value as class id."""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.batch_sizes = []
+
+    def detect_batch(self, images):
+        self.batch_sizes.append(len(images))
+        if self.fail:
+            raise RuntimeError("forward failed")
+        return [np.array([(int(image[0, 0, 0]), 0.9, 0, 0, 1, 1)], dtype=DETECTION_DTYPE)
+                for image in images]
+
+
+def run(detector, count, max_batch=4):
+    """Submit `count` frames, then start the batcher; returns each frame's detections."""
+    batcher = DetectionBatcher(detector, max_batch=max_batch, window=0.05)
+    results = {}
+    done = threading.Semaphore(0)
+    for i in range(count):
+        def on_result(detections, i=i):
+            results[i] = detections
+            done.release()
+        batcher.submit(np.full((4, 4, 3), i + 1, dtype=np.uint8), on_result)
+    batcher.start()
+    for _ in range(count):
+        assert done.acquire(timeout=5)
+    return batcher, results
+
+
+def test_frames_share_batches_and_get_their_own_results():
+    detector = ValueDetector()
+    batcher, results = run(detector, 6)
+    assert detector.batch_sizes == [4, 2]
+    assert {i: int(d['class_id'][0]) for i, d in results.items()} == {i: i + 1 for i in range(6)}
+    assert (batcher.batches, batcher.frames) == (2, 6)
+
+
+def test_failed_batch_answers_every_frame_with_no_detections():
+    _, results = run(ValueDetector(fail=True), 3)
+    assert sorted(results) == [0, 1, 2]
+    assert all(len(d) == 0 for d in results.values())
+
+
+def test_detect_blocks_for_its_own_result():
+    batcher = DetectionBatcher(ValueDetector(), window=0.0).start()
+    assert int(batcher.detect(np.full((4, 4, 3), 9, dtype=np.uint8))['class_id'][0]) == 9
@@ -0,0 +1,37 @@
+# test_benchmark_pipeline.py
+import numpy as np
+import pytest
+
+from benchmark_pipeline import STAGES, run_stages, summarize
+from frame_sources import SyntheticSource
+from video_stream import DEFAULT_PROFILE
+
+
+class OnePersonNet:
+    """Stands in for the SSD network: one person box per frame."""
+
+    def setInput(self, blob):
+        self.blob = blob
+
+    def forward(self):
+        return np.array([[[[0, 15, 0.9, 0.1, 0.1, 0.4, 0.5]]]], dtype=np.float32)
+
+
+def test_summarize():
+    assert summarize([]) == {'count': 0}
+    stats = summarize([0.01] * 99 + [0.11])
+    assert stats['count'] == 100
+    assert stats['fps'] == pytest.approx(100 / 1.1)
+    assert stats['p50_ms'] == pytest.approx(10) and stats['max_ms'] == pytest.approx(110)
+    assert stats['mean_ms'] == pytest.approx(11)
+
+
+def test_run_stages_times_every_stage_after_warmup():
+    source = SyntheticSource(320, 240, realtime=False).start()
+    try:
+        timings = run_stages(source, OnePersonNet(), frames=5, warmup=2, confidence=0.2,
+                             display_width=160, profile=DEFAULT_PROFILE)
+    finally:
+        source.stop()
+    assert list(timings) == STAGES
+    assert all(len(samples) == 5 for samples in timings.values())
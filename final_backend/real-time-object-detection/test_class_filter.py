@@ -0,0 +1,54 @@
+# test_class_filter.py
+import numpy as np
+import pytest
+
+from class_filter import ClassFilter
+from detection import CLASSES, postprocess
+
+
+def rows(*detections):
+    """(class_id, score) pairs as SSD output rows."""
+    return np.array([[0, c, s, 0.1, 0.1, 0.5, 0.5] for c, s in detections], dtype=np.float32)
+
+
+@pytest.fixture
+def class_filter():
+    class_filter = ClassFilter()
+    class_filter.configure(CLASSES, 0.2)
+    return class_filter
+
+
+def test_nothing_passes_before_configure():
+    assert len(postprocess(rows((15, 0.99)), 100, 100, ClassFilter().thresholds)) == 0
+
+
+def test_default_confidence_applies_to_every_class(class_filter):
+    kept = postprocess(rows((15, 0.3), (7, 0.3), (7, 0.1)), 100, 100, class_filter.thresholds)
+    assert kept['class_id'].tolist() == [15, 7]
+
+
+def test_allow_list_and_per_class_thresholds(class_filter):
+    class_filter.update(allow=['person', 'car'], thresholds={'person': 0.5})
+    kept = postprocess(rows((15, 0.4), (15, 0.6), (7, 0.3), (12, 0.9)), 100, 100,
+                       class_filter.thresholds)
+    assert kept['class_id'].tolist() == [15, 7]
+    np.testing.assert_allclose(kept['score'], [0.6, 0.3])
+    assert class_filter.to_dict() == {'confidence': 0.2, 'classes': ['car', 'person'],
+                                      'thresholds': {'person': 0.5}}
+
+    # None resets the allow-list and a class's threshold
+    class_filter.update(allow=None, thresholds={'person': None})
+    assert class_filter.to_dict() == {'confidence': 0.2, 'classes': None, 'thresholds': {}}
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'allow': ['unicorn']},
+    {'allow': 'person'},
+    {'thresholds': {'person': 1.5}},
+    {'confidence': -0.1},
+])
+def test_bad_updates_change_nothing(class_filter, kwargs):
+    before = class_filter.thresholds.copy()
+    with pytest.raises(ValueError):
+        class_filter.update(**kwargs)
+    np.testing.assert_array_equal(class_filter.thresholds, before)
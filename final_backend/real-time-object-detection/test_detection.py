@@ -0,0 +1,73 @@
+# test_detection.py
+import cv2
+import numpy as np
+
+from benchmark_postprocess import fake_detections, legacy_postprocess
+from detection import (INPUT_MEAN, INPUT_SCALE, INPUT_SIZE, Preprocessor, detections_to_records,
+                       postprocess)
+
+
+def frame(value, size=INPUT_SIZE):
+    return np.full((size[1], size[0], 3), value, dtype=np.uint8)
+
+
+def expected(value):
+    return (value - np.array(INPUT_MEAN, dtype=np.float32).reshape(3, 1, 1)) * INPUT_SCALE
+
+
+def test_batch_keeps_every_image_when_growing():
+    preprocessor = Preprocessor()
+    for size in (1, 2, 3, 4, 2):
+        values = [10 * (i + 1) for i in range(size)]
+        blob = preprocessor.batch([frame(v) for v in values])
+        assert blob.shape == (size, 3, INPUT_SIZE[1], INPUT_SIZE[0])
+        for image, value in zip(blob, values):
+            np.testing.assert_allclose(image, np.broadcast_to(expected(value), image.shape),
+                                       rtol=1e-5)
+
+
+def test_batch_resizes_frames_of_other_sizes():
+    preprocessor = Preprocessor()
+    blob = preprocessor.batch([frame(50, (960, 720)), frame(200, (640, 480))])
+    np.testing.assert_allclose(blob[0], np.broadcast_to(expected(50), blob[0].shape), rtol=1e-5)
+    np.testing.assert_allclose(blob[1], np.broadcast_to(expected(200), blob[1].shape), rtol=1e-5)
+
+
+def test_single_frame_matches_blob_from_image():
+    image = np.random.default_rng(0).integers(0, 256, (720, 960, 3), dtype=np.uint8)
+    legacy = cv2.dnn.blobFromImage(cv2.resize(image, INPUT_SIZE), INPUT_SCALE, INPUT_SIZE, 127.5)
+    preprocessor = Preprocessor()
+    blob = preprocessor(image)
+    np.testing.assert_allclose(blob, legacy, atol=1e-5)
+    # The same buffer is reused for the next frame
+    assert np.shares_memory(preprocessor(image), blob)
+
+
+def test_postprocess_keeps_class_ids_of_larger_models():
+    # (image_id, class, score, x1, y1, x2, y2); COCO-style ids past the 21 VOC classes
+    rows = np.array([[0, 15, 0.9, 0.1, 0.1, 0.5, 0.5],
+                     [0, 56, 0.9, 0.2, 0.2, 0.6, 0.6],
+                     [0, 90, 0.9, 0.3, 0.3, 0.7, 0.7],
+                     [0, 0, 0.9, 0.0, 0.0, 1.0, 1.0]], dtype=np.float32)
+    assert list(postprocess(rows, 100, 100)['class_id']) == [15]
+    assert list(postprocess(rows, 100, 100, num_classes=81)['class_id']) == [15, 56]
+
+
+def test_postprocess_matches_the_per_box_loop():
+    detections = fake_detections(200, 0.3)
+    legacy = legacy_postprocess(detections, 960, 720)
+    vectorized = postprocess(detections, 960, 720)
+    assert [row[0] for row in legacy] == vectorized['class_id'].tolist()
+    np.testing.assert_allclose([row[1] for row in legacy], vectorized['score'])
+
+
+def test_postprocess_clips_boxes_to_the_frame():
+    rows = np.array([[0, 15, 0.9, -0.1, -0.2, 1.2, 1.5]], dtype=np.float32)
+    (box,) = postprocess(rows, 640, 480)[['x1', 'y1', 'x2', 'y2']].tolist()
+    assert box == (0, 0, 639, 479)
+
+
+def test_detections_to_records():
+    detections = postprocess(np.array([[0, 15, 0.91234, 0.0, 0.0, 0.5, 0.5]], dtype=np.float32), 100, 100)
+    assert detections_to_records(detections) == [
+        {'class_id': 15, 'label': 'person', 'score': 0.9123, 'box': [0, 0, 50, 50]}]
@@ -0,0 +1,59 @@
+# test_detection_feed.py
+import json
+import time
+
+import numpy as np
+
+from detection import DETECTION_DTYPE
+from detection_feed import DetectionFeed
+from frame_bus import FrameBus
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def make_detections(*rows):
+    return np.array(list(rows), dtype=DETECTION_DTYPE)
+
+
+def test_latest_json_is_none_before_the_first_detection():
+    feed = DetectionFeed(FrameBus('detections'), FrameBus('raw'))
+    assert feed.latest_json() is None
+
+
+def test_records_carry_the_frame_number_size_and_labels():
+    detections, frames = FrameBus('detections'), FrameBus('raw')
+    feed = DetectionFeed(detections, frames, classes=['background', 'drone']).start()
+    frames.publish(np.zeros((480, 640, 3), dtype=np.uint8))
+    # Wait for the feed to subscribe before publishing
+    wait_for(lambda: detections.stats()['consumers'])
+    detections.publish(make_detections((1, 0.87654, 10, 20, 30, 40)), timestamp=12.5, seq=7)
+    wait_for(lambda: feed.latest_json() is not None)
+
+    record = json.loads(feed.latest_json())
+    assert record == {
+        'seq': 7, 'timestamp': 12.5, 'width': 640, 'height': 480,
+        'detections': [{'class_id': 1, 'label': 'drone', 'score': 0.8765,
+                        'box': [10, 20, 30, 40]}],
+    }
+
+
+def test_events_are_framed_as_server_sent_events():
+    detections, frames = FrameBus('detections'), FrameBus('raw')
+    feed = DetectionFeed(detections, frames).start()
+    events = feed.gen_events()
+    assert next(events) == b'retry: 1000\n\n'
+    wait_for(lambda: detections.stats()['consumers'])
+    detections.publish(make_detections(), timestamp=1.0, seq=3)
+
+    event = next(events)
+    assert event.startswith(b'id: 3\ndata: ') and event.endswith(b'\n\n')
+    payload = json.loads(event[len(b'id: 3\ndata: '):-2])
+    # No frame yet, so the size is unknown
+    assert payload['detections'] == [] and payload['width'] is None
+    events.close()
+    assert feed.output.stats()['consumers'] == []
@@ -0,0 +1,58 @@
+# test_detector_loader.py
+import numpy as np
+import pytest
+
+from detection import DETECTION_DTYPE
+from detector_loader import DetectorLoader
+
+
+class CountingDetector:
+    name = 'counting'
+    classes = ['background', 'thing']
+
+    def __init__(self):
+        self.calls = 0
+
+    def detect(self, image, size=None):
+        self.calls += 1
+        return np.empty(0, dtype=DETECTION_DTYPE)
+
+    def detect_batch(self, images):
+        return [self.detect(image) for image in images]
+
+    def describe(self):
+        return {'detector': self.name}
+
+
+def test_detect_raises_until_the_detector_is_ready():
+    loader = DetectorLoader(CountingDetector)
+    assert not loader.ready and loader.state == 'pending'
+    with pytest.raises(RuntimeError, match='pending'):
+        loader.detect(np.zeros((10, 10, 3), dtype=np.uint8))
+
+
+def test_loads_and_warms_up_before_reporting_ready():
+    ready = []
+    loader = DetectorLoader(CountingDetector, warmup=2, on_ready=ready.append).start()
+    assert loader.wait(timeout=10)
+    assert loader.state == 'ready'
+    # Warm-up passes are done before on_ready and detect() see the detector
+    assert ready == [loader.detector] and loader.detector.calls == 2
+    assert len(loader.warmup_ms) == 2
+    loader.detect(np.zeros((10, 10, 3), dtype=np.uint8))
+    assert loader.detector.calls == 3
+    stats = loader.stats()
+    assert stats['ready'] and stats['detector'] == 'counting' and 'error' not in stats
+
+
+def test_failed_load_is_reported():
+    def broken():
+        raise IOError("model file missing")
+
+    loader = DetectorLoader(broken).start()
+    assert not loader.wait(timeout=0.5)
+    loader._thread.join(5)
+    assert loader.state == 'failed' and not loader.ready
+    assert loader.stats()['error'] == "model file missing"
+    with pytest.raises(RuntimeError, match='failed'):
+        loader.detect_batch([])
@@ -0,0 +1,47 @@
+# test_detectors.py
+import numpy as np
+import pytest
+
+from detection import MODEL, PROTOTXT
+from detectors import (YOLO_CONFIG, YOLO_WEIGHTS, OnnxDetector, SSDDetector, YoloDetector,
+                       create_detector, decode_yolo, detector_class, load_classes, model_files)
+
+
+def test_detector_specs():
+    assert detector_class('ssd') is SSDDetector
+    assert detector_class('yolo:custom.weights') is YoloDetector
+    assert detector_class('onnx:model.onnx') is OnnxDetector
+    with pytest.raises(ValueError, match='Unknown detector'):
+        detector_class('tflite:model.tflite')
+    with pytest.raises(ValueError, match='needs a model path'):
+        create_detector('onnx')
+
+
+def test_model_files():
+    assert model_files('ssd') == [PROTOTXT, MODEL]
+    assert model_files('yolo') == [YOLO_CONFIG, YOLO_WEIGHTS]
+    assert model_files('yolo:custom.weights') == [YOLO_CONFIG, 'custom.weights']
+    assert model_files('onnx:model.onnx') == ['model.onnx']
+
+
+def test_load_classes_skips_blank_lines(tmp_path):
+    path = tmp_path / 'classes.names'
+    path.write_text("person\n\n  car \nbicycle\n")
+    assert load_classes(path) == ['person', 'car', 'bicycle']
+
+
+def test_decode_yolo_keeps_the_best_class_and_suppresses_overlaps():
+    boxes = np.array([[0.5, 0.5, 0.2, 0.2],     # class 1
+                      [0.51, 0.5, 0.2, 0.2],    # same object, weaker
+                      [0.5, 0.5, 0.2, 0.2],     # same place, class 2
+                      [0.1, 0.1, 0.1, 0.1]],    # too weak
+                     dtype=np.float32)
+    scores = np.array([[0.0, 0.9, 0.1],
+                       [0.0, 0.8, 0.0],
+                       [0.0, 0.1, 0.7],
+                       [0.0, 0.3, 0.0]], dtype=np.float32)
+    out = decode_yolo(boxes, scores, 100, 100, confidence=0.5)
+    assert sorted(out['class_id'].tolist()) == [1, 2]
+    first = out[out['class_id'] == 1][0]
+    assert first['score'] == pytest.approx(0.9)
+    assert (first['x1'], first['y1'], first['x2'], first['y2']) == (40, 40, 60, 60)
@@ -0,0 +1,56 @@
+# test_frame_bus.py
+import threading
+
+from frame_bus import FrameBus
+
+
+def test_publish_numbers_frames_and_keeps_only_the_newest():
+    bus = FrameBus('raw')
+    assert bus.latest() is None and bus.seq == 0
+    bus.publish('a')
+    frame = bus.publish('b', timestamp=5.0)
+    assert (frame.seq, frame.timestamp, frame.image) == (2, 5.0, 'b')
+    assert bus.latest() is frame
+    # Derived stages keep their source frame's number
+    assert bus.publish('c', seq=10).seq == 10
+
+
+def test_slow_consumer_skips_ahead_and_counts_drops():
+    bus = FrameBus()
+    consumer = bus.subscribe('slow')
+    bus.publish(1)
+    assert consumer.next(timeout=1).image == 1
+    for i in range(2, 6):
+        bus.publish(i)
+    assert consumer.next(timeout=1).image == 5
+    assert consumer.stats()['dropped'] == 3
+    assert consumer.next(timeout=0.05) is None
+    consumer.poll()
+    assert consumer.stats()['duplicates'] == 1
+
+
+def test_next_wakes_on_publish():
+    bus = FrameBus()
+    consumer = bus.subscribe('waiter')
+    received = []
+    thread = threading.Thread(target=lambda: received.append(consumer.next(timeout=5)))
+    thread.start()
+    bus.publish('frame')
+    thread.join(5)
+    assert received[0].image == 'frame'
+
+
+def test_demand_follows_active_consumers():
+    bus = FrameBus()
+    assert not bus.has_demand()
+    watching = [False]
+    bus.subscribe('viewer', active=lambda: watching[0])
+    assert not bus.has_demand()
+    watching[0] = True
+    assert bus.has_demand()
+    passive = bus.subscribe('always')
+    watching[0] = False
+    assert bus.has_demand()
+    passive.close()
+    assert not bus.has_demand()
+    assert [c['name'] for c in bus.stats()['consumers']] == ['viewer']
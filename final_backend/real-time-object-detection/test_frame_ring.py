@@ -0,0 +1,54 @@
+# test_frame_ring.py
+import time
+
+import numpy as np
+import pytest
+
+from frame_bus import Frame, FrameBus
+from frame_ring import FrameRing, parse_duration
+
+
+def fill(ring, count, rate, width=160):
+    now = time.time()
+    for i in range(count):
+        image = np.full((width * 3 // 4, width, 3), i, dtype=np.uint8)
+        ring._store(Frame(i + 1, now - (count - 1 - i) / rate, image))
+
+
+def test_parse_duration():
+    assert parse_duration('3s') == 3.0
+    assert parse_duration('1500ms') == 1.5
+    assert parse_duration('0.5') == 0.5
+    assert parse_duration(None, default=2.0) == 2.0
+    with pytest.raises(ValueError):
+        parse_duration('soon')
+
+
+def test_ring_keeps_the_last_seconds_in_a_fixed_buffer():
+    ring = FrameRing(FrameBus(), seconds=1.0, fps=10.0, width=80)
+    fill(ring, 25, 10.0)
+    nbytes = ring.nbytes
+    fill(ring, 25, 10.0)
+    assert ring.nbytes == nbytes
+    assert ring.frames.shape == (10, 60, 80, 3)
+    assert ring.stats()['filled'] == 10
+    assert [f.seq for f in ring.clip(5.0)] == list(range(16, 26))
+
+
+def test_get_returns_the_frame_from_that_long_ago():
+    ring = FrameRing(FrameBus(), seconds=2.0, fps=10.0)
+    fill(ring, 20, 10.0)
+    assert ring.get().seq == 20
+    assert ring.get(0.55).seq == 14
+    assert int(ring.get(0.55).image[0, 0, 0]) == 13
+    assert ring.get(10.0) is None
+
+
+def test_ring_stores_at_its_own_rate():
+    bus = FrameBus()
+    ring = FrameRing(bus, seconds=5.0, fps=10.0).start()
+    image = np.zeros((30, 40, 3), dtype=np.uint8)
+    for _ in range(30):
+        bus.publish(image)
+        time.sleep(1 / 30)
+    assert ring.written == pytest.approx(10, abs=2)
@@ -0,0 +1,63 @@
+# test_frame_sources.py
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from frame_sources import FileSource, SyntheticSource, open_source
+
+
+def read_frames(source, count, timeout=5.0):
+    """The first `count` distinct frames the source hands out."""
+    frames = []
+    deadline = time.monotonic() + timeout
+    while len(frames) < count and time.monotonic() < deadline:
+        frame = source.read()
+        if frame is not None and (not frames or frame is not frames[-1]):
+            frames.append(frame)
+        time.sleep(0.001)
+    return frames
+
+
+def write_video(path, count):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'MJPG'), 10.0, (64, 48))
+    for i in range(count):
+        writer.write(np.full((48, 64, 3), i * 40, dtype=np.uint8))
+    writer.release()
+
+
+def test_open_source_specs(tmp_path):
+    source = open_source('synthetic:320x240')
+    assert isinstance(source, SyntheticSource) and (source.width, source.height) == (320, 240)
+    with pytest.raises(ValueError):
+        open_source('file:')
+    with pytest.raises(ValueError):
+        open_source('carrier-pigeon')
+
+
+def test_synthetic_source_paces_and_hands_out_new_arrays():
+    source = open_source('synthetic:160x120', fps=50).start()
+    try:
+        start = time.monotonic()
+        frames = read_frames(source, 10)
+        elapsed = time.monotonic() - start
+    finally:
+        source.stop()
+    assert len(frames) == 10 and frames[0].shape == (120, 160, 3)
+    assert len({id(f) for f in frames}) == 10
+    assert 0.1 < elapsed < 1.0
+
+
+def test_file_source_loops_and_stops_at_the_end(tmp_path):
+    path = tmp_path / 'clip.avi'
+    write_video(path, 3)
+    looping = FileSource(str(path), realtime=False).start()
+    try:
+        assert len(read_frames(looping, 7)) == 7
+    finally:
+        looping.stop()
+
+    once = FileSource(str(path), loop=False, realtime=False).start()
+    read_frames(once, 5, timeout=1.0)
+    assert once.finished and once.frames == 3
@@ -0,0 +1,22 @@
+# test_h264_relay.py
+import time
+
+from h264_relay import H264Relay
+
+
+def test_viewer_is_not_held_without_init_segment():
+    relay = H264Relay()
+    start = time.monotonic()
+    assert list(relay.gen_fmp4(init_timeout=0.2)) == []
+    assert time.monotonic() - start < 2
+
+
+def test_viewer_gets_init_segment_first():
+    relay = H264Relay()
+    relay.init_segment = b'ftypmoov'
+    relay._init_ready.set()
+    stream = relay.gen_fmp4()
+    assert next(stream) == b'ftypmoov'
+    relay.output.publish(b'moofmdat')
+    assert next(stream) == b'moofmdat'
+    stream.close()
@@ -0,0 +1,102 @@
+# test_inference_pool.py
+import os
+import queue
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from detection import DETECTION_DTYPE
+from inference_pool import InferencePool
+
+RAISE = 255
+CRASH = 128
+
+
+class FakeDetector:
+    """One detection per frame; raises or kills the worker on marker frames."""
+
+    def detect(self, image, size=None):
+        value = int(image[0, 0, 0])
+        if value == RAISE:
+            raise ValueError("bad frame")
+        if value == CRASH:
+            os._exit(1)
+        return np.array([(15, 0.9, 0, 0, 10, 10)], dtype=DETECTION_DTYPE)
+
+
+def failing_detector():
+    raise RuntimeError("model missing")
+
+
+def frame(value):
+    return np.full((300, 300, 3), value, dtype=np.uint8)
+
+
+def start_pool(workers):
+    pool = InferencePool(workers, FakeDetector).start()
+    results = queue.Queue()
+    pool.on_result = lambda seq, timestamp, detections: results.put((seq, len(detections)))
+    pool.results = results
+    return pool
+
+
+@pytest.fixture
+def pool():
+    pool = start_pool(1)
+    yield pool
+    pool.stop()
+
+
+def run(pool, seq, value):
+    slot = pool.acquire()
+    pool.submit(slot, frame(value), seq, 0.0)
+    return pool.results.get(timeout=10)
+
+
+def test_detector_error_returns_empty_result(pool):
+    assert run(pool, 1, RAISE) == (1, 0)
+    # The slot and worker came back; later frames are still processed
+    for seq in range(2, 6):
+        assert run(pool, seq, 0) == (seq, 1)
+
+
+def test_dead_worker_is_retired_and_the_rest_carry_on():
+    pool = start_pool(2)
+    try:
+        assert run(pool, 1, CRASH) == (1, 0)
+        for seq in range(2, 6):
+            assert run(pool, seq, 0) == (seq, 1)
+        stats = pool.stats()
+        assert (stats['alive'], stats['lost'], stats['error']) == (1, 1, None)
+    finally:
+        pool.stop()
+
+
+def test_acquire_raises_once_every_worker_died(pool):
+    assert run(pool, 1, CRASH) == (1, 0)
+    with pytest.raises(RuntimeError):
+        pool.acquire()
+    assert pool.stats()['alive'] == 0
+
+
+def test_acquire_raises_when_no_worker_can_load():
+    pool = InferencePool(1, failing_detector).start()
+    try:
+        pool.submit(pool.acquire(), frame(0), 1, 0.0)
+        with pytest.raises(RuntimeError):
+            pool.acquire()
+    finally:
+        pool.stop()
+
+
+def test_stop_releases_ring_and_ignores_late_frames():
+    pool = InferencePool(1, FakeDetector).start()
+    name = pool.ring.shm.name
+    slot = pool.acquire()
+    pool.stop()
+    # A stage still running after stop() must not write into the released ring
+    pool.submit(slot, frame(0), 1, 0.0)
+    assert pool.acquire() is None
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=name)
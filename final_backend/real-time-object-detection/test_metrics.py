@@ -0,0 +1,48 @@
+# test_metrics.py
+import time
+
+import pytest
+
+from frame_bus import FrameBus
+from metrics import Histogram, PipelineMetrics, Registry
+
+
+def samples(text):
+    """{'name{labels}': value} for every sample line of a Prometheus text page."""
+    return {line.rsplit(' ', 1)[0]: float(line.rsplit(' ', 1)[1])
+            for line in text.splitlines() if line and not line.startswith('#')}
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    histogram = registry.add(Histogram('latency_seconds', 'Latency', ['stage'], buckets=(0.1, 1.0)))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        histogram.observe(value, 'raw')
+    page = registry.render()
+    assert '# TYPE latency_seconds histogram' in page
+    values = samples(page)
+    assert values['latency_seconds_bucket{stage="raw",le="0.1"}'] == 1
+    assert values['latency_seconds_bucket{stage="raw",le="1.0"}'] == 3
+    assert values['latency_seconds_bucket{stage="raw",le="+Inf"}'] == 4
+    assert values['latency_seconds_count{stage="raw"}'] == 4
+    assert values['latency_seconds_sum{stage="raw"}'] == pytest.approx(4.05)
+
+
+def test_pipeline_metrics_track_buses_queues_and_consumers():
+    metrics = PipelineMetrics()
+    bus = FrameBus('raw')
+    metrics.track_bus(bus, 'capture')
+    metrics.track_queue('recorder', lambda: 7)
+    consumer = bus.subscribe('viewer "1"')
+    for _ in range(3):
+        bus.publish(None, timestamp=time.time() - 0.02)
+    consumer.next(timeout=1)
+    consumer.lag = 0.25
+
+    values = samples(metrics.render())
+    assert values['drone_stage_frames_total{stage="capture"}'] == 3
+    assert values['drone_stage_latency_seconds_bucket{stage="capture",le="0.01"}'] == 0
+    assert values['drone_stage_latency_seconds_count{stage="capture"}'] == 3
+    assert values['drone_queue_depth{queue="recorder"}'] == 7
+    assert values['drone_consumer_dropped_frames{bus="raw",consumer="viewer \\"1\\""}'] == 0
+    assert values['drone_client_last_send_lag_seconds{client="viewer \\"1\\""}'] == 0.25
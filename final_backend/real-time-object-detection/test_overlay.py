@@ -0,0 +1,50 @@
+# test_overlay.py
+import cv2
+import numpy as np
+
+from detection import DETECTION_DTYPE
+from overlay import LabelCache, draw_overlay
+
+CLASSES = ['background', 'thing']
+COLORS = [(0, 0, 0), (0, 255, 0)]
+
+
+def detections(*rows):
+    return np.array(list(rows), dtype=DETECTION_DTYPE)
+
+
+def test_labels_are_rendered_once_per_confidence_bucket():
+    labels = LabelCache(CLASSES, COLORS, bucket=5)
+    first = labels.get(1, 0.86)
+    assert labels.get(1, 0.89) is first
+    labels.get(1, 0.91)
+    assert labels.stats() == {'labels': 2, 'renders': 2}
+
+
+def test_label_matches_put_text():
+    labels = LabelCache(CLASSES, COLORS)
+    frame = np.zeros((100, 200, 3), dtype=np.uint8)
+    draw_overlay(frame, detections((1, 0.87, 20, 50, 120, 90)), labels)
+
+    expected = np.zeros_like(frame)
+    cv2.rectangle(expected, (20, 50), (120, 90), COLORS[1], 2)
+    text = np.zeros(frame.shape[:2], dtype=np.uint8)
+    cv2.putText(text, "thing: 85%", (20, 35), cv2.FONT_HERSHEY_SIMPLEX, 0.5, 255, 2)
+    expected[text > 127] = COLORS[1]
+    np.testing.assert_array_equal(frame, expected)
+
+
+def test_labels_are_clipped_to_the_frame():
+    labels = LabelCache(CLASSES, COLORS)
+    frame = np.zeros((40, 60, 3), dtype=np.uint8)
+    # Label hanging off the right edge, and a box entirely outside
+    draw_overlay(frame, detections((1, 0.5, 50, 0, 59, 39), (1, 0.5, 500, 500, 600, 600)), labels)
+    assert frame.any()
+
+
+def test_boxes_are_scaled_from_the_source_size():
+    labels = LabelCache(CLASSES, COLORS)
+    frame = np.zeros((240, 320, 3), dtype=np.uint8)
+    draw_overlay(frame, detections((1, 0.5, 100, 200, 300, 400)), labels, source_size=(640, 480))
+    # The box's corners land at half the coordinates
+    assert tuple(frame[100, 50]) == COLORS[1] and tuple(frame[200, 150]) == COLORS[1]
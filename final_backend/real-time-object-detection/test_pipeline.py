@@ -0,0 +1,61 @@
+# test_pipeline.py
+import time
+
+import numpy as np
+
+from frame_bus import FrameBus
+from inference_pool import InferencePool
+from pipeline import InferenceStage, OverlayStage, PooledInferenceStage
+
+
+def failing_detector():
+    raise RuntimeError("model missing")
+
+
+def test_pooled_stage_stops_with_error_when_pool_fails():
+    source = FrameBus('raw')
+    pool = InferencePool(1, failing_detector).start()
+    stage = PooledInferenceStage(source, pool).start()
+    try:
+        deadline = time.monotonic() + 10
+        while stage._thread.is_alive() and time.monotonic() < deadline:
+            source.publish(np.zeros((300, 300, 3), dtype=np.uint8))
+            time.sleep(0.05)
+        assert not stage._thread.is_alive()
+        assert stage.error == "No inference worker could load the detector"
+    finally:
+        stage.stop()
+        pool.stop()
+
+
+def test_inference_stage_tags_results_with_the_source_frame():
+    source = FrameBus('raw')
+    stage = InferenceStage(source, lambda image: image.mean()).start()
+    try:
+        consumer = stage.output.subscribe('test')
+        frame = source.publish(np.full((10, 10, 3), 7, dtype=np.uint8), timestamp=42.0)
+        result = consumer.next(timeout=5)
+        assert (result.seq, result.timestamp, result.image) == (frame.seq, 42.0, 7)
+    finally:
+        stage.stop()
+
+
+def test_inference_stage_never_publishes_behind_a_newer_frame():
+    stage = InferenceStage(FrameBus('raw'), None)
+    stage._publish(5, 5.0, 'newer')
+    stage._publish(3, 3.0, 'older')
+    assert stage.output.latest().image == 'newer'
+
+
+def test_overlay_stage_only_renders_on_demand():
+    frames = FrameBus('raw')
+    overlay = OverlayStage(frames, FrameBus('detections'), display_width=40).start()
+    frames.publish(np.zeros((60, 80, 3), dtype=np.uint8))
+    time.sleep(0.1)
+    assert overlay.output.published == 0 and overlay.raw.published == 0
+
+    viewer = overlay.raw.subscribe('viewer')
+    frames.publish(np.zeros((60, 80, 3), dtype=np.uint8))
+    frame = viewer.next(timeout=5)
+    assert frame.image.shape[:2] == (30, 40)
+    assert overlay.output.published == 0
@@ -0,0 +1,70 @@
+# test_preview.py
+import time
+
+import cv2
+
+from frame_bus import FrameBus
+from preview import LocalPreview
+
+
+def fake_window(monkeypatch, keys=()):
+    """Replace the OpenCV window calls; returns the list of shown images."""
+    shown = []
+    keys = list(keys)
+    monkeypatch.setattr(cv2, 'imshow', lambda window, image: shown.append(image))
+    monkeypatch.setattr(cv2, 'setWindowTitle', lambda window, title: None)
+    monkeypatch.setattr(cv2, 'destroyAllWindows', lambda: None)
+
+    def wait_key(delay):
+        time.sleep(delay / 1000)
+        return keys.pop(0) if keys else -1
+
+    monkeypatch.setattr(cv2, 'waitKey', wait_key)
+    return shown
+
+
+def test_shows_only_the_newest_frame_once(monkeypatch):
+    shown = fake_window(monkeypatch)
+    bus = FrameBus('output')
+    preview = LocalPreview(bus, fps=20).start()
+    for i in range(5):
+        bus.publish(i)
+    time.sleep(0.2)
+    preview.stop()
+    preview._thread.join(2)
+    # Frames published between ticks are skipped, and a frame is never shown twice
+    assert shown == [4]
+    assert preview.stats()['shown'] == 1
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_no_demand_while_a_frame_is_waiting_to_be_shown(monkeypatch):
+    fake_window(monkeypatch)
+    bus = FrameBus('output')
+    preview = LocalPreview(bus, fps=2).start()
+    # Nothing to show yet: ask upstream for a frame
+    assert bus.has_demand()
+    bus.publish('first')
+    wait_until(lambda: preview.shown == 1)
+    assert bus.has_demand()
+    # The next frame waits for the next tick; upstream needn't render more until then
+    bus.publish('second')
+    assert not bus.has_demand()
+    wait_until(lambda: preview.shown == 2)
+    assert bus.has_demand()
+    preview.stop()
+    preview._thread.join(2)
+
+
+def test_q_quits(monkeypatch):
+    fake_window(monkeypatch, keys=[ord('q')])
+    quit_called = []
+    preview = LocalPreview(FrameBus(), fps=50, on_quit=lambda: quit_called.append(True)).start()
+    preview._thread.join(2)
+    assert quit_called == [True] and not preview._thread.is_alive()
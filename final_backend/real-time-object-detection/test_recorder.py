@@ -0,0 +1,80 @@
+# test_recorder.py
+import csv
+import os
+import time
+
+import numpy as np
+import pytest
+
+from frame_bus import Frame, FrameBus
+from frame_ring import FrameRing
+from recorder import FlightRecorder, _Segment
+
+
+def frames(rate, seconds, start=1000.0):
+    image = np.zeros((120, 160, 3), dtype=np.uint8)
+    return [Frame(i + 1, start + i / rate, image) for i in range(int(rate * seconds))]
+
+
+def index_rows(path):
+    with open(os.path.splitext(path)[0] + '.csv') as f:
+        return list(csv.DictReader(f))
+
+
+@pytest.mark.parametrize('source_fps', [10, 24, 60])
+def test_segment_plays_at_real_speed(tmp_path, source_fps):
+    path = str(tmp_path / 'raw_000.mp4')
+    segment = _Segment(path, 'mp4v', 30.0, (160, 120), 1000.0)
+    for frame in frames(source_fps, 2.0):
+        segment.write(frame)
+    segment.close()
+    rows = index_rows(path)
+    # Two seconds of source frames make two seconds of video at 30 fps
+    assert len(rows) == pytest.approx(60, abs=3)
+    # Each output frame shows the newest source frame at its time
+    for row in rows:
+        assert float(row['timestamp']) <= 1000.0 + int(row['frame']) / 30.0 + 1e-6
+
+
+def test_segment_skips_long_gaps(tmp_path):
+    path = str(tmp_path / 'raw_000.mp4')
+    segment = _Segment(path, 'mp4v', 30.0, (160, 120), 1000.0)
+    for frame in frames(30, 1.0) + frames(30, 1.0, start=1060.0):
+        segment.write(frame)
+    segment.close()
+    assert len(index_rows(path)) == pytest.approx(60, abs=3)
+
+
+def test_recorder_writes_segments_with_index(tmp_path):
+    bus = FrameBus('raw')
+    recorder = FlightRecorder({'raw': bus}, directory=str(tmp_path), segment_seconds=0.5).start()
+    session = recorder.start_recording()
+    image = np.zeros((120, 160, 3), dtype=np.uint8)
+    for _ in range(10):
+        bus.publish(image)
+        time.sleep(0.1)
+    recorder.stop_recording(wait=True)
+    files = sorted(f for f in os.listdir(tmp_path / session) if f.endswith('.mp4'))
+    assert len(files) >= 2
+    assert recorder.stats()['written'] == 10
+    seqs = [int(row['seq']) for f in files for row in index_rows(str(tmp_path / session / f))]
+    assert seqs == sorted(seqs) and set(seqs) == set(range(1, 11))
+
+
+def test_preroll_is_written_at_the_recording_rate_and_size(tmp_path):
+    bus = FrameBus('raw')
+    ring = FrameRing(bus, seconds=2.0, fps=10.0, width=80).start()
+    recorder = FlightRecorder({'raw': bus}, directory=str(tmp_path), rings={'raw': ring}).start()
+    image = np.zeros((120, 160, 3), dtype=np.uint8)
+    for _ in range(30):
+        bus.publish(image)
+        time.sleep(1 / 30)
+    session = recorder.start_recording(preroll=1.0)
+    for _ in range(15):
+        bus.publish(image)
+        time.sleep(1 / 30)
+    recorder.stop_recording(wait=True)
+    files = [f for f in os.listdir(tmp_path / session) if f.endswith('.mp4')]
+    # One file at the live size, about 1.5 s long at 30 fps
+    assert len(files) == 1
+    assert len(index_rows(str(tmp_path / session / files[0]))) == pytest.approx(45, abs=6)
@@ -0,0 +1,59 @@
+# test_tiling.py
+import numpy as np
+
+from detection import CLASSES, DETECTION_DTYPE
+from detectors import Detector
+from tiling import TiledDetector, Tiler, nms, tile_grid
+
+
+def boxes(*rows):
+    """(class_id, score, x1, y1, x2, y2) rows as a DETECTION_DTYPE array."""
+    return np.array(list(rows), dtype=DETECTION_DTYPE)
+
+
+class WholeImageDetector(Detector):
+    """Reports one person covering each image it sees; tiles outscore the
+    full frame, as a cut-off object can."""
+
+    def __init__(self, frame_size):
+        super().__init__(CLASSES, 0.2)
+        self.frame_size = frame_size
+
+    def detect(self, image, size=None):
+        (h, w) = image.shape[:2]
+        score = 0.5 if (w, h) == self.frame_size else 0.9
+        return boxes((15, score, 0, 0, w - 1, h - 1))
+
+
+def test_tile_grid_covers_frame_with_overlap():
+    tiles = tile_grid(960, 720, (4, 3), 0.25)
+    assert len(tiles) == 12
+    assert tiles[:, [0, 1]].min() == 0
+    assert tiles[:, 2].max() == 960 and tiles[:, 3].max() == 720
+    assert tiles[1, 0] < tiles[0, 2]
+
+
+def test_tiled_detector_returns_one_box_per_object():
+    detector = TiledDetector(WholeImageDetector((960, 720)), Tiler((2, 2), 0.25))
+    detections = detector.detect(np.zeros((720, 960, 3), dtype=np.uint8))
+    assert len(detections) == 1
+    assert detections[0][['x1', 'y1', 'x2', 'y2']].tolist() == (0, 0, 959, 719)
+
+
+def test_nms_rechecks_grown_box():
+    # The left half outranks the rest; once grown over the whole box it must
+    # also swallow the right half, which it didn't overlap at first
+    detections = nms(boxes((15, 0.9, 0, 0, 99, 99),
+                           (15, 0.8, 0, 0, 399, 99),
+                           (15, 0.7, 300, 0, 399, 99)))
+    assert len(detections) == 1
+    assert detections[0][['x1', 'x2']].tolist() == (0, 399)
+
+
+def test_nms_keeps_separate_objects_and_classes():
+    detections = nms(boxes((15, 0.9, 0, 0, 99, 99),
+                           (15, 0.8, 10, 10, 90, 90),
+                           (15, 0.7, 500, 500, 599, 599),
+                           (7, 0.6, 0, 0, 99, 99)))
+    assert sorted(zip(detections['class_id'].tolist(), detections['x1'].tolist())) == \
+        [(7, 0), (15, 0), (15, 500)]
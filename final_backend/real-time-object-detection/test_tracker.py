@@ -0,0 +1,61 @@
+# test_tracker.py
+import numpy as np
+import pytest
+
+from detection import DETECTION_DTYPE
+from tracker import AdaptiveCadence, BoxTracker
+
+SIZE = (960, 720)
+
+
+def person(x, y=100, score=0.9):
+    return np.array([(15, score, x, y, x + 100, y + 200)], dtype=DETECTION_DTYPE)
+
+
+def test_tracker_moves_boxes_on_measured_velocity():
+    tracker = BoxTracker(smoothing=1.0)
+    tracker.update(person(100), 0.0, SIZE)
+    tracker.update(person(120), 1.0, SIZE)
+    predicted = tracker.predict(1.5)
+    assert len(predicted) == 1
+    assert predicted['x1'][0] == pytest.approx(130, abs=1)
+    assert predicted['y1'][0] == 100
+
+
+def test_tracker_drift_is_low_for_a_still_scene_and_high_for_a_new_object():
+    tracker = BoxTracker()
+    assert tracker.update(person(100), 0.0, SIZE) == 1.0
+    assert tracker.update(person(100), 0.5, SIZE) == pytest.approx(0.0)
+    both = np.concatenate([person(100), person(600)])
+    assert tracker.update(both, 1.0, SIZE) == pytest.approx(0.5)
+
+
+def test_tracker_drops_tracks_after_max_misses():
+    tracker = BoxTracker(max_misses=2)
+    tracker.update(person(100), 0.0, SIZE)
+    empty = np.empty(0, dtype=DETECTION_DTYPE)
+    tracker.update(empty, 0.5, SIZE)
+    tracker.update(empty, 1.0, SIZE)
+    assert len(tracker.predict(1.0)) == 1
+    tracker.update(empty, 1.5, SIZE)
+    assert len(tracker.predict(1.5)) == 0
+    assert tracker.stats()['lost'] == 1
+
+
+def test_cadence_floor_follows_latency():
+    cadence = AdaptiveCadence(target_fps=30, headroom=1.0)
+    cadence.record(0.1)
+    assert cadence.n == 3
+
+
+def test_cadence_grows_while_still_and_drops_on_drift():
+    cadence = AdaptiveCadence(target_fps=30, max_n=15)
+    for _ in range(30):
+        cadence.record(0.01, drift=0.0)
+    assert cadence.n == 15
+    ns = []
+    for _ in range(4):
+        cadence.record(0.01, drift=0.8)
+        ns.append(cadence.n)
+    assert ns == sorted(ns, reverse=True)
+    assert ns[-1] == cadence.floor
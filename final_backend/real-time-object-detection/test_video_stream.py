@@ -0,0 +1,161 @@
+# test_video_stream.py
+import queue
+import struct
+import threading
+import time
+
+import cv2
+import numpy as np
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from frame_bus import Frame, FrameBus
+from video_stream import (DEFAULT_PROFILE, PROFILES, THUMBNAIL_PROFILE, EncodeCache, FramePacer,
+                          JpegBroadcaster, profile_from_args)
+
+
+def profile(**args):
+    return profile_from_args(MultiDict({k: str(v) for k, v in args.items()}))
+
+
+@pytest.mark.parametrize('args, expected', [
+    ({'width': -5}, (16, None, None)),
+    ({'width': 100000}, (4096, None, None)),
+    ({'quality': 0}, (None, 1, None)),
+    ({'quality': 500}, (None, 100, None)),
+    ({'fps': -1}, (None, None, 0.1)),
+    ({'fps': 'inf'}, (None, None, 120.0)),
+    ({'fps': 'nan'}, (None, None, 0.1)),
+])
+def test_profile_overrides_are_clamped(args, expected):
+    p = profile(**args)
+    assert (p.width, p.quality, p.max_fps) == expected
+
+
+def test_profile_keeps_builtin_profiles():
+    assert profile() is DEFAULT_PROFILE
+    assert profile(profile='low') is PROFILES['low']
+    assert profile(width='abc') is DEFAULT_PROFILE
+
+
+def test_encode_cache_forgets_failed_encodes():
+    cache = EncodeCache()
+    image = np.zeros((480, 640, 3), dtype=np.uint8)
+    broken = Frame(1, 0.0, image[:, :0])
+    with pytest.raises(cv2.error):
+        cache.get(broken, PROFILES['low'])
+    assert cache.get(Frame(1, 0.0, image), PROFILES['low']) is not None
+
+
+@pytest.mark.parametrize('source_fps', [30, 60])
+@pytest.mark.parametrize('max_fps', [10, 15, 20, 30])
+def test_pacer_delivers_requested_rate_despite_jitter(source_fps, max_fps):
+    rng = np.random.default_rng(0)
+    timestamps = np.arange(30 * source_fps) / source_fps + rng.uniform(-0.003, 0.003, 30 * source_fps)
+    pacer = FramePacer()
+    sent = [t for t in timestamps if pacer.due(t, max_fps)]
+    rate = (len(sent) - 1) / (sent[-1] - sent[0])
+    assert rate == pytest.approx(max_fps, rel=0.03)
+
+
+def test_pacer_restarts_after_a_gap():
+    pacer = FramePacer()
+    assert pacer.due(0.0, 10)
+    assert not pacer.due(0.05, 10)
+    # A 5 s stall doesn't make up for the frames it missed
+    assert pacer.due(5.0, 10)
+    assert not pacer.due(5.04, 10)
+    assert pacer.due(5.1, 10)
+
+
+def test_encode_cache_encodes_each_frame_once_per_profile():
+    cache = EncodeCache()
+    frame = Frame(1, 0.0, np.zeros((480, 640, 3), dtype=np.uint8))
+    first = cache.get(frame, PROFILES['low'])
+    assert cache.get(frame, PROFILES['low']) is first
+    cache.get(frame, PROFILES['medium'])
+    assert cache.stats() == {'encodes': 2, 'hits': 1}
+    assert cv2.imdecode(np.frombuffer(first, np.uint8), cv2.IMREAD_COLOR).shape[1] == 320
+
+
+def test_snapshot_returns_a_fresh_frame_and_registers_demand():
+    bus = FrameBus('output')
+    broadcaster = JpegBroadcaster(bus, snapshot_linger=5.0)
+    assert not bus.has_demand()
+    fresh = bus.publish('now')
+    assert broadcaster.snapshot() is fresh
+    # Upstream stages keep rendering for pollers between requests
+    assert bus.has_demand()
+
+
+def test_snapshot_waits_briefly_for_a_newer_frame_than_a_stale_one():
+    bus = FrameBus('output')
+    broadcaster = JpegBroadcaster(bus)
+    stale = bus.publish('old', timestamp=0.0)
+    assert broadcaster.snapshot(max_age=0.05) is stale
+    assert JpegBroadcaster(FrameBus()).snapshot(max_age=0.05) is None
+
+
+def test_etags_change_with_frame_and_profile():
+    broadcaster = JpegBroadcaster(FrameBus())
+    first, second = Frame(1, 0.0, None), Frame(2, 0.0, None)
+    tags = {broadcaster.etag(first, DEFAULT_PROFILE), broadcaster.etag(second, DEFAULT_PROFILE),
+            broadcaster.etag(first, THUMBNAIL_PROFILE)}
+    assert len(tags) == 3
+    assert broadcaster.etag(first, DEFAULT_PROFILE) == broadcaster.etag(first, DEFAULT_PROFILE)
+
+
+class FakeSocket:
+    """Records sent messages; acks are fed in through `acks`."""
+
+    def __init__(self):
+        self.sent = []
+        self.acks = queue.Queue()
+        self.closed = False
+
+    def send(self, data):
+        if self.closed:
+            raise ConnectionError("closed")
+        self.sent.append(data)
+
+    def receive(self, timeout=None):
+        try:
+            return self.acks.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+def test_websocket_waits_for_ack_and_then_sends_the_newest_frame():
+    bus = FrameBus('output')
+    broadcaster = JpegBroadcaster(bus)
+    ws = FakeSocket()
+    # The handler returns when sending to the closed socket raises
+    thread = threading.Thread(target=pytest.raises, daemon=True,
+                              args=(ConnectionError, broadcaster.serve_websocket, ws))
+    thread.start()
+    image = np.zeros((48, 64, 3), dtype=np.uint8)
+    while len(bus.stats()['consumers']) < 2:
+        time.sleep(0.01)
+
+    bus.publish(image)
+    while len(ws.sent) < 1:
+        time.sleep(0.01)
+    # Unacknowledged: later frames are held back, not queued
+    for _ in range(3):
+        bus.publish(image)
+    time.sleep(0.1)
+    assert len(ws.sent) == 1
+    assert struct.unpack('>I', ws.sent[0][:4])[0] == 1
+    assert cv2.imdecode(np.frombuffer(ws.sent[0][4:], np.uint8), cv2.IMREAD_COLOR).shape == (48, 64, 3)
+
+    ws.acks.put('1')
+    while len(ws.sent) < 2:
+        time.sleep(0.01)
+    assert struct.unpack('>I', ws.sent[1][:4])[0] == 4
+
+    ws.closed = True
+    ws.acks.put('4')
+    bus.publish(image)
+    thread.join(5)
+    assert not thread.is_alive()
+    assert [c['name'] for c in bus.stats()['consumers']] == ['snapshots']
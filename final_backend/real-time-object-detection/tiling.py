@@ -0,0 +1,176 @@
+# tiling.py
+import math
+
+import numpy as np
+
+from detection import DETECTION_DTYPE
+from detectors import Detector
+
+
+def parse_grid(value):
+    """'4x3' -> (4, 3) tile columns and rows."""
+    cols, _, rows = value.lower().partition('x')
+    grid = (int(cols), int(rows or cols))
+    if min(grid) < 1:
+        raise ValueError(f"Bad tile grid '{value}' (use COLSxROWS, e.g. 4x3)")
+    return grid
+
+
+def tile_grid(width, height, grid=(4, 3), overlap=0.25):
+    """Tile rectangles (x1, y1, x2, y2) covering a width x height frame.
+
+    The frame is split into grid columns x rows of equal tiles, each sharing
+    `overlap` of its width/height with its neighbour, so an object cut by one
+    tile's edge is whole in the next. A 960x720 frame in a 4x3 grid with 0.25
+    overlap gives 296x288 tiles, close to the SSD's native 300x300 input.
+    """
+    (cols, rows) = grid
+    tile_w = min(width, math.ceil(width / (cols - (cols - 1) * overlap)))
+    tile_h = min(height, math.ceil(height / (rows - (rows - 1) * overlap)))
+    xs = np.linspace(0, width - tile_w, cols).round().astype(np.int32)
+    ys = np.linspace(0, height - tile_h, rows).round().astype(np.int32)
+    (x1, y1) = (a.ravel() for a in np.meshgrid(xs, ys))
+    return np.column_stack([x1, y1, x1 + tile_w, y1 + tile_h])
+
+
+def offset_detections(detections, x, y):
+    """Shift detections from tile coordinates into frame coordinates in place."""
+    detections['x1'] += x
+    detections['x2'] += x
+    detections['y1'] += y
+    detections['y2'] += y
+    return detections
+
+
+def nms(detections, threshold=0.5):
+    """Per-class non-maximum suppression over a DETECTION_DTYPE array, for
+    detections merged from overlapping tiles.
+
+    Overlap is measured as the intersection over the smaller box rather than
+    over the union: an object cut by a tile edge yields a partial box lying
+    inside the whole one from the neighbouring tile (or the full-frame pass),
+    which IoU would keep as a second detection. The best-scoring box of each
+    group is kept and grown to cover the boxes it suppresses, so a cut box
+    that happens to score highest still ends up with the object's full
+    extent. A grown box is checked again against every box still kept, until
+    no two kept boxes of a class overlap, so each object ends up with one
+    box. Returns the kept detections, highest score first.
+    """
+    if len(detections) < 2:
+        return detections
+    detections = detections[np.argsort(-detections['score'], kind='stable')]
+    x1, y1 = detections['x1'], detections['y1']
+    x2, y2 = detections['x2'], detections['y2']
+    class_ids = detections['class_id']
+
+    keep = np.ones(len(detections), dtype=bool)
+    merging = True
+    while merging:
+        merging = False
+        for i in range(len(detections)):
+            while keep[i]:
+                # Kept boxes of the same class that box i (as grown so far) overlaps
+                others = keep & (class_ids == class_ids[i])
+                others[i] = False
+                if not others.any():
+                    break
+                w = np.minimum(x2[i], x2) - np.maximum(x1[i], x1) + 1
+                h = np.minimum(y2[i], y2) - np.maximum(y1[i], y1) + 1
+                inter = np.clip(w, 0, None) * np.clip(h, 0, None)
+                areas = (x2 - x1 + 1) * (y2 - y1 + 1)
+                merged = others & (inter / np.minimum(areas[i], areas) > threshold)
+                if not merged.any():
+                    break
+                merging = True
+                # The group collapses into its best-scoring box, grown to
+                # cover the rest
+                group = merged
+                group[i] = True
+                best = int(np.argmax(group))
+                x1[best], y1[best] = x1[group].min(), y1[group].min()
+                x2[best], y2[best] = x2[group].max(), y2[group].max()
+                keep &= ~group
+                keep[best] = True
+    return detections[keep]
+
+
+def merge_tiles(results, offsets, threshold=0.5):
+    """Map per-tile detections to frame coordinates and suppress duplicates
+    found in overlapping tiles. `offsets` holds each tile's (x, y)."""
+    if not results:
+        return np.empty(0, dtype=DETECTION_DTYPE)
+    merged = np.concatenate(results)
+    shift = np.repeat(np.asarray(offsets, dtype=np.int32).reshape(-1, 2),
+                      [len(r) for r in results], axis=0)
+    offset_detections(merged, shift[:, 0], shift[:, 1])
+    return nms(merged, threshold)
+
+
+class Tiler:
+    """Splits frames into overlapping full-resolution tiles.
+
+    Downscaling a whole 960x720 frame to 300x300 loses small, distant
+    objects; tiles keep them near native resolution. With `full_frame` the
+    whole frame is added as one more image, for objects larger than a tile.
+    """
+
+    def __init__(self, grid=(4, 3), overlap=0.25, full_frame=True):
+        self.grid = tuple(grid)
+        self.overlap = overlap
+        # A 1x1 grid already is the full frame
+        self.full_frame = full_frame and self.grid != (1, 1)
+        self._tiles = {}
+
+    def tiles(self, width, height):
+        """Tile rectangles for a frame size, computed once per size."""
+        if (width, height) not in self._tiles:
+            self._tiles[(width, height)] = tile_grid(width, height, self.grid, self.overlap)
+        return self._tiles[(width, height)]
+
+    def split(self, image):
+        """(images, offsets): views of the tiles (no copies) and their (x, y)."""
+        (h, w) = image.shape[:2]
+        tiles = self.tiles(w, h)
+        images = [image[y1:y2, x1:x2] for x1, y1, x2, y2 in tiles.tolist()]
+        offsets = tiles[:, :2].tolist()
+        if self.full_frame:
+            images.append(image)
+            offsets.append([0, 0])
+        return images, offsets
+
+    def describe(self):
+        return {'grid': list(self.grid), 'overlap': self.overlap, 'full_frame': self.full_frame,
+                'tiles': self.grid[0] * self.grid[1] + self.full_frame}
+
+
+class TiledDetector(Detector):
+    """Runs a detector on a Tiler's tiles of each frame.
+
+    All tiles of a frame go through one detect_batch() call and the results
+    are merged with nms(), so a frame costs roughly one forward pass per tile.
+    """
+
+    def __init__(self, detector, tiler, nms_threshold=0.5):
+        self.detector = detector
+        self.tiler = tiler
+        self.name = detector.name
+        self.classes = detector.classes
+        self.colors = detector.colors
+        self.confidence = detector.confidence
+        self.input_size = detector.input_size
+        self.nms_threshold = nms_threshold
+
+    def detect(self, image, size=None):
+        images, offsets = self.tiler.split(image)
+        detections = merge_tiles(self.detector.detect_batch(images), offsets, self.nms_threshold)
+        (h, w) = image.shape[:2]
+        if size is not None and tuple(size) != (w, h):
+            for key, scale in (('x1', size[0] / w), ('x2', size[0] / w),
+                               ('y1', size[1] / h), ('y2', size[1] / h)):
+                detections[key] = (detections[key] * scale).astype(np.int32)
+        return detections
+
+    def describe(self):
+        info = self.detector.describe()
+        info['tiling'] = self.tiler.describe()
+        return info
@@ -0,0 +1,206 @@
+# tracker.py
+"""Box tracking between detector runs, for detecting every N frames.
+
+Boxes are carried forward with a per-track constant-velocity estimate
+smoothed by an exponential moving average, from the detections alone. This
+stands in for a Kalman filter or optical flow: it needs no pixels and no
+extra dependency, and costs next to nothing per frame. The price is that it
+can't follow sudden changes of direction between detector runs; the drift
+it measures at each run is what makes AdaptiveCadence run the detector more
+often when that happens.
+"""
+import math
+
+import numpy as np
+
+from detection import DETECTION_DTYPE
+
+
+def box_array(detections):
+    """Return the boxes of a DETECTION_DTYPE array as an (N, 4) float32 array."""
+    return np.stack([detections['x1'], detections['y1'],
+                     detections['x2'], detections['y2']], axis=1).astype(np.float32)
+
+
+def iou_matrix(a, b):
+    """Pairwise IoU between (N, 4) and (M, 4) boxes in x1, y1, x2, y2 form."""
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-6), 0.0)
+
+
+class BoxTracker:
+    """Carries detector boxes forward between detector runs.
+
+    Detections are associated with existing tracks by IoU (same class only),
+    and each track keeps a smoothed constant-velocity estimate, so predict()
+    can move the boxes to any later timestamp without touching the pixels.
+
+    Drift is measured every time the detector runs: it is 1 - IoU between
+    where a track was predicted to be and where the detector found it.
+    update() also returns a drift score for the whole scene, in which
+    objects that appeared or were lost since the last run count as fully
+    drifted, so the caller can tell a still scene from a changing one.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_misses=2, smoothing=0.5):
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.smoothing = smoothing
+        self.boxes = np.zeros((0, 4), dtype=np.float32)
+        self.velocity = np.zeros((0, 4), dtype=np.float32)
+        self.class_ids = np.zeros(0, dtype=np.int32)
+        self.scores = np.zeros(0, dtype=np.float32)
+        self.misses = np.zeros(0, dtype=np.int32)
+        self.timestamp = None
+        self.size = None
+        self.last_drift = 0.0
+        self.mean_drift = 0.0
+        self.matched = 0
+        self.lost = 0
+
+    def _predicted_boxes(self, timestamp):
+        if self.timestamp is None:
+            return self.boxes
+        return self.boxes + self.velocity * (timestamp - self.timestamp)
+
+    def update(self, detections, timestamp, size):
+        """Feed a fresh detector result (DETECTION_DTYPE) taken at timestamp
+        for a frame of size (width, height). Returns the scene drift in
+        [0, 1]: mean drift over matched tracks, new detections and tracks
+        the detector missed; 0 when there was nothing to track."""
+        detected = box_array(detections)
+        predicted = self._predicted_boxes(timestamp)
+        dt = timestamp - self.timestamp if self.timestamp is not None else 0.0
+
+        matches = []
+        drift_sum = 0.0
+        if len(predicted) and len(detected):
+            iou = iou_matrix(predicted, detected)
+            iou[self.class_ids[:, None] != detections['class_id'][None, :]] = 0.0
+            # Greedy association, best overlaps first
+            for flat in np.argsort(iou, axis=None)[::-1]:
+                t, d = np.unravel_index(flat, iou.shape)
+                if iou[t, d] < self.iou_threshold:
+                    break
+                if any(t == mt or d == md for mt, md in matches):
+                    continue
+                matches.append((t, d))
+
+        velocity = np.zeros_like(detected)
+        misses = np.zeros(len(detected), dtype=np.int32)
+        if matches:
+            tracks, dets = (np.array(idx) for idx in zip(*matches))
+            drift = 1.0 - iou_matrix(predicted[tracks], detected[dets]).diagonal()
+            drift_sum = float(drift.sum())
+            self.last_drift = float(drift.mean())
+            self.mean_drift += (self.last_drift - self.mean_drift) * 0.1
+            self.matched += len(matches)
+            if dt > 0:
+                observed = (detected[dets] - self.boxes[tracks]) / dt
+                velocity[dets] = (self.smoothing * observed
+                                  + (1 - self.smoothing) * self.velocity[tracks])
+
+        # Tracks the detector didn't see this time are kept (moving on their
+        # last velocity) until they have been missed max_misses times
+        unmatched = np.setdiff1d(np.arange(len(predicted)), [t for t, _ in matches])
+        keep = unmatched[self.misses[unmatched] + 1 <= self.max_misses]
+        self.lost += len(unmatched) - len(keep)
+
+        self.boxes = np.concatenate([detected, predicted[keep]])
+        self.velocity = np.concatenate([velocity, self.velocity[keep]])
+        self.class_ids = np.concatenate([detections['class_id'], self.class_ids[keep]])
+        self.scores = np.concatenate([detections['score'], self.scores[keep]])
+        self.misses = np.concatenate([misses, self.misses[keep] + 1])
+        self.timestamp = timestamp
+        self.size = size
+        # Unmatched detections are new objects, unmatched tracks were missed
+        changed = (len(detected) - len(matches)) + len(unmatched)
+        total = len(matches) + changed
+        return (drift_sum + changed) / total if total else 0.0
+
+    def predict(self, timestamp):
+        """Return the tracked boxes moved to timestamp, as a DETECTION_DTYPE array."""
+        out = np.empty(len(self.boxes), dtype=DETECTION_DTYPE)
+        if not len(out):
+            return out
+        (w, h) = self.size
+        boxes = np.clip(self._predicted_boxes(timestamp), 0,
+                        np.array([w - 1, h - 1, w - 1, h - 1], dtype=np.float32)).astype(np.int32)
+        out['class_id'] = self.class_ids
+        out['score'] = self.scores
+        out['x1'] = boxes[:, 0]
+        out['y1'] = boxes[:, 1]
+        out['x2'] = boxes[:, 2]
+        out['y2'] = boxes[:, 3]
+        return out
+
+    def stats(self):
+        return {
+            'tracks': int(len(self.boxes)),
+            'last_drift': self.last_drift,
+            'mean_drift': self.mean_drift,
+            'matched': self.matched,
+            'lost': self.lost,
+        }
+
+
+class AdaptiveCadence:
+    """Chooses how many frames to skip between detector runs.
+
+    The floor for N is the number of frames at target_fps that one
+    inference takes, with some headroom, so the detector never falls behind
+    the stream. On top of that N grows by one frame per detector run while
+    the scene drift stays under `low_drift` (e.g. hovering over a still
+    scene, where the tracker's boxes stay right) and is halved back towards
+    the floor as soon as it rises over `high_drift`, so a still scene costs
+    a fraction of the detector time and motion is picked up again quickly.
+    """
+
+    def __init__(self, target_fps=30.0, min_n=1, max_n=15, headroom=1.2,
+                 low_drift=0.1, high_drift=0.3):
+        self.target_fps = target_fps
+        self.min_n = min_n
+        self.max_n = max_n
+        self.headroom = headroom
+        self.low_drift = low_drift
+        self.high_drift = high_drift
+        self.latency = None
+        self.drift = None
+        self.floor = min_n
+        self.extra = 0
+        self.n = min_n
+
+    def record(self, latency, drift=None):
+        """Record one inference latency (seconds) and, if known, the scene
+        drift the tracker measured on that run (see BoxTracker.update), and
+        update N."""
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += (latency - self.latency) * 0.2
+        self.floor = max(self.min_n, min(self.max_n,
+                                         math.ceil(self.latency * self.target_fps * self.headroom)))
+        if drift is not None:
+            self.drift = drift
+            if drift > self.high_drift:
+                self.extra //= 2
+            elif drift < self.low_drift:
+                self.extra = min(self.extra + 1, self.max_n - self.floor)
+        self.extra = max(0, min(self.extra, self.max_n - self.floor))
+        self.n = self.floor + self.extra
+
+    def stats(self):
+        return {
+            'n': self.n,
+            'floor': self.floor,
+            'target_fps': self.target_fps,
+            'latency_ms': (self.latency or 0.0) * 1000,
+            'drift': self.drift,
+        }
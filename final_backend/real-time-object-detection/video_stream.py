@@ -0,0 +1,347 @@
+# video_stream.py
+import itertools
+import math
+import struct
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import cv2
+
+from frame_bus import FrameBus
+
+# How a client wants its MJPEG stream. width=None keeps the source width,
+# quality=None uses OpenCV's default (95), max_fps=None sends every frame.
+Profile = namedtuple('Profile', ['name', 'width', 'quality', 'max_fps'])
+
+# Built-in profiles, best first; stalled clients step down this ladder
+PROFILE_LADDER = [
+    Profile('full', None, None, None),
+    Profile('medium', 640, 70, 15),
+    Profile('low', 320, 50, 8),
+]
+PROFILES = {p.name: p for p in PROFILE_LADDER}
+DEFAULT_PROFILE = PROFILES['full']
+# Small still for dashboards (/thumbnail.jpg)
+THUMBNAIL_PROFILE = Profile('thumbnail', 160, 60, None)
+# What profile_from_args() accepts from clients; values outside are clamped
+WIDTH_RANGE = (16, 4096)
+QUALITY_RANGE = (1, 100)
+FPS_RANGE = (0.1, 120.0)
+
+
+def _clamp(value, bounds):
+    if value is None:
+        return None
+    if isinstance(value, float) and not math.isfinite(value):
+        return bounds[1] if value > 0 else bounds[0]
+    return min(max(value, bounds[0]), bounds[1])
+
+
+def profile_from_args(args):
+    """Build a Profile from request query parameters.
+
+    `profile` picks a built-in profile; `width`, `quality` and `fps` override
+    its fields, e.g. /video_feed?profile=low or /video_feed?width=480&fps=10.
+    Overrides are clamped to WIDTH_RANGE, QUALITY_RANGE and FPS_RANGE.
+    """
+    base = PROFILES.get(args.get('profile'), DEFAULT_PROFILE)
+    width = _clamp(args.get('width', type=int, default=base.width), WIDTH_RANGE)
+    quality = _clamp(args.get('quality', type=int, default=base.quality), QUALITY_RANGE)
+    max_fps = _clamp(args.get('fps', type=float, default=base.max_fps), FPS_RANGE)
+    if (width, quality, max_fps) == (base.width, base.quality, base.max_fps):
+        return base
+    return Profile('custom', width, quality, max_fps)
+
+
+def downgrade(profile):
+    """Return the next built-in profile below `profile`, or `profile` itself
+    if it is already the smallest."""
+    for candidate in PROFILE_LADDER:
+        if (candidate.width or math.inf) < (profile.width or math.inf):
+            return candidate
+    return profile
+
+
+def encode_jpeg(image, profile):
+    """Resize image down to the profile width (if smaller) and JPEG-encode it."""
+    (h, w) = image.shape[:2]
+    if profile.width and profile.width < w:
+        size = (profile.width, max(1, round(h * profile.width / w)))
+        image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+    params = [int(cv2.IMWRITE_JPEG_QUALITY), profile.quality] if profile.quality else []
+    ret, buffer = cv2.imencode('.jpg', image, params)
+    return buffer.tobytes() if ret else None
+
+
+class FramePacer:
+    """Decides which frames a stream limited to `max_fps` sends.
+
+    Frames are sent on a fixed schedule that advances by one interval per
+    frame sent, rather than measured from the last frame sent, so capture
+    jitter doesn't push every other send back by a whole source frame (a
+    30 fps source limited to 15 fps would otherwise deliver about 12). After a
+    gap longer than an interval (a stalled source or client) the schedule
+    restarts from the next frame instead of bursting to catch up. A frame up
+    to `jitter` of an interval early still counts as on time, so a limit
+    equal to the source rate passes every frame.
+    """
+
+    jitter = 0.25
+
+    def __init__(self):
+        self.next_due = None
+
+    def due(self, timestamp, max_fps):
+        """Whether to send the frame captured at `timestamp`; None or 0
+        `max_fps` sends every frame."""
+        if not max_fps:
+            return True
+        interval = 1.0 / max_fps
+        if self.next_due is None or timestamp - self.next_due >= interval:
+            self.next_due = timestamp
+        if timestamp < self.next_due - interval * self.jitter:
+            return False
+        self.next_due += interval
+        return True
+
+
+class _Entry:
+    def __init__(self):
+        self.ready = threading.Event()
+        self.data = None
+
+
+class EncodeCache:
+    """JPEG encodes keyed by (frame sequence, width, quality).
+
+    The first client to ask for a key encodes it; everyone else on the same
+    profile waits for that result, so each frame is encoded once per profile
+    no matter how many clients are watching.
+    """
+
+    def __init__(self, max_entries=16):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.encodes = 0
+        self.hits = 0
+
+    def get(self, frame, profile):
+        """Return JPEG bytes for frame (a FrameBus Frame) at profile, or None."""
+        key = (frame.seq, profile.width, profile.quality)
+        with self._lock:
+            entry = self._entries.get(key)
+            owner = entry is None
+            if owner:
+                entry = self._entries[key] = _Entry()
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            else:
+                self.hits += 1
+        if owner:
+            try:
+                entry.data = encode_jpeg(frame.image, profile)
+                self.encodes += 1
+            finally:
+                if entry.data is None:
+                    # Don't keep a failed encode; the next request retries it
+                    with self._lock:
+                        if self._entries.get(key) is entry:
+                            del self._entries[key]
+                entry.ready.set()
+        else:
+            entry.ready.wait()
+        return entry.data
+
+    def stats(self):
+        return {'encodes': self.encodes, 'hits': self.hits}
+
+
+class JpegBroadcaster:
+    """Encodes each new frame to JPEG once per profile and shares the bytes
+    with every viewer.
+
+    Viewers read frames from the source FrameBus and get their bytes from a
+    shared EncodeCache. While anyone watches the default profile, an encoder
+    thread encodes each new frame for it as soon as it is published and puts
+    the bytes on the `output` bus, keeping the source sequence number.
+
+    Each viewer picks a Profile (size, quality, frame rate). A viewer whose
+    socket writes keep stalling is moved down PROFILE_LADDER.
+
+    Snapshot requests (see snapshot()) keep frames flowing for
+    `snapshot_linger` seconds after the last one, so periodic pollers always
+    get a current frame without holding a stream open.
+    """
+
+    def __init__(self, source, quality=None, stall_threshold=0.25, stall_limit=3,
+                 snapshot_linger=5.0):
+        self.source = source
+        self.snapshot_linger = snapshot_linger
+        self._snapshot_until = 0.0
+        # Sequence numbers restart with the process, so ETags carry the start time too
+        self._etag_prefix = format(int(time.time() * 1000), 'x')
+        self._snapshot_demand = source.subscribe(
+            'snapshots', active=lambda: time.monotonic() < self._snapshot_until)
+        self.default_profile = DEFAULT_PROFILE._replace(quality=quality)
+        self.stall_threshold = stall_threshold
+        self.stall_limit = stall_limit
+        self.cache = EncodeCache()
+        self.output = FrameBus('jpeg')
+        self._default_viewers = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._client_ids = itertools.count(1)
+        self.downgrades = 0
+        # Optional callable(transport, frame) run after each frame is written to a client
+        self.on_send = None
+
+    @property
+    def encoded(self):
+        return self.cache.encodes
+
+    def start(self):
+        """Start the encoder thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._encode_loop, daemon=True)
+            self._thread.start()
+        return self
+
+    def _encode_loop(self):
+        # Only ask for frames while default-profile viewers are connected
+        consumer = self.source.subscribe('jpeg-encoder', active=self._has_default_viewers)
+        while True:
+            frame = consumer.next()
+            if not self._has_default_viewers():
+                continue
+            jpeg = self.cache.get(frame, self.default_profile)
+            if jpeg is not None:
+                self.output.publish(jpeg, frame.timestamp, frame.seq)
+
+    def _has_default_viewers(self):
+        return self._default_viewers > 0 or self.output.has_demand()
+
+    def _track_default(self, profile, delta):
+        if profile == self.default_profile:
+            with self._lock:
+                self._default_viewers += delta
+
+    def latest(self):
+        """Return the newest default-profile Frame (image holds JPEG bytes), or None."""
+        return self.output.latest()
+
+    def gen_multipart(self, profile=None, name='viewer'):
+        """Generator yielding multipart MJPEG chunks for a single HTTP client."""
+        profile = profile or self.default_profile
+        if profile == DEFAULT_PROFILE:
+            profile = self.default_profile
+        name = f'{name}-{next(self._client_ids)}'
+        consumer = self.source.subscribe(f'{name}:{profile.name}')
+        self._track_default(profile, 1)
+        pacer = FramePacer()
+        stalls = 0
+        try:
+            while True:
+                frame = consumer.next(timeout=1.0)
+                if frame is None:
+                    continue
+                if not pacer.due(frame.timestamp, profile.max_fps):
+                    continue
+                jpeg = self.cache.get(frame, profile)
+                if jpeg is None:
+                    continue
+
+                # The WSGI server writes the chunk before resuming us, so the
+                # time spent in yield is how long the socket write took
+                start = time.monotonic()
+                yield (b'--frame\r\n'
+                       b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
+                stalls = stalls + 1 if time.monotonic() - start > self.stall_threshold else 0
+                self._sent(consumer, 'mjpeg', frame)
+
+                if stalls >= self.stall_limit:
+                    lower = downgrade(profile)
+                    if lower != profile:
+                        self._track_default(profile, -1)
+                        self._track_default(lower, 1)
+                        consumer.name = f'{name}:{lower.name}'
+                        profile = lower
+                        self.downgrades += 1
+                    stalls = 0
+        finally:
+            self._track_default(profile, -1)
+            consumer.close()
+
+    def serve_websocket(self, ws, profile=None, ack_timeout=5.0, name='ws'):
+        """Send frames over a WebSocket with acknowledgement-based flow control.
+
+        Each binary message is a 4-byte big-endian frame sequence number
+        followed by the JPEG bytes. The client replies with the sequence number
+        once it has shown the frame; only then is the next frame sent, and it
+        is always the newest one, so a slow client skips frames instead of
+        queueing them. An ack that never comes is given up on after
+        `ack_timeout` seconds. Returns when the socket closes.
+        """
+        profile = profile or self.default_profile
+        if profile == DEFAULT_PROFILE:
+            profile = self.default_profile
+        name = f'{name}-{next(self._client_ids)}'
+        consumer = self.source.subscribe(f'{name}:{profile.name}')
+        self._track_default(profile, 1)
+        pacer = FramePacer()
+        try:
+            while True:
+                frame = consumer.next(timeout=1.0)
+                if frame is None:
+                    continue
+                if not pacer.due(frame.timestamp, profile.max_fps):
+                    continue
+                jpeg = self.cache.get(frame, profile)
+                if jpeg is None:
+                    continue
+                seq = frame.seq & 0xFFFFFFFF
+                ws.send(struct.pack('>I', seq) + jpeg)
+                self._sent(consumer, 'websocket', frame)
+
+                deadline = time.monotonic() + ack_timeout
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    ack = ws.receive(timeout=remaining)
+                    try:
+                        if ack is not None and int(ack) >= seq:
+                            break
+                    except (TypeError, ValueError):
+                        # Ignore anything that isn't an ack
+                        pass
+        finally:
+            self._track_default(profile, -1)
+            consumer.close()
+
+    def snapshot(self, max_age=1.0):
+        """Return the current source Frame for a still-image request, or None.
+
+        If the newest frame is older than `max_age` seconds (nobody was
+        watching, so upstream stages were idle), waits up to that long for a
+        fresh one.
+        """
+        self._snapshot_until = time.monotonic() + self.snapshot_linger
+        frame = self.source.latest()
+        if frame is None or time.time() - frame.timestamp > max_age:
+            frame = self.source.wait_newer(frame.seq if frame else 0, timeout=max_age) or frame
+        return frame
+
+    def etag(self, frame, profile):
+        """Entity tag for frame encoded at profile."""
+        return f'{self._etag_prefix}-{self.source.name}-{frame.seq}-{profile.width}-{profile.quality}'
+
+    def _sent(self, consumer, transport, frame):
+        consumer.lag = time.time() - frame.timestamp
+        if self.on_send is not None:
+            self.on_send(transport, frame)
+
+    def stats(self):
+        return dict(self.cache.stats(), downgrades=self.downgrades,
+                    default_viewers=self._default_viewers)
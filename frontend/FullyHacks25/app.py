@@ -78,17 +78,32 @@ def extract_python_code(content: str) -> str:
 # ------------------------ VIDEO STREAM ------------------------
 frame_buffer = None
 frame_lock = threading.Lock()
+jpeg_cache = {'frame': None, 'bytes': None}
+jpeg_lock = threading.Lock()
+
+def get_jpeg():
+    # Encode each new frame once, outside frame_lock, and share the bytes
+    with frame_lock:
+        frame = frame_buffer
+    if frame is None:
+        return None
+    with jpeg_lock:
+        if jpeg_cache['frame'] is not frame:
+            ret, buffer = cv2.imencode('.jpg', frame)
+            if not ret:
+                return None
+            jpeg_cache['frame'] = frame
+            jpeg_cache['bytes'] = buffer.tobytes()
+        return jpeg_cache['bytes']
 
 def gen_frames():
-    global frame_buffer
+    last_sent = None
     while True:
-        with frame_lock:
-            if frame_buffer is not None:
-                ret, buffer = cv2.imencode('.jpg', frame_buffer)
-                if not ret:
-                    continue
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + buffer.tobytes() + b'\r\n')
+        frame_bytes = get_jpeg()
+        if frame_bytes is not None and frame_bytes is not last_sent:
+            last_sent = frame_bytes
+            yield (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
         time.sleep(0.03)
 
 @app.route('/video_feed')
@@ -1,15 +1,25 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef, useCallback } from 'react';
 import './DroneControl.css';
 
+// The dev-server proxy only forwards plain HTTP, so the WebSocket goes
+// straight to the backend.
+const VIDEO_WS_URL = process.env.REACT_APP_VIDEO_WS_URL
+  || `${window.location.protocol === 'https:' ? 'wss' : 'ws'}://${window.location.hostname}:5001/video_ws`;
+
 const DroneControl = () => {
   const [chatOutput, setChatOutput] = useState('');
   const [chatInput, setChatInput] = useState('');
   const [droneStatus] = useState('Connected');
   const [battery, setBattery] = useState('Unknown');
+  const [videoTransport, setVideoTransport] = useState('mjpeg');
+  // Detection boxes are per viewer; overlay=0 gets the clean feed
+  const [showOverlay, setShowOverlay] = useState(true);
+  const overlayQuery = showOverlay ? '' : '?overlay=0';
+  const videoRef = useRef(null);
 
-  const appendChatMessage = (htmlMessage) => {
+  const appendChatMessage = useCallback((htmlMessage) => {
     setChatOutput((prev) => prev + htmlMessage);
-  };
+  }, []);
 
   const sendCommand = (command, silent = false) => {
     if (!silent) {
@@ -60,6 +70,39 @@ const DroneControl = () => {
     sendCommand('battery', true);
   }, []);
 
+  // WebSocket video: each message is a 4-byte big-endian frame sequence
+  // number followed by JPEG bytes. The frame is acked once the image has
+  // loaded, and the server only sends the next (newest) frame after that.
+  useEffect(() => {
+    if (videoTransport !== 'websocket') return undefined;
+    const ws = new WebSocket(VIDEO_WS_URL + overlayQuery);
+    ws.binaryType = 'arraybuffer';
+    let frameUrl = null;
+
+    ws.onmessage = (event) => {
+      const seq = new DataView(event.data).getUint32(0);
+      const blob = new Blob([new Uint8Array(event.data, 4)], { type: 'image/jpeg' });
+      const previousUrl = frameUrl;
+      frameUrl = URL.createObjectURL(blob);
+      const img = videoRef.current;
+      if (!img) return;
+      img.onload = () => {
+        if (previousUrl) URL.revokeObjectURL(previousUrl);
+        if (ws.readyState === WebSocket.OPEN) ws.send(String(seq));
+      };
+      img.src = frameUrl;
+    };
+    ws.onerror = () => {
+      appendChatMessage(`<div class="system-message">WebSocket video unavailable, using MJPEG</div>`);
+      setVideoTransport('mjpeg');
+    };
+
+    return () => {
+      ws.close();
+      if (frameUrl) URL.revokeObjectURL(frameUrl);
+    };
+  }, [videoTransport, overlayQuery, appendChatMessage]);
+
   return (
     <div className="container">
       <div className="header">
@@ -69,7 +112,23 @@ const DroneControl = () => {
       <div className="content">
         <div className="video-container">
           <h2>Live Video Feed</h2>
-          <img src="/video_feed" alt="Drone video stream" className="video-feed" />
+          {videoTransport === 'mjpeg' ? (
+            <img src={`/video_feed${overlayQuery}`} alt="Drone video stream" className="video-feed" />
+          ) : (
+            <img ref={videoRef} alt="Drone video stream" className="video-feed" />
+          )}
+          <button
+            className="command-button transport-button"
+            onClick={() => setVideoTransport(videoTransport === 'mjpeg' ? 'websocket' : 'mjpeg')}
+          >
+            Video: {videoTransport === 'mjpeg' ? 'MJPEG' : 'WebSocket'}
+          </button>
+          <button
+            className="command-button transport-button"
+            onClick={() => setShowOverlay(!showOverlay)}
+          >
+            Boxes: {showOverlay ? 'On' : 'Off'}
+          </button>
         </div>
 
         <div className="controls">
@@ -97,7 +156,8 @@ const DroneControl = () => {
               {[
                 'takeoff', 'toggle_detection', 'land', 'move_up 20', 'move_down 20', 'battery',
                 'move_forward 30', 'move_back 30', 'flip_forward', 'move_left 30', 'move_right 30',
-                'flip_back', 'rotate_clockwise 90', 'rotate_counter_clockwise 90', 'streamoff'
+                'flip_back', 'rotate_clockwise 90', 'rotate_counter_clockwise 90', 'streamoff',
+                'record_start', 'record_stop'
               ].map((cmd, idx) => (
                 <button key={idx} className="command-button" onClick={() => sendCommand(cmd)}>
                   {cmd.replace(/_/g, ' ')}
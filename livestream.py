@@ -78,21 +78,35 @@ class colors:
 app = Flask(__name__)
 frame_buffer = None
 frame_lock = threading.Lock()
+# Shared JPEG for the current frame so viewers don't each re-encode it
+jpeg_cache = {'frame': None, 'bytes': None}
+jpeg_lock = threading.Lock()
+
+def get_jpeg():
+    """Return JPEG bytes for the current frame, encoding each new frame only once."""
+    with frame_lock:
+        frame = frame_buffer
+    if frame is None:
+        return None
+    # Encode outside frame_lock; viewers share the cached bytes until the frame changes
+    with jpeg_lock:
+        if jpeg_cache['frame'] is not frame:
+            ret, buffer = cv2.imencode('.jpg', frame)
+            if not ret:
+                return None
+            jpeg_cache['frame'] = frame
+            jpeg_cache['bytes'] = buffer.tobytes()
+        return jpeg_cache['bytes']
 
 def gen_frames():
     """Generator function that yields frames for the HTTP stream."""
-    global frame_buffer
+    last_sent = None
     while True:
-        with frame_lock:
-            if frame_buffer is not None:
-                # Encode the frame as JPEG
-                ret, buffer = cv2.imencode('.jpg', frame_buffer)
-                if not ret:
-                    continue
-                # Convert to bytes and yield
-                frame_bytes = buffer.tobytes()
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+        frame_bytes = get_jpeg()
+        if frame_bytes is not None and frame_bytes is not last_sent:
+            last_sent = frame_bytes
+            yield (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
         # Add a small delay to prevent overwhelming the connection
         time.sleep(0.03)  # ~30 fps
 